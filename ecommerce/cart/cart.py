@@ -1,32 +1,123 @@
 from decimal import Decimal
 from django.conf import settings
+from django.core import signing
 from shop.models import Product
 
+COOKIE_SALT = 'cart.guest'
+DEFAULT_COOKIE_NAME = 'cart'
+DEFAULT_COOKIE_MAX_SIZE = 3800
+
+
+def _to_cents(price):
+    return int((Decimal(price) * 100).to_integral_value())
+
+
+def _from_cents(cents):
+    return Decimal(cents) / 100
+
+
+def cookie_name():
+    return getattr(settings, 'CART_COOKIE_NAME', DEFAULT_COOKIE_NAME)
+
+
+def cookie_age():
+    return getattr(settings, 'CART_COOKIE_AGE', settings.SESSION_COOKIE_AGE)
+
+
+def dumps_cart(data):
+    """签名并压缩购物车数据，用作cookie值"""
+    return signing.dumps(data, salt=COOKIE_SALT, compress=True)
+
+
+def loads_cart(value):
+    """校验并解析cookie中的购物车，签名无效或已过期返回 None"""
+    try:
+        data = signing.loads(value, salt=COOKIE_SALT, max_age=cookie_age())
+    except signing.BadSignature:
+        return None
+    return data if isinstance(data, dict) else None
+
 
 class Cart:
+    """
+    未登录用户的购物车
+    只保存紧凑的 {product_id: [quantity, price_cents]}（JSON 原生类型，几十字节一件商品），
+    迭代时每个请求单独构建视图数据（含 Product 实例和 Decimal 金额），不会写回存储
+
+    settings.CART_GUEST_STORAGE = 'cookie' 时购物车签名压缩后存入独立的cookie（由 cart.middleware.CartCookieMiddleware 写入响应），
+    浏览和加购都不需要session；超过 CART_COOKIE_MAX_SIZE 时退回session存储
+    """
+
     def __init__(self, request):
+        self.request = request
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.use_cookie = getattr(settings, 'CART_GUEST_STORAGE', 'session') == 'cookie'
+        # 空购物车不写入session，只有add/remove等修改操作调用save()时才写入，
+        # 避免只读取购物车的页面把session标记为已修改
+        self.cart = self._load(self._read())
+        self._items = None
+
+    def _has_session(self):
+        """session中可能有购物车：请求带有session cookie，或本次请求已修改过session"""
+        return (
+            settings.SESSION_COOKIE_NAME in self.request.COOKIES
+            or getattr(self.session, 'modified', True)
+        )
+
+    def _read(self):
+        if self.use_cookie:
+            # 同一请求中先前保存的购物车（cookie尚未随响应写出）
+            pending = getattr(self.request, '_cart_payload', None)
+            if pending is not None:
+                return pending
+            value = self.request.COOKIES.get(cookie_name())
+            data = loads_cart(value) if value else None
+            if data is not None:
+                return data
+            # 没有session的访客不去查session存储
+            if not self._has_session():
+                return {}
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    @staticmethod
+    def _load(data):
+        """兼容旧格式 {'id': {'quantity': qty, 'price': '...'}}，在内存中转换为紧凑格式"""
+        cart = {}
+        for product_id, value in data.items():
+            if isinstance(value, dict):
+                value = [int(value.get('quantity', 0)), _to_cents(value.get('price', 0))]
+            cart[product_id] = value
+        return cart
 
     def add(self, product, quantity=1, update_quantity=False):
         product_id = str(product.id)
         if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)
-            }
+            self.cart[product_id] = [0, _to_cents(product.price)]
         if update_quantity:
-            self.cart[product_id]['quantity'] = quantity
+            self.cart[product_id][0] = quantity
         else:
-            self.cart[product_id]['quantity'] += quantity
+            self.cart[product_id][0] += quantity
         self.save()
 
     def save(self):
+        """保存购物车（cookie 模式下写入cookie，否则或超过大小限制时写入 session）"""
+        # 购物车已变化，下次迭代重新构建视图数据
+        self._items = None
+        if self.use_cookie:
+            value = dumps_cart(self.cart) if self.cart else ''
+            self.request._cart_payload = self.cart
+            if len(value) <= getattr(settings, 'CART_COOKIE_MAX_SIZE', DEFAULT_COOKIE_MAX_SIZE):
+                # 空字符串表示删除cookie
+                self.request._cart_cookie = value
+                if self._has_session() and settings.CART_SESSION_ID in self.session:
+                    del self.session[settings.CART_SESSION_ID]
+                return
+            # 超过cookie大小限制，删除cookie并退回session
+            self.request._cart_cookie = ''
+        self._save_session()
+
+    def _save_session(self):
         # 修改这里：检查 session 是否有 modified 属性
-        """保存购物车到 session"""
         # 确保购物车数据被保存到 session
         self.session[settings.CART_SESSION_ID] = self.cart
 
@@ -44,27 +135,40 @@ class Cart:
             del self.cart[product_id]
             self.save()
 
-    def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
+    def quantities(self):
+        """返回 {product_id: quantity}"""
+        return {int(product_id): quantity for product_id, (quantity, _) in self.cart.items()}
 
-        for product in products:
-            cart[str(product.id)]['product'] = product
+    def get_items(self):
+        """
+        构建本次请求的购物车视图数据（一次 in_bulk 查询商品），结果缓存在实例上
+        每一项都是新建的字典，session中的数据保持不变
+        """
+        if self._items is None:
+            products = Product.objects.in_bulk(list(self.quantities()))
+            self._items = []
+            for product_id, (quantity, cents) in self.cart.items():
+                product = products.get(int(product_id))
+                # 已删除的商品不显示
+                if product is None:
+                    continue
+                price = _from_cents(cents)
+                self._items.append({
+                    'product': product,
+                    'quantity': quantity,
+                    'price': price,
+                    'total_price': price * quantity,
+                })
+        return self._items
 
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+    def __iter__(self):
+        return iter(self.get_items())
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        return sum(quantity for quantity, _ in self.cart.values())
 
     def get_total_price(self):
-        return sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
+        return _from_cents(sum(quantity * cents for quantity, cents in self.cart.values()))
 
     def clear(self):
         # clear方法目前只删除了session中的购物车，但是内存中的self.cart仍然指向一个字典。
@@ -72,7 +176,7 @@ class Cart:
         # 但是当前实例的self.cart并没有被清空。
         # 为了保持一致性，我们应该同时清空self.cart。
         # 删除session中的购物车
-        if settings.CART_SESSION_ID in self.session:
+        if (not self.use_cookie or self._has_session()) and settings.CART_SESSION_ID in self.session:
             del self.session[settings.CART_SESSION_ID]
         # 清空内存中的购物车
         self.cart = {}
@@ -80,4 +184,4 @@ class Cart:
         # 我们之前的设计是利用了字典是可变对象，self.cart和session['cart']是同一个字典，
         # 所以修改self.cart就等于修改了session['cart']。
         # 但是，如果我们给self.cart重新赋值（比如在clear方法中），那么这种联系就断了。
-        # 因此，我们需要修改save方法，确保每次保存时都将self.cart赋值给session
\ No newline at end of file
+        # 因此，我们需要修改save方法，确保每次保存时都将self.cart赋值给session
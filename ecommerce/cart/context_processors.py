@@ -1,39 +1,36 @@
-from .cart import Cart
-from .models import Cart as CartModel
+# cart/context_processors.py
+from django.utils.functional import SimpleLazyObject
 
+from .cart import Cart
+from .stores import get_cart_store
 
-def cart_context(request):
-    """购物车上下文处理器 - 处理登录用户的购物车合并"""
-    context = {}
 
+def _get_cart(request):
+    """登录用户返回购物车快照，未登录用户返回session购物车"""
     if request.user.is_authenticated:
-        try:
-            cart_model = CartModel.objects.get(user=request.user)
-            context['cart'] = cart_model
+        return get_cart_store().snapshot(request.user.id)
+    return Cart(request)
 
-            # 检查是否需要合并session购物车（双重保险）
-            session_cart = request.session.get('cart', {})
-            if session_cart:
-                from .utils import merge_carts
-                merged_cart = merge_carts(session_cart, request.user)
-                if merged_cart:
-                    # 清除session购物车
-                    if 'cart' in request.session:
-                        del request.session['cart']
-                        request.session.modified = True
-                    context['cart'] = merged_cart
 
-        except CartModel.DoesNotExist:
-            # 如果购物车不存在，创建一个
-            cart_model = CartModel.objects.create(user=request.user)
-            context['cart'] = cart_model
-    else:
-        # 未登录用户使用session购物车
-        session_cart = request.session.get('cart', {})
-        context['cart_items_count'] = len(session_cart)
-        context['cart'] = None  # 未登录用户没有数据库购物车
+def _get_cart_summary(request):
+    """购物车摘要：登录用户由购物车存储提供，未登录用户直接由session购物车计算"""
+    if request.user.is_authenticated:
+        return get_cart_store().summary(request.user.id)
+    session_cart = Cart(request)
+    return {
+        'item_count': len(session_cart.cart),
+        'quantity': len(session_cart),
+        'subtotal': session_cart.get_total_price(),
+    }
 
-    return context
 
 def cart(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    """
+    购物车上下文处理器
+    全部延迟计算：模板没有用到购物车时不产生任何查询，也不会读写session；
+    session购物车合并到数据库购物车只在登录时进行（见 cart.signals）
+    """
+    return {
+        'cart': SimpleLazyObject(lambda: _get_cart(request)),
+        'cart_summary': SimpleLazyObject(lambda: _get_cart_summary(request)),
+    }
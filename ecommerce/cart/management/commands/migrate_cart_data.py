@@ -1,65 +1,177 @@
 # cart/management/commands/migrate_cart_data.py
-from django.core.management.base import BaseCommand
+"""
+迁移session购物车数据到数据库购物车
+
+- db 数据源：按 session_key 游标分块读取 django_session 表，不一次性加载全部session；
+  可用 --workers 按 session_key 首字符切分键区间，多进程并行处理
+- redis 数据源：SESSION_ENGINE 为 cache 时，用 SCAN 游标分批扫描缓存中的session键
+- 每块内用 in_bulk 批量解析用户、商品，购物车项批量 upsert，整块在一个事务中提交
+- 每块提交后把进度（最后的 session_key / SCAN 游标）写入缓存，中断后加 --resume 从断点继续
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from django.contrib.auth import get_user_model
-from cart.models import Cart, CartItem
+from django.contrib.sessions.backends.db import SessionStore
 from django.contrib.sessions.models import Session
-import json
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from cart.models import Cart
+from cart.utils import add_cart_items, session_cart_quantities
 
 User = get_user_model()
 
+CHUNK_SIZE = 1000
+# session_key 由小写字母和数字组成，按首字符切分键区间
+KEY_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyz'
+# cache session 后端写入缓存时使用的键前缀
+SESSION_CACHE_PREFIX = 'django.contrib.sessions.cache'
+CHECKPOINT_KEY = 'cart:migrate:checkpoint:{source}:{partition}'
+CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def key_ranges(workers):
+    """把 session_key 空间按首字符切成 workers 个连续区间 [(start, end), ...]，end 为 None 表示不设上界"""
+    workers = max(1, min(workers, len(KEY_ALPHABET)))
+    step, extra = divmod(len(KEY_ALPHABET), workers)
+    bounds, index = [], 0
+    for i in range(workers):
+        bounds.append(KEY_ALPHABET[index] if i else '')
+        index += step + (1 if i < extra else 0)
+    return [(start, bounds[i + 1] if i + 1 < len(bounds) else None) for i, start in enumerate(bounds)]
+
+
+def _get_checkpoint(source, partition):
+    return cache.get(CHECKPOINT_KEY.format(source=source, partition=partition))
+
+
+def _set_checkpoint(source, partition, value):
+    cache.set(CHECKPOINT_KEY.format(source=source, partition=partition), value, CHECKPOINT_TIMEOUT)
+
+
+def migrate_sessions(sessions):
+    """
+    迁移一批已解码的session数据（session_data 字典的可迭代对象），返回写入的购物车项数量
+    只处理已登录用户的session，同一用户的多个session数量累加
+    """
+    user_quantities = {}
+    for data in sessions:
+        user_id = data.get('_auth_user_id')
+        cart_data = data.get('cart')
+        if not user_id or not cart_data:
+            continue
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            continue
+        quantities = user_quantities.setdefault(user_id, {})
+        for product_id, quantity in session_cart_quantities(cart_data).items():
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    if not user_quantities:
+        return 0
+
+    with transaction.atomic():
+        # 不存在的用户直接跳过
+        user_ids = list(User.objects.only('id').in_bulk(list(user_quantities)).keys())
+        Cart.objects.bulk_create([Cart(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        cart_ids = dict(Cart.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+        return add_cart_items({
+            cart_ids[user_id]: user_quantities[user_id] for user_id in user_ids
+        })
+
+
+def migrate_db_range(start, end, chunk_size=CHUNK_SIZE, resume=False):
+    """按 session_key 游标分块迁移 [start, end) 区间内的数据库session，返回写入的购物车项数量"""
+    partition = start or '^'
+    last_key = _get_checkpoint('db', partition) if resume else None
+    sessions = Session.objects.order_by('session_key')
+    if end:
+        sessions = sessions.filter(session_key__lt=end)
+    store = SessionStore()
+    migrated = 0
+    while True:
+        if last_key:
+            chunk = sessions.filter(session_key__gt=last_key)
+        else:
+            chunk = sessions.filter(session_key__gte=start)
+        rows = list(chunk.values_list('session_key', 'session_data')[:chunk_size])
+        if not rows:
+            return migrated
+
+        migrated += migrate_sessions(store.decode(session_data) for _, session_data in rows)
+        last_key = rows[-1][0]
+        _set_checkpoint('db', partition, last_key)
+
+
+def _migrate_db_range_worker(start, end, chunk_size, resume):
+    """子进程入口：使用独立的数据库连接"""
+    connections.close_all()
+    return migrate_db_range(start, end, chunk_size, resume)
+
+
+def migrate_redis_sessions(chunk_size=CHUNK_SIZE, resume=False):
+    """用 SCAN 游标分批扫描缓存中的session并迁移，返回写入的购物车项数量"""
+    try:
+        from django_redis import get_redis_connection
+        redis = get_redis_connection('default')
+    except Exception as e:
+        raise CommandError(f'无法连接 Redis: {e}')
+
+    # 缓存中实际的键形如 <KEY_PREFIX>:<VERSION>:django.contrib.sessions.cache<session_key>
+    pattern = f'*{SESSION_CACHE_PREFIX}*'
+    cursor = (_get_checkpoint('redis', 'scan') if resume else None) or 0
+    migrated = 0
+    while True:
+        cursor, raw_keys = redis.scan(cursor, match=pattern, count=chunk_size)
+        cache_keys = [
+            SESSION_CACHE_PREFIX + key.decode().split(SESSION_CACHE_PREFIX, 1)[1]
+            for key in raw_keys
+        ]
+        if cache_keys:
+            migrated += migrate_sessions(cache.get_many(cache_keys).values())
+        if cursor == 0:
+            cache.delete(CHECKPOINT_KEY.format(source='redis', partition='scan'))
+            return migrated
+        _set_checkpoint('redis', 'scan', cursor)
+
 
 class Command(BaseCommand):
     help = '迁移session购物车数据到数据库购物车'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['db', 'redis'], default='db',
+                            help='session数据来源：数据库session表或 Redis 缓存')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='每批处理的session数量')
+        parser.add_argument('--workers', type=int, default=1, help='db 数据源按键区间并行的进程数')
+        parser.add_argument('--resume', action='store_true', help='从上次中断的位置继续')
+
     def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        resume = options['resume']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size 必须大于0')
         self.stdout.write('开始迁移购物车数据...')
 
-        migrated_count = 0
-
-        # 遍历所有session
-        for session in Session.objects.all():
-            try:
-                session_data = session.get_decoded()
-
-                # 检查session中是否有购物车数据
-                if 'cart' in session_data:
-                    cart_data = session_data['cart']
-
-                    # 查找session对应的用户
-                    if '_auth_user_id' in session_data:
-                        user_id = session_data['_auth_user_id']
-                        try:
-                            user = User.objects.get(id=user_id)
-
-                            # 创建或获取用户的购物车
-                            cart, created = Cart.objects.get_or_create(user=user)
-
-                            # 迁移购物车商品
-                            for product_id, quantity in cart_data.items():
-                                from shop.models import Product
-                                try:
-                                    product = Product.objects.get(id=product_id)
-                                    cart_item, item_created = CartItem.objects.get_or_create(
-                                        cart=cart,
-                                        product=product,
-                                        defaults={'quantity': quantity}
-                                    )
-                                    if not item_created:
-                                        # 如果已存在，更新数量
-                                        cart_item.quantity += quantity
-                                        cart_item.save()
-
-                                    migrated_count += 1
-
-                                except Product.DoesNotExist:
-                                    self.stdout.write(f'商品 {product_id} 不存在，跳过')
-
-                            self.stdout.write(f'用户 {user.username} 的购物车数据迁移完成')
-
-                        except User.DoesNotExist:
-                            self.stdout.write(f'用户 {user_id} 不存在，跳过')
-
-            except Exception as e:
-                self.stdout.write(f'处理session {session.session_key} 时出错: {e}')
-
-        self.stdout.write(self.style.SUCCESS(f'购物车数据迁移完成，共迁移 {migrated_count} 个商品项'))
\ No newline at end of file
+        if options['source'] == 'redis':
+            migrated_count = migrate_redis_sessions(chunk_size, resume)
+        elif options['workers'] > 1:
+            ranges = key_ranges(options['workers'])
+            # fork 之前关闭数据库连接，避免子进程共用父进程的连接
+            connections.close_all()
+            migrated_count = 0
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = {
+                    executor.submit(_migrate_db_range_worker, start, end, chunk_size, resume): (start, end)
+                    for start, end in ranges
+                }
+                for future in as_completed(futures):
+                    start, end = futures[future]
+                    count = future.result()
+                    migrated_count += count
+                    self.stdout.write(f'键区间 [{start or "-"}, {end or "-"}) 迁移完成，共 {count} 个商品项')
+        else:
+            migrated_count = migrate_db_range('', None, chunk_size, resume)
+
+        self.stdout.write(self.style.SUCCESS(f'购物车数据迁移完成，共迁移 {migrated_count} 个商品项'))
@@ -0,0 +1,32 @@
+# cart/middleware.py
+from django.conf import settings
+
+from .cart import cookie_age, cookie_name
+
+
+class CartCookieMiddleware:
+    """
+    把本次请求中保存的未登录购物车写入响应cookie（CART_GUEST_STORAGE = 'cookie' 时生效，见 cart.cart.Cart）
+    请求中没有修改购物车时不做任何处理
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        value = getattr(request, '_cart_cookie', None)
+        if value is None:
+            return response
+        if value:
+            response.set_cookie(
+                cookie_name(),
+                value,
+                max_age=cookie_age(),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        else:
+            response.delete_cookie(cookie_name(), samesite=settings.SESSION_COOKIE_SAMESITE)
+        return response
@@ -0,0 +1,110 @@
+# cart/operations.py
+"""
+购物车行级写操作（供 JSON 接口使用）
+
+每个操作只对一行购物车项执行一条条件 UPDATE 或 upsert，
+库存校验写在 UPDATE 的 WHERE 条件里，不需要先查出购物车项再 save()。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Cart, CartItem
+
+
+class CartOperationError(Exception):
+    """购物车操作失败（商品不在购物车中、库存不足等），消息可直接展示给用户"""
+
+
+def get_cart_id(user_id):
+    """获取用户购物车ID，不存在时创建"""
+    return Cart.objects.get_or_create(user_id=user_id)[0].id
+
+
+def get_quantity(cart_id, product_id):
+    return CartItem.objects.filter(cart_id=cart_id, product_id=product_id) \
+        .values_list('quantity', flat=True).first() or 0
+
+
+def add_item(cart_id, product, quantity):
+    """累加商品数量，返回新数量；累加后超过库存时抛出 CartOperationError"""
+    if quantity < 1:
+        raise CartOperationError('数量必须大于0')
+    if quantity > product.available_stock:
+        raise CartOperationError(f'库存不足，仅剩 {product.available_stock} 件')
+
+    items = CartItem.objects.filter(cart_id=cart_id, product_id=product.id)
+    # 条件 UPDATE：只有累加后不超过库存时才更新
+    if items.filter(quantity__lte=product.available_stock - quantity).update(quantity=F('quantity') + quantity):
+        return get_quantity(cart_id, product.id)
+    if items.exists():
+        raise CartOperationError(f'库存不足，仅剩 {product.available_stock} 件')
+
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart_id=cart_id, product_id=product.id, quantity=quantity)
+        return quantity
+    except IntegrityError:
+        # 并发请求已插入同一行，改为累加
+        return add_item(cart_id, product, quantity)
+
+
+def set_quantity(cart_id, product, quantity):
+    """设置商品数量，数量为0时移除该商品，返回新数量"""
+    if quantity < 0:
+        raise CartOperationError('数量不能为负数')
+    if quantity == 0:
+        remove_item(cart_id, product.id, missing_ok=True)
+        return 0
+    if quantity > product.available_stock:
+        raise CartOperationError(f'库存不足，仅剩 {product.available_stock} 件')
+    # 单条 upsert：行存在则覆盖数量，不存在则插入
+    CartItem.objects.bulk_create(
+        [CartItem(cart_id=cart_id, product_id=product.id, quantity=quantity)],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+    return quantity
+
+
+def check_quantities(lines):
+    """校验 [(product, quantity)] 的每一行，数量为负或超过库存时抛出 CartOperationError"""
+    for product, quantity in lines:
+        if quantity < 0:
+            raise CartOperationError('数量不能为负数')
+        if quantity > product.available_stock:
+            raise CartOperationError(f'{product.name} 库存不足，仅剩 {product.available_stock} 件')
+
+
+def set_quantities(cart_id, lines):
+    """
+    批量设置 [(product, quantity)] 的数量，数量为0的行移除
+    先校验全部行，再用一条 DELETE 和一条 upsert 写入，行数多少都只有两条写语句
+    """
+    check_quantities(lines)
+    removed = [product.id for product, quantity in lines if quantity == 0]
+    if removed:
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+    items = [
+        CartItem(cart_id=cart_id, product_id=product.id, quantity=quantity)
+        for product, quantity in lines
+        if quantity > 0
+    ]
+    if items:
+        CartItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity'],
+        )
+
+
+def remove_item(cart_id, product_id, missing_ok=False):
+    """移除商品，商品不在购物车中且 missing_ok 为 False 时抛出 CartOperationError"""
+    deleted, _ = CartItem.objects.filter(cart_id=cart_id, product_id=product_id).delete()
+    if not deleted and not missing_ok:
+        raise CartOperationError('商品不在购物车中')
+
+
+def clear(cart_id):
+    CartItem.objects.filter(cart_id=cart_id).delete()
@@ -4,32 +4,27 @@ from django.contrib.auth import get_user_model
 from .models import Cart
 from django.contrib.auth import user_logged_in
 from django.dispatch import receiver
+from .cart import Cart as GuestCart
 from .utils import merge_carts
 
 User = get_user_model()
 
 @receiver(user_logged_in)
 def merge_session_cart_on_login(sender, request, user, **kwargs):
-    """用户登录时合并session购物车到数据库购物车"""
+    """用户登录时合并未登录购物车（session或cookie，见 cart.cart.Cart）到数据库购物车"""
     # print(f"🔄 用户 {user.username} 登录，开始合并购物车...")
 
-    # 检查session中是否有购物车数据
-    session_cart = request.session.get('cart', {})
+    # 检查是否有未登录购物车数据
+    guest_cart = GuestCart(request)
 
-    if session_cart:
-        # print(f"发现session购物车，包含 {len(session_cart)} 个商品")
-        merged_cart = merge_carts(session_cart, user)
+    if guest_cart.cart:
+        # print(f"发现session购物车，包含 {len(guest_cart.cart)} 个商品")
+        merged_cart = merge_carts(guest_cart.cart, user)
 
         if merged_cart:
-            # 合并成功后清除session购物车
-            if 'cart' in request.session:
-                del request.session['cart']
-                # print("✅ 已清除session购物车")
-
-            # 保存session修改
-            request.session.modified = True
-
-            # print(f"✅ 购物车合并成功，用户购物车现有 {merged_cart.items.count()} 个商品")
+            # 合并成功后清除未登录购物车（session中的数据和cookie）
+            guest_cart.clear()
+            # print("✅ 已清除session购物车")
         else:
             pass
             # print("❌ 购物车合并失败")
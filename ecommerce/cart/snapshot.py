@@ -0,0 +1,97 @@
+# cart/snapshot.py
+"""
+购物车快照
+
+购物车详情页和结算页原先多次执行 cart.items.all、item.get_total_price 和 cart.get_total_price，
+每次都是一条新的查询或 SUM 聚合。CartSnapshot 在每个请求中只构建一次：
+一条 select_related('product') 查询取出全部购物车项，行小计、总价、总数量、库存提示和可购买状态都在 Python 中计算，
+模板只读取快照的属性，渲染购物车只需一次查询。
+"""
+from decimal import Decimal
+
+from shop.models import Product
+from .models import CartItem
+
+
+class CartLine:
+    """购物车中的一行商品"""
+
+    def __init__(self, item):
+        self.item = item
+        self.product = item.product
+        self.quantity = item.quantity
+        self.price = item.product.price
+        self.total_price = self.price * self.quantity
+        # 商品已下架
+        self.available = item.product.available
+        # 库存是否足够
+        self.in_stock = item.product.available_stock >= self.quantity
+
+    @property
+    def can_checkout(self):
+        return self.available and self.in_stock
+
+    @property
+    def stock_warning(self):
+        """库存提示文字，没有问题时返回空字符串"""
+        if not self.available:
+            return '商品已下架'
+        if self.product.available_stock <= 0:
+            return '商品已售罄'
+        if not self.in_stock:
+            return f'库存不足，仅剩 {self.product.available_stock} 件'
+        return ''
+
+
+class CartSnapshot:
+    """一次查询构建的购物车只读快照"""
+
+    def __init__(self, items):
+        self.lines = [CartLine(item) for item in items]
+        self.item_count = len(self.lines)
+        self.quantity = sum(line.quantity for line in self.lines)
+        self.subtotal = sum((line.total_price for line in self.lines), Decimal('0.00'))
+        self.warnings = [line for line in self.lines if not line.can_checkout]
+        self.can_checkout = bool(self.lines) and not self.warnings
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.for_user_id(user.id)
+
+    @classmethod
+    def for_user_id(cls, user_id):
+        """直接按用户查询数据库购物车项，无需先取购物车"""
+        return cls(
+            CartItem.objects.filter(cart__user_id=user_id)
+            .select_related('product')
+            .order_by('id')
+        )
+
+    @classmethod
+    def from_quantities(cls, quantities):
+        """由 {product_id: quantity} 构建（Redis 购物车），一次 in_bulk 查询商品"""
+        products = Product.objects.in_bulk(list(quantities))
+        return cls(
+            CartItem(product=products[product_id], quantity=quantity)
+            for product_id, quantity in sorted(quantities.items())
+            if product_id in products
+        )
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return self.item_count
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def get_total_price(self):
+        return self.subtotal
+
+    def get_total_quantity(self):
+        return self.quantity
+
+    def summary(self):
+        """与 cart.summary 一致的摘要字典"""
+        return {'item_count': self.item_count, 'quantity': self.quantity, 'subtotal': self.subtotal}
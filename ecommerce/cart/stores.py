@@ -0,0 +1,311 @@
+# cart/stores.py
+"""
+购物车存储引擎
+
+视图、JSON 接口、上下文处理器和下单流程都通过 get_cart_store() 读写登录用户的购物车，
+具体实现由 settings.CART_STORE_BACKEND 指定：
+
+- DatabaseCartStore（默认）：直接读写 cart.models.CartItem
+- RedisCartStore：每个用户的购物车保存为 Redis 哈希 cart:items:<user_id>（product_id → quantity），
+  读写都不访问数据库；被修改过的用户ID记入集合 cart:dirty，
+  由 Celery 任务 cart.tasks.persist_dirty_carts 定期批量写回 CartItem（write-behind）
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from shop.models import Product
+from . import operations
+from .models import Cart, CartItem
+from .operations import CartOperationError
+from .snapshot import CartSnapshot
+from .summary import get_cart_summary, invalidate_cart_summary, set_cart_summary, summarize_quantities
+from .utils import add_cart_items
+
+DEFAULT_CART_STORE_BACKEND = 'cart.stores.DatabaseCartStore'
+
+
+class CartStore:
+    """购物车存储接口，所有方法都以用户ID定位购物车"""
+
+    def get_items(self, user_id):
+        """返回 {product_id: quantity}"""
+        raise NotImplementedError
+
+    def add(self, user_id, product, quantity):
+        """累加商品数量，返回新数量；超过库存时抛出 CartOperationError"""
+        raise NotImplementedError
+
+    def set(self, user_id, product, quantity):
+        """设置商品数量（不存在则加入），数量为0时移除，返回新数量"""
+        raise NotImplementedError
+
+    def set_many(self, user_id, lines):
+        """批量设置 [(product, quantity)] 的数量，任一行不合法时不做任何修改"""
+        raise NotImplementedError
+
+    def remove(self, user_id, product_id, missing_ok=False):
+        """移除商品，商品不在购物车中且 missing_ok 为 False 时抛出 CartOperationError"""
+        raise NotImplementedError
+
+    def clear(self, user_id):
+        raise NotImplementedError
+
+    def merge(self, user_id, quantities):
+        """把 {product_id: quantity} 累加到购物车（登录时合并session购物车）"""
+        raise NotImplementedError
+
+    def summary(self, user_id):
+        """导航栏角标使用的购物车摘要"""
+        raise NotImplementedError
+
+    def snapshot(self, user_id):
+        """购物车页、结算页使用的 CartSnapshot"""
+        raise NotImplementedError
+
+
+class DatabaseCartStore(CartStore):
+    """直接读写数据库的购物车存储"""
+
+    def get_items(self, user_id):
+        return dict(
+            CartItem.objects.filter(cart__user_id=user_id).values_list('product_id', 'quantity')
+        )
+
+    def add(self, user_id, product, quantity):
+        quantity = operations.add_item(operations.get_cart_id(user_id), product, quantity)
+        invalidate_cart_summary(user_id)
+        return quantity
+
+    def set(self, user_id, product, quantity):
+        quantity = operations.set_quantity(operations.get_cart_id(user_id), product, quantity)
+        invalidate_cart_summary(user_id)
+        return quantity
+
+    def set_many(self, user_id, lines):
+        with transaction.atomic():
+            operations.set_quantities(operations.get_cart_id(user_id), lines)
+        invalidate_cart_summary(user_id)
+
+    def remove(self, user_id, product_id, missing_ok=False):
+        operations.remove_item(operations.get_cart_id(user_id), product_id, missing_ok)
+        invalidate_cart_summary(user_id)
+
+    def clear(self, user_id):
+        # 一条 DELETE，不需要先查购物车ID
+        CartItem.objects.filter(cart__user_id=user_id).delete()
+        invalidate_cart_summary(user_id)
+
+    def merge(self, user_id, quantities):
+        with transaction.atomic():
+            cart_id = operations.get_cart_id(user_id)
+            if quantities:
+                add_cart_items({cart_id: quantities})
+        invalidate_cart_summary(user_id)
+
+    def summary(self, user_id):
+        return get_cart_summary(user_id)
+
+    def snapshot(self, user_id):
+        snapshot = CartSnapshot.for_user_id(user_id)
+        # 顺便校正缓存的摘要（商品价格可能已变化）
+        set_cart_summary(user_id, snapshot.summary())
+        return snapshot
+
+
+class RedisCartStore(CartStore):
+    """
+    Redis 哈希购物车存储（write-behind）
+    哈希中固定保存一个占位字段，用来区分“空购物车”和“尚未从数据库加载”
+    """
+    ITEMS_KEY = 'cart:items:{user_id}'
+    DIRTY_KEY = 'cart:dirty'
+    LOADED_FIELD = '_'
+    ITEMS_TTL = 60 * 60 * 24 * 30
+
+    # 条件累加：累加后超过库存返回 -1，否则写入新数量并标记为待持久化
+    ADD_SCRIPT = """
+    local quantity = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0') + tonumber(ARGV[2])
+    if quantity > tonumber(ARGV[3]) then
+        return -1
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], quantity)
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    redis.call('SADD', KEYS[2], ARGV[4])
+    return quantity
+    """
+
+    def __init__(self):
+        try:
+            from django_redis import get_redis_connection
+            self.redis = get_redis_connection('default')
+        except Exception as e:
+            raise ImproperlyConfigured(f'RedisCartStore 需要 django-redis 缓存后端: {e}')
+        self._add = self.redis.register_script(self.ADD_SCRIPT)
+
+    def _key(self, user_id):
+        return self.ITEMS_KEY.format(user_id=user_id)
+
+    def _ensure_loaded(self, user_id):
+        """Redis 中没有该用户的购物车时，从数据库加载一次"""
+        key = self._key(user_id)
+        if self.redis.exists(key):
+            return
+        items = DatabaseCartStore().get_items(user_id)
+        pipe = self.redis.pipeline()
+        pipe.hsetnx(key, self.LOADED_FIELD, 1)
+        for product_id, quantity in items.items():
+            pipe.hsetnx(key, product_id, quantity)
+        pipe.expire(key, self.ITEMS_TTL)
+        pipe.execute()
+
+    def _mark_dirty(self, pipe, user_id):
+        """在管道中续期购物车并标记为待持久化，同时失效摘要缓存"""
+        pipe.expire(self._key(user_id), self.ITEMS_TTL)
+        pipe.sadd(self.DIRTY_KEY, user_id)
+        invalidate_cart_summary(user_id)
+
+    def get_items(self, user_id):
+        self._ensure_loaded(user_id)
+        raw = self.redis.hgetall(self._key(user_id))
+        return {
+            int(product_id): int(quantity)
+            for product_id, quantity in raw.items()
+            if product_id.decode() != self.LOADED_FIELD
+        }
+
+    def add(self, user_id, product, quantity):
+        if quantity < 1:
+            raise CartOperationError('数量必须大于0')
+        self._ensure_loaded(user_id)
+        result = self._add(
+            keys=[self._key(user_id), self.DIRTY_KEY],
+            args=[product.id, quantity, product.available_stock, user_id, self.ITEMS_TTL],
+        )
+        if result < 0:
+            raise CartOperationError(f'库存不足，仅剩 {product.available_stock} 件')
+        invalidate_cart_summary(user_id)
+        return int(result)
+
+    def set(self, user_id, product, quantity):
+        if quantity < 0:
+            raise CartOperationError('数量不能为负数')
+        if quantity == 0:
+            self.remove(user_id, product.id, missing_ok=True)
+            return 0
+        if quantity > product.available_stock:
+            raise CartOperationError(f'库存不足，仅剩 {product.available_stock} 件')
+        self._ensure_loaded(user_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(user_id), product.id, quantity)
+        self._mark_dirty(pipe, user_id)
+        pipe.execute()
+        return quantity
+
+    def set_many(self, user_id, lines):
+        operations.check_quantities(lines)
+        self._ensure_loaded(user_id)
+        key = self._key(user_id)
+        pipe = self.redis.pipeline()
+        for product, quantity in lines:
+            if quantity:
+                pipe.hset(key, product.id, quantity)
+            else:
+                pipe.hdel(key, product.id)
+        self._mark_dirty(pipe, user_id)
+        pipe.execute()
+
+    def remove(self, user_id, product_id, missing_ok=False):
+        self._ensure_loaded(user_id)
+        pipe = self.redis.pipeline()
+        pipe.hdel(self._key(user_id), product_id)
+        self._mark_dirty(pipe, user_id)
+        deleted = pipe.execute()[0]
+        if not deleted and not missing_ok:
+            raise CartOperationError('商品不在购物车中')
+
+    def clear(self, user_id):
+        key = self._key(user_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, self.LOADED_FIELD, 1)
+        self._mark_dirty(pipe, user_id)
+        pipe.execute()
+
+    def merge(self, user_id, quantities):
+        self._ensure_loaded(user_id)
+        product_ids = Product.objects.only('id').in_bulk(list(quantities)).keys()
+        if not product_ids:
+            return
+        pipe = self.redis.pipeline()
+        for product_id in product_ids:
+            pipe.hincrby(self._key(user_id), product_id, quantities[product_id])
+        self._mark_dirty(pipe, user_id)
+        pipe.execute()
+
+    def summary(self, user_id):
+        return get_cart_summary(user_id, compute=lambda: summarize_quantities(self.get_items(user_id)))
+
+    def snapshot(self, user_id):
+        snapshot = CartSnapshot.from_quantities(self.get_items(user_id))
+        set_cart_summary(user_id, snapshot.summary())
+        return snapshot
+
+    def pop_dirty(self, count):
+        """取出一批待持久化的用户ID"""
+        return [int(user_id) for user_id in self.redis.spop(self.DIRTY_KEY, count) or []]
+
+    def restore_dirty(self, user_ids):
+        """持久化失败时把用户ID放回待持久化集合"""
+        if user_ids:
+            self.redis.sadd(self.DIRTY_KEY, *user_ids)
+
+    def persist(self, user_ids):
+        """
+        把一批用户的 Redis 购物车整体写回数据库（以 Redis 为准覆盖 CartItem）
+        返回写入的购物车项数量
+        """
+        pipe = self.redis.pipeline()
+        for user_id in user_ids:
+            pipe.hgetall(self._key(user_id))
+        carts = {}
+        for user_id, raw in zip(user_ids, pipe.execute()):
+            # 哈希已过期（没有占位字段）时不能当作空购物车覆盖数据库
+            if not raw:
+                continue
+            carts[user_id] = {
+                int(product_id): int(quantity)
+                for product_id, quantity in raw.items()
+                if product_id.decode() != self.LOADED_FIELD and int(quantity) > 0
+            }
+        if not carts:
+            return 0
+
+        with transaction.atomic():
+            Cart.objects.bulk_create([Cart(user_id=user_id) for user_id in carts], ignore_conflicts=True)
+            cart_ids = dict(Cart.objects.filter(user_id__in=list(carts)).values_list('user_id', 'id'))
+            existing_products = set(Product.objects.filter(
+                id__in={product_id for items in carts.values() for product_id in items}
+            ).values_list('id', flat=True))
+            CartItem.objects.filter(cart_id__in=list(cart_ids.values())).delete()
+            items = [
+                CartItem(cart_id=cart_ids[user_id], product_id=product_id, quantity=quantity)
+                for user_id, quantities in carts.items()
+                for product_id, quantity in quantities.items()
+                if product_id in existing_products
+            ]
+            CartItem.objects.bulk_create(items)
+        return len(items)
+
+
+@lru_cache(maxsize=None)
+def _load_store(backend):
+    return import_string(backend)()
+
+
+def get_cart_store():
+    """返回 settings.CART_STORE_BACKEND 指定的购物车存储实例"""
+    return _load_store(getattr(settings, 'CART_STORE_BACKEND', DEFAULT_CART_STORE_BACKEND))
@@ -0,0 +1,75 @@
+# cart/summary.py
+"""
+登录用户购物车摘要（商品种类数、总数量、小计）
+
+导航栏角标每个页面都要显示，不能每次都反查 user.cart 再对 CartItem 做 Sum 聚合。
+摘要按用户缓存，购物车写操作（加购、改数量、移除、清空、合并、下单）之后失效，
+渲染购物车页时由购物车快照直接写回；页面渲染时只读缓存，缓存缺失时才用一次聚合查询补齐。
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from shop.models import Product
+from .models import CartItem
+
+CART_SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(user_id):
+    return f'cart:summary:{user_id}'
+
+
+def compute_cart_summary(user_id):
+    """用一次聚合查询计算购物车摘要"""
+    result = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+        total_items=Count('id'),
+        total_quantity=Sum('quantity'),
+        total_price=Sum(F('product__price') * F('quantity')),
+    )
+    return {
+        'item_count': result['total_items'],
+        'quantity': result['total_quantity'] or 0,
+        'subtotal': Decimal(result['total_price'] or 0).quantize(Decimal('0.01')),
+    }
+
+
+def summarize_quantities(quantities):
+    """由 {product_id: quantity} 计算摘要，只查询一次商品价格（用于不在数据库中的购物车）"""
+    prices = dict(Product.objects.filter(id__in=list(quantities)).values_list('id', 'price'))
+    lines = [(prices[product_id], quantity) for product_id, quantity in quantities.items() if product_id in prices]
+    return {
+        'item_count': len(lines),
+        'quantity': sum(quantity for _, quantity in lines),
+        'subtotal': sum((price * quantity for price, quantity in lines), Decimal('0.00')),
+    }
+
+
+def get_cart_summary(user_id, compute=None):
+    """
+    读取购物车摘要，缓存缺失时计算并写入缓存
+    compute 为缓存缺失时的计算函数，默认对数据库购物车做一次聚合查询
+    """
+    key = _cache_key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute() if compute else compute_cart_summary(user_id)
+        cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def set_cart_summary(user_id, summary):
+    """已知准确摘要（如刚构建的购物车快照）时直接写入缓存"""
+    cache.set(_cache_key(user_id), summary, CART_SUMMARY_TIMEOUT)
+
+
+def invalidate_cart_summary(user_id):
+    """
+    购物车写操作之后失效摘要，下次读取时重新计算（批量修改多行时也只计算一次）
+    立即删除一次，事务提交后再删除一次，避免事务提交前被其他请求用旧数据重新填充
+    """
+    key = _cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,26 @@
+# cart/tasks.py
+from celery import shared_task
+
+
+@shared_task
+def persist_dirty_carts(batch_size=500, max_batches=100):
+    """把 Redis 中被修改过的购物车批量写回数据库（仅 RedisCartStore 需要，celery beat 每分钟执行一次，见 settings.CELERY_BEAT_SCHEDULE）"""
+    from .stores import RedisCartStore, get_cart_store
+
+    store = get_cart_store()
+    if not isinstance(store, RedisCartStore):
+        return "Cart store is not Redis, nothing to persist"
+
+    persisted = 0
+    for _ in range(max_batches):
+        user_ids = store.pop_dirty(batch_size)
+        if not user_ids:
+            break
+        try:
+            store.persist(user_ids)
+        except Exception:
+            # 写回失败时放回待持久化集合，下次重试
+            store.restore_dirty(user_ids)
+            raise
+        persisted += len(user_ids)
+    return f"Persisted {persisted} carts"
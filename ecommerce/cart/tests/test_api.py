@@ -0,0 +1,123 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop.models import Product, Category
+from cart.models import Cart, CartItem
+from cart.summary import get_cart_summary
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCartApi:
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(
+            category=category, name='iPhone 13', slug='iphone-13', price=Decimal('5999.00'), stock=5
+        )
+        self.case = Product.objects.create(
+            category=category, name='手机壳', slug='case', price=Decimal('99.00'), stock=10
+        )
+        self.cart = Cart.objects.get(user=self.user)
+
+    def _post(self, name, data=None, *args):
+        return self.client.post(
+            reverse(f'cart:{name}', args=args), json.dumps(data or {}), content_type='application/json'
+        )
+
+    def _quantities(self):
+        return dict(self.cart.items.values_list('product_id', 'quantity'))
+
+    def test_add_returns_delta(self):
+        """测试添加商品只返回变化的行和新合计"""
+        self._post('api_add', {'quantity': 2}, self.phone.id)
+        response = self._post('api_add', {'quantity': 1}, self.phone.id)
+        data = response.json()
+        assert data['lines'] == [{
+            'product_id': self.phone.id, 'quantity': 3, 'price': '5999.00', 'total_price': '17997.00'
+        }]
+        assert data['totals'] == {'item_count': 1, 'quantity': 3, 'subtotal': '17997.00'}
+        assert data['badge'] == 3
+        assert get_cart_summary(self.user.id)['quantity'] == 3
+
+    def test_add_beyond_stock_rejected(self):
+        """测试累加后超过库存时拒绝修改"""
+        CartItem.objects.create(cart=self.cart, product=self.phone, quantity=4)
+        response = self._post('api_add', {'quantity': 2}, self.phone.id)
+        assert response.status_code == 400
+        assert '库存不足' in response.json()['error']
+        assert self._quantities() == {self.phone.id: 4}
+
+    def test_update_and_remove(self):
+        """测试设置数量与移除商品"""
+        CartItem.objects.create(cart=self.cart, product=self.case, quantity=1)
+        response = self._post('api_update', {'quantity': 4}, self.case.id)
+        assert response.json()['totals']['subtotal'] == '396.00'
+
+        response = self._post('api_remove', None, self.case.id)
+        assert response.json()['badge'] == 0
+        assert self._post('api_remove', None, self.case.id).status_code == 404
+
+    def test_batch_is_atomic(self):
+        """测试批量修改在一个事务中完成，任一行失败全部回滚"""
+        CartItem.objects.create(cart=self.cart, product=self.case, quantity=1)
+        response = self._post('api_batch', {'lines': [
+            {'product_id': self.phone.id, 'quantity': 2},
+            {'product_id': self.case.id, 'quantity': 0},
+        ]})
+        assert response.status_code == 200
+        assert self._quantities() == {self.phone.id: 2}
+
+        response = self._post('api_batch', {'lines': [
+            {'product_id': self.case.id, 'quantity': 3},
+            {'product_id': self.phone.id, 'quantity': 99},
+        ]})
+        assert response.status_code == 400
+        assert self._quantities() == {self.phone.id: 2}
+
+    def test_api_products_load_available_stock(self):
+        """测试接口取出的商品读取可售库存时不再逐个查询 reserved"""
+        from cart.views import _get_api_products
+        products = _get_api_products([self.phone.id, self.case.id])
+        with CaptureQueriesContext(connection) as queries:
+            stocks = [product.available_stock for product in products.values()]
+        assert len(queries) == 0
+        assert sorted(stocks) == [5, 10]
+
+    def test_batch_query_count_is_constant(self, django_assert_num_queries):
+        """测试批量修改的查询数不随行数增加"""
+        category = self.phone.category
+        products = [
+            Product.objects.create(category=category, name=f'配件{i}', slug=f'part-{i}', price=Decimal('10.00'), stock=10)
+            for i in range(6)
+        ]
+        CartItem.objects.create(cart=self.cart, product=products[0], quantity=1)
+        lines = [{'product_id': product.id, 'quantity': 2} for product in products]
+        lines[0]['quantity'] = 0
+        self._post('api_batch', {'lines': lines[:2]})
+
+        with CaptureQueriesContext(connection) as small:
+            self._post('api_batch', {'lines': lines[:2]})
+        with django_assert_num_queries(len(small)):
+            response = self._post('api_batch', {'lines': lines})
+        assert response.status_code == 200
+        assert self._quantities() == {product.id: 2 for product in products[1:]}
+
+    def test_clear(self):
+        """测试清空购物车"""
+        CartItem.objects.create(cart=self.cart, product=self.case, quantity=1)
+        response = self._post('api_clear')
+        assert response.json()['totals']['item_count'] == 0
+        assert self._quantities() == {}
@@ -1,7 +1,16 @@
 import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.http import HttpResponse
 from django.test import RequestFactory
 from shop.models import Product, Category
-from cart.cart import Cart
+from cart.cart import Cart, dumps_cart
+from cart.middleware import CartCookieMiddleware
+from cart.models import CartItem
+from cart.signals import merge_session_cart_on_login
+
+User = get_user_model()
 
 
 @pytest.mark.django_db
@@ -140,4 +149,98 @@ class TestCartClass:
             assert 'product' in item
             assert 'quantity' in item
             assert 'price' in item
-            assert 'total_price' in item
\ No newline at end of file
+            assert 'total_price' in item
+    def test_session_payload_is_compact(self):
+        """测试session中只保存 [数量, 价格(分)]，迭代后也不会写入商品实例"""
+        import json
+        request = self.factory.get('/')
+        request.session = {}
+        cart = Cart(request)
+
+        cart.add(self.product1, quantity=2)
+        cart.add(self.product2, quantity=1)
+        items = list(cart)
+
+        assert request.session['cart'] == {
+            str(self.product1.id): [2, 599900],
+            str(self.product2.id): [1, 1299900],
+        }
+        assert items[0]['price'] == Decimal('5999.00')
+        # 可以直接 JSON 序列化，体积只有几十字节
+        assert len(json.dumps(request.session['cart'])) < 100
+
+    def test_legacy_session_format(self):
+        """测试兼容旧的 {'quantity', 'price'} session格式"""
+        request = self.factory.get('/')
+        request.session = {'cart': {str(self.product1.id): {'quantity': 2, 'price': '5999.00'}}}
+        cart = Cart(request)
+
+        assert len(cart) == 2
+        assert cart.get_total_price() == Decimal('11998.00')
+        cart.add(self.product1, quantity=1)
+        assert request.session['cart'] == {str(self.product1.id): [3, 599900]}
+
+
+@pytest.mark.django_db
+class TestCookieGuestCart:
+    @pytest.fixture(autouse=True)
+    def cookie_mode(self, settings):
+        settings.CART_GUEST_STORAGE = 'cookie'
+        self.settings = settings
+
+    def setup_method(self):
+        self.factory = RequestFactory()
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.product = Product.objects.create(
+            category=self.category, name='iPhone 13', slug='iphone-13', price=5999.00, stock=100
+        )
+
+    def _request(self, cookies=None):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        request.session = SessionStore()
+        return request
+
+    def _respond(self, request):
+        return CartCookieMiddleware(lambda request: HttpResponse())(request)
+
+    def test_cart_stored_in_signed_cookie(self):
+        """测试cookie模式下加购不访问session，下一个请求从cookie读取购物车"""
+        request = self._request()
+        Cart(request).add(self.product, quantity=2)
+        # 同一请求中新建的购物车能读到刚保存的数据
+        assert len(Cart(request)) == 2
+        assert not request.session.accessed
+        response = self._respond(request)
+
+        value = response.cookies['cart'].value
+        request = self._request({'cart': value})
+        cart = Cart(request)
+        assert len(cart) == 2
+        assert cart.get_total_price() == Decimal('11998.00')
+        assert not request.session.accessed
+
+    def test_tampered_cookie_ignored(self):
+        """测试签名无效的cookie被忽略"""
+        request = self._request({'cart': 'tampered'})
+        assert len(Cart(request)) == 0
+
+    def test_oversized_cart_falls_back_to_session(self):
+        """测试超过cookie大小限制时退回session并删除cookie"""
+        self.settings.CART_COOKIE_MAX_SIZE = 10
+        request = self._request()
+        Cart(request).add(self.product, quantity=1)
+        assert request.session['cart'] == {str(self.product.id): [1, 599900]}
+        response = self._respond(request)
+        assert response.cookies['cart'].value == ''
+
+    def test_login_merges_cookie_cart(self):
+        """测试登录时合并cookie中的购物车并删除cookie"""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        request = self._request({'cart': dumps_cart({str(self.product.id): [3, 599900]})})
+        merge_session_cart_on_login(sender=User, request=request, user=user)
+
+        assert dict(CartItem.objects.filter(cart__user=user).values_list('product_id', 'quantity')) == {
+            self.product.id: 3
+        }
+        assert request._cart_cookie == ''
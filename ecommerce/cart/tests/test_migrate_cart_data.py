@@ -0,0 +1,71 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from cart.management.commands.migrate_cart_data import KEY_ALPHABET, key_ranges, migrate_db_range
+from cart.models import Cart, CartItem
+from shop.models import Category, Product
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestMigrateCartData:
+    def setup_method(self):
+        cache.clear()
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(category=self.category, name='手机', slug='phone', price=100, stock=10)
+        self.case = Product.objects.create(category=self.category, name='手机壳', slug='case', price=10, stock=10)
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass123')
+
+    def _session(self, key, data):
+        Session.objects.create(
+            session_key=key,
+            session_data=SessionStore().encode(data),
+            expire_date=timezone.now() + timedelta(days=1),
+        )
+
+    def _quantities(self, user):
+        return dict(CartItem.objects.filter(cart__user=user).values_list('product_id', 'quantity'))
+
+    def test_key_ranges_cover_alphabet(self):
+        """测试键区间首尾相接，覆盖全部 session_key"""
+        ranges = key_ranges(4)
+        assert ranges[0][0] == '' and ranges[-1][1] is None
+        assert [end for _, end in ranges[:-1]] == [start for start, _ in ranges[1:]]
+        assert len(key_ranges(100)) == len(KEY_ALPHABET)
+
+    def test_migrate_in_chunks(self):
+        """测试分块迁移：两种购物车格式、匿名session与不存在的用户/商品被跳过"""
+        self._session('a' * 32, {'_auth_user_id': str(self.alice.id), 'cart': {str(self.phone.id): 2}})
+        self._session('b' * 32, {
+            '_auth_user_id': str(self.bob.id),
+            'cart': {str(self.case.id): {'quantity': 3, 'price': '10.00'}, '999999': 1},
+        })
+        self._session('c' * 32, {'cart': {str(self.phone.id): 5}})
+        self._session('d' * 32, {'_auth_user_id': '999999', 'cart': {str(self.phone.id): 1}})
+        self._session('e' * 32, {'_auth_user_id': str(self.alice.id), 'cart': {str(self.phone.id): 1}})
+
+        call_command('migrate_cart_data', '--chunk-size', '2', stdout=StringIO())
+
+        assert self._quantities(self.alice) == {self.phone.id: 3}
+        assert self._quantities(self.bob) == {self.case.id: 3}
+        assert Cart.objects.count() == 2
+
+    def test_resume_from_checkpoint(self):
+        """测试从断点继续时跳过已迁移的session"""
+        self._session('a' * 32, {'_auth_user_id': str(self.alice.id), 'cart': {str(self.phone.id): 2}})
+        migrate_db_range('', None, chunk_size=1)
+        self._session('b' * 32, {'_auth_user_id': str(self.bob.id), 'cart': {str(self.case.id): 1}})
+
+        assert migrate_db_range('', None, chunk_size=1, resume=True) == 1
+        assert self._quantities(self.alice) == {self.phone.id: 2}
+        assert self._quantities(self.bob) == {self.case.id: 1}
@@ -3,6 +3,7 @@ import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from cart.models import Cart, CartItem
+from cart.utils import merge_carts
 from shop.models import Product, Category
 from django.test import Client
 
@@ -111,4 +112,43 @@ class TestPersistentCart:
         self.client.post(reverse('cart:cart_clear'))
 
         cart = Cart.objects.get(user=self.user)
-        assert cart.items.count() == 0
\ No newline at end of file
+        assert cart.items.count() == 0
+
+@pytest.mark.django_db
+class TestMergeCarts:
+    def setup_method(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.products = [
+            Product.objects.create(category=self.category, name=f'商品{i}', slug=f'product-{i}', price=10, stock=10)
+            for i in range(5)
+        ]
+        self.cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=2)
+
+    def _quantities(self):
+        return dict(self.cart.items.values_list('product_id', 'quantity'))
+
+    def test_merge_plain_quantities(self):
+        """测试合并 {'id': qty} 格式的session购物车，已有商品数量相加，不存在的商品跳过"""
+        session_cart = {str(p.id): 1 for p in self.products}
+        session_cart['999999'] = 3
+        assert merge_carts(session_cart, self.user)
+        quantities = self._quantities()
+        assert quantities[self.products[0].id] == 3
+        assert len(quantities) == 5
+
+    def test_merge_dict_shape(self):
+        """测试合并 {'id': {'quantity', 'price'}} 格式的session购物车"""
+        session_cart = {
+            str(self.products[0].id): {'quantity': 4, 'price': '10.00'},
+            str(self.products[1].id): {'quantity': 1, 'price': '10.00'},
+        }
+        merge_carts(session_cart, self.user)
+        assert self._quantities() == {self.products[0].id: 6, self.products[1].id: 1}
+
+    def test_merge_query_count_is_constant(self, django_assert_max_num_queries):
+        """测试合并的查询数与商品数量无关"""
+        session_cart = {str(p.id): 1 for p in self.products}
+        with django_assert_max_num_queries(8):
+            merge_carts(session_cart, self.user)
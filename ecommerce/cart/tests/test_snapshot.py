@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop.models import Product, Category
+from cart.models import Cart, CartItem
+from cart.snapshot import CartSnapshot
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCartSnapshot:
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(
+            category=category, name='iPhone 13', slug='iphone-13', price=Decimal('5999.00'), stock=10
+        )
+        self.case = Product.objects.create(
+            category=category, name='手机壳', slug='case', price=Decimal('99.00'), stock=1
+        )
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=2)
+        CartItem.objects.create(cart=cart, product=self.case, quantity=3)
+
+    def test_totals_and_warnings(self):
+        """测试快照的总价、数量和库存提示"""
+        snapshot = CartSnapshot.for_user(self.user)
+        assert snapshot.item_count == 2
+        assert snapshot.quantity == 5
+        assert snapshot.subtotal == Decimal('12295.00')
+        assert [line.product for line in snapshot.warnings] == [self.case]
+        assert snapshot.warnings[0].stock_warning == '库存不足，仅剩 1 件'
+        assert not snapshot.can_checkout
+
+    def test_cart_detail_single_query(self):
+        """测试购物车详情页只查询一次购物车项"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart:cart_detail'))
+        assert response.status_code == 200
+        cart_queries = [q for q in queries.captured_queries if 'cart_cartitem' in q['sql']]
+        assert len(cart_queries) == 1
+        content = response.content.decode()
+        assert '12295.00' in content
+        assert '库存不足' in content
+
+    def test_checkout_blocked_when_out_of_stock(self):
+        """测试库存不足时不能提交订单"""
+        response = self.client.post(reverse('orders:order_create'), {
+            'first_name': '张', 'last_name': '三', 'email': 'zhangsan@example.com',
+            'address': '北京市朝阳区', 'postal_code': '100000', 'city': '北京',
+        })
+        assert response.status_code == 302
+        assert response.url == reverse('cart:cart_detail')
+        assert CartItem.objects.filter(cart__user=self.user).count() == 2
@@ -0,0 +1,154 @@
+import pytest
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+
+from shop.models import Product, Category
+from cart.models import Cart, CartItem
+from cart.operations import CartOperationError
+from cart.stores import DatabaseCartStore, RedisCartStore
+from cart.tasks import persist_dirty_carts
+
+User = get_user_model()
+
+
+class FakeRedis:
+    """测试用的内存 Redis，只实现购物车存储用到的哈希和集合命令"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.sets = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        def add(keys, args):
+            product_id, quantity, stock, user_id, _ = args
+            items = self.hashes.setdefault(keys[0], {})
+            quantity = int(items.get(str(product_id).encode(), 0)) + quantity
+            if quantity > stock:
+                return -1
+            items[str(product_id).encode()] = str(quantity).encode()
+            self.sadd(keys[1], user_id)
+            return quantity
+        return add
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def expire(self, key, ttl):
+        return True
+
+    def delete(self, key):
+        return int(self.hashes.pop(key, None) is not None)
+
+    def hsetnx(self, key, field, value):
+        items = self.hashes.setdefault(key, {})
+        if str(field).encode() in items:
+            return 0
+        items[str(field).encode()] = str(value).encode()
+        return 1
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[str(field).encode()] = str(value).encode()
+
+    def hdel(self, key, field):
+        return int(self.hashes.get(key, {}).pop(str(field).encode(), None) is not None)
+
+    def hincrby(self, key, field, amount):
+        items = self.hashes.setdefault(key, {})
+        value = int(items.get(str(field).encode(), 0)) + amount
+        items[str(field).encode()] = str(value).encode()
+        return value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(str(m).encode() for m in members)
+
+    def spop(self, key, count):
+        members = self.sets.get(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.calls.append((name, args))
+        return command
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+@pytest.mark.django_db
+class TestCartStores:
+    def setup_method(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(category=category, name='手机', slug='phone', price=100, stock=5)
+        self.case = Product.objects.create(category=category, name='手机壳', slug='case', price=10, stock=50)
+        self.cart = Cart.objects.get(user=self.user)
+
+    def _redis_store(self):
+        store = RedisCartStore.__new__(RedisCartStore)
+        store.redis = FakeRedis()
+        store._add = store.redis.register_script(RedisCartStore.ADD_SCRIPT)
+        return store
+
+    def _db_quantities(self):
+        return dict(self.cart.items.values_list('product_id', 'quantity'))
+
+    @pytest.mark.parametrize('backend', ['db', 'redis'])
+    def test_same_interface(self, backend):
+        """测试两种存储的读写行为一致"""
+        store = DatabaseCartStore() if backend == 'db' else self._redis_store()
+        assert store.add(self.user.id, self.phone, 2) == 2
+        assert store.add(self.user.id, self.phone, 1) == 3
+        with pytest.raises(CartOperationError):
+            store.add(self.user.id, self.phone, 3)
+        store.set(self.user.id, self.case, 4)
+        assert store.get_items(self.user.id) == {self.phone.id: 3, self.case.id: 4}
+        assert store.summary(self.user.id)['quantity'] == 7
+        assert store.snapshot(self.user.id).subtotal == 340
+
+        store.remove(self.user.id, self.phone.id)
+        with pytest.raises(CartOperationError):
+            store.remove(self.user.id, self.phone.id)
+        store.merge(self.user.id, {self.case.id: 1, 999999: 1})
+        assert store.get_items(self.user.id) == {self.case.id: 5}
+        store.set_many(self.user.id, [(self.phone, 2), (self.case, 0)])
+        assert store.get_items(self.user.id) == {self.phone.id: 2}
+        with pytest.raises(CartOperationError):
+            store.set_many(self.user.id, [(self.case, 1), (self.phone, 6)])
+        assert store.get_items(self.user.id) == {self.phone.id: 2}
+        store.clear(self.user.id)
+        assert store.get_items(self.user.id) == {}
+
+    def test_redis_store_loads_from_db_and_writes_behind(self, monkeypatch):
+        """测试 Redis 存储首次读取时从数据库加载，修改由定时任务批量写回"""
+        CartItem.objects.create(cart=self.cart, product=self.phone, quantity=1)
+        store = self._redis_store()
+        assert store.get_items(self.user.id) == {self.phone.id: 1}
+
+        store.set(self.user.id, self.case, 2)
+        store.remove(self.user.id, self.phone.id)
+        # 写回之前数据库不变
+        assert self._db_quantities() == {self.phone.id: 1}
+
+        monkeypatch.setattr('cart.stores.get_cart_store', lambda: store)
+        persist_dirty_carts()
+        assert self._db_quantities() == {self.case.id: 2}
+        assert store.pop_dirty(10) == []
+
+    def test_persist_task_scheduled(self):
+        """测试定时任务配置中包含写回 Redis 购物车的任务"""
+        from django.conf import settings
+        tasks = {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        assert persist_dirty_carts.name in tasks
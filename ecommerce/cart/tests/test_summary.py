@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop.models import Product, Category
+from cart.models import Cart, CartItem
+from cart.summary import get_cart_summary
+from cart.utils import merge_carts
+
+User = get_user_model()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCartSummary:
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(
+            category=self.category, name='iPhone 13', slug='iphone-13', price=Decimal('5999.00'), stock=100
+        )
+        self.case = Product.objects.create(
+            category=self.category, name='手机壳', slug='case', price=Decimal('99.00'), stock=100
+        )
+
+    def test_summary_follows_cart_writes(self):
+        """测试加购、改数量、移除、清空后摘要同步更新"""
+        self.client.post(reverse('cart:cart_add', args=[self.phone.id]), {'quantity': 2})
+        self.client.post(reverse('cart:cart_add', args=[self.case.id]), {'quantity': 1})
+        assert get_cart_summary(self.user.id) == {
+            'item_count': 2, 'quantity': 3, 'subtotal': Decimal('12097.00')
+        }
+
+        self.client.post(reverse('cart:cart_update', args=[self.phone.id]), {'quantity': 1})
+        assert get_cart_summary(self.user.id)['quantity'] == 2
+
+        self.client.post(reverse('cart:cart_remove', args=[self.case.id]))
+        assert get_cart_summary(self.user.id)['item_count'] == 1
+
+        self.client.post(reverse('cart:cart_clear'))
+        assert get_cart_summary(self.user.id)['quantity'] == 0
+
+    def test_merge_refreshes_summary(self):
+        """测试合并session购物车后摘要更新"""
+        get_cart_summary(self.user.id)
+        merge_carts({str(self.case.id): 3}, self.user)
+        assert get_cart_summary(self.user.id)['quantity'] == 3
+
+    def test_badge_rendered_without_cart_item_query(self):
+        """测试导航栏角标来自缓存摘要，不查询购物车项"""
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=4)
+        get_cart_summary(self.user.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shop:product_list'))
+        assert '<span class="badge bg-danger">4</span>' in response.content.decode()
+        assert not any('cart_cartitem' in q['sql'] for q in queries.captured_queries)
@@ -1,7 +1,15 @@
 import pytest
-from django.test import Client
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cache import SessionStore
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from shop.models import Product, Category
+from cart.context_processors import cart as cart_processor
+
+User = get_user_model()
 
 
 @pytest.mark.django_db
@@ -50,4 +58,37 @@ class TestCartTemplates:
 
         response = self.client.get(reverse('shop:product_list'))
         # 检查上下文处理器是否工作
-        assert 'cart' in response.context
\ No newline at end of file
+        assert 'cart' in response.context
+
+@pytest.mark.django_db
+class TestLazyCartContextProcessor:
+    def setup_method(self):
+        self.factory = RequestFactory()
+
+    def _request(self, user):
+        request = self.factory.get('/')
+        request.session = SessionStore()
+        request.user = user
+        return request
+
+    def test_unused_cart_costs_nothing(self):
+        """测试模板未使用购物车时不查询数据库、不修改session"""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        request = self._request(user)
+        with CaptureQueriesContext(connection) as queries:
+            context = cart_processor(request)
+        assert len(queries) == 0
+        assert not request.session.modified
+        # 用到时才加载购物车（一次查询构建快照）
+        with CaptureQueriesContext(connection) as queries:
+            assert len(context['cart']) == 0
+        assert len(queries) == 1
+
+    def test_guest_summary_from_session(self):
+        """测试未登录用户的购物车摘要由session购物车计算"""
+        request = self._request(AnonymousUser())
+        request.session['cart'] = {'1': {'quantity': 2, 'price': '10.00'}}
+        request.session.modified = False
+        context = cart_processor(request)
+        assert context['cart_summary']['quantity'] == 2
+        assert not request.session.modified
@@ -9,4 +9,10 @@ urlpatterns = [
     path('remove/<int:product_id>/', views.cart_remove, name='cart_remove'),
     path('clear/', views.cart_clear, name='cart_clear'),
     path('update/<int:product_id>/', views.cart_update, name='cart_update'),
+    # JSON 接口
+    path('api/add/<int:product_id>/', views.cart_api_add, name='api_add'),
+    path('api/update/<int:product_id>/', views.cart_api_update, name='api_update'),
+    path('api/remove/<int:product_id>/', views.cart_api_remove, name='api_remove'),
+    path('api/clear/', views.cart_api_clear, name='api_clear'),
+    path('api/batch/', views.cart_api_batch, name='api_batch'),
 ]
\ No newline at end of file
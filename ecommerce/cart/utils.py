@@ -1,51 +1,84 @@
 # cart/utils.py
+from django.db import transaction
+
 from .models import Cart, CartItem
 from shop.models import Product
 
 
-def merge_carts(session_cart, user):
+def session_cart_quantities(session_cart):
     """
-    将session购物车数据合并到用户数据库购物车中
+    解析session购物车，返回 {product_id: quantity}
+    兼容三种格式：{'id': [qty, price_cents]}（当前的紧凑格式，见 cart.cart.Cart）、
+    {'id': qty} 和 {'id': {'quantity': qty, 'price': '...'}}
     """
-    if not session_cart:
-        return
+    quantities = {}
+    for product_id, value in session_cart.items():
+        if isinstance(value, dict):
+            quantity = value.get('quantity')
+        elif isinstance(value, (list, tuple)):
+            quantity = value[0] if value else None
+        else:
+            quantity = value
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
 
-    try:
-        # 获取或创建用户购物车
-        user_cart, created = Cart.objects.get_or_create(user=user)
-
-        merged_items = 0
 
-        # 遍历session购物车中的商品
-        for product_id, quantity in session_cart.items():
-            try:
-                product = Product.objects.get(id=product_id)
+def add_cart_items(cart_quantities):
+    """
+    批量把商品数量累加到多个数据库购物车中，cart_quantities 为 {cart_id: {product_id: quantity}}
+    一次 in_bulk 查商品、一次查询已有购物车项、一次 bulk_create 批量写入，需在事务中调用
+    返回写入的购物车项数量
+    """
+    product_ids = {product_id for quantities in cart_quantities.values() for product_id in quantities}
+    # 不存在的商品直接跳过
+    product_ids = Product.objects.only('id').in_bulk(list(product_ids)).keys()
+    if not product_ids:
+        return 0
 
-                # 检查商品是否已在用户购物车中
-                cart_item, item_created = CartItem.objects.get_or_create(
-                    cart=user_cart,
-                    product=product,
-                    defaults={'quantity': quantity}
-                )
+    existing = {
+        (cart_id, product_id): quantity
+        for cart_id, product_id, quantity in CartItem.objects.select_for_update()
+        .filter(cart_id__in=list(cart_quantities), product_id__in=product_ids)
+        .values_list('cart_id', 'product_id', 'quantity')
+    }
+    # 已存在的商品合并数量（相加）
+    items = [
+        CartItem(
+            cart_id=cart_id,
+            product_id=product_id,
+            quantity=existing.get((cart_id, product_id), 0) + quantity,
+        )
+        for cart_id, quantities in cart_quantities.items()
+        for product_id, quantity in quantities.items()
+        if product_id in product_ids
+    ]
+    CartItem.objects.bulk_create(
+        items,
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+    return len(items)
 
-                if not item_created:
-                    # 如果已存在，合并数量（取最大值或相加，这里选择相加）
-                    cart_item.quantity += quantity
-                    cart_item.save()
 
-                merged_items += 1
-                # print(f"✅ 合并商品: {product.name} x {quantity}")
+def merge_carts(session_cart, user):
+    """
+    将session购物车数据合并到用户购物车中（经由当前配置的购物车存储），成功返回 True
+    """
+    if not session_cart:
+        return
 
-            except Product.DoesNotExist:
-                # print(f"❌ 商品 {product_id} 不存在，跳过")
-                continue
-            except Exception as e:
-                # print(f"❌ 合并商品 {product_id} 时出错: {e}")
-                continue
+    from .stores import get_cart_store
 
-        # print(f"🎉 购物车合并完成，共合并 {merged_items} 个商品")
-        return user_cart
+    try:
+        get_cart_store().merge(user.id, session_cart_quantities(session_cart))
+        return True
 
     except Exception as e:
         # print(f"❌ 购物车合并失败: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -1,54 +1,18 @@
 # cart/views.py
+import json
+
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Cart, CartItem
 from shop.models import Product
 from .forms import CartAddProductForm
+from .operations import CartOperationError
+from .stores import get_cart_store
 
-# 多个视图（如 cart_add、cart_remove、cart_update）中重复查询 Product、Cart 和 CartItem
-# 同一视图中重复使用的对象（如 product、cart）只查询一次。
-# 使用 select_related 或 prefetch_related 预加载关联对象，避免 N+1 查询。
-# 消除重复查询：
-# 抽取_get_user_cart辅助函数，统一处理购物车的获取 / 创建逻辑，避免在 5 个视图中重复编写Cart.objects.get_or_create
-# 抽取_get_product辅助函数，统一处理商品查询逻辑，避免在 3 个视图中重复编写get_object_or_404(Product, id=product_id)
-# 优化关联查询：
-# 在_get_user_cart中使用prefetch_related('items__product')预加载购物车项及关联的商品，避免模板渲染时产生 N+1 查询问题
-# 所有涉及购物车的操作都将使用预加载后的购物车对象，提升页面渲染性能
-# 逻辑一致性：
-# 所有视图统一使用get_or_create获取购物车，避免部分视图使用get_object_or_404导致的 404 错误（用户无购物车时自动创建空购物车）
-# 保持原有业务逻辑不变的前提下，使代码结构更清晰，维护成本更低
-
-# 辅助函数：获取或创建用户购物车并预加载关联数据
-def _get_user_cart(user):
-    """
-    获取用户购物车，不存在则创建
-    预加载购物车项及关联商品，避免N+1查询
-    """
-    return Cart.objects.prefetch_related('items__product').get_or_create(user=user)[0]
-
-# 辅助函数：获取或创建用户购物车并预加载关联数据
-def _get_user_cart_item(cart, product, cd):
-    """
-    检查商品是否在购物车中。不存在则创建新的商品记录
-    """
-    return CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': cd['quantity']}
-        )
-
-# 辅助函数：获取或创建用户购物车并预加载关联数据
-def _get_user_cart_item_remove(cart, product):
-    """
-    检查商品是否在购物车中。不存在则创建新的商品记录
-    无数量，用于删除
-    """
-    return CartItem.objects.get(
-            cart=cart,
-            product=product,
-        )
+# 所有视图都通过 get_cart_store() 读写购物车（数据库或 Redis，见 cart.stores），
+# 视图中不再直接获取 Cart / CartItem，只需查询一次商品。
 
 # 辅助函数：获取商品（不存在返回404）
 def _get_product(product_id):
@@ -58,14 +22,8 @@ def _get_product(product_id):
 @login_required
 def cart_detail(request):
     """购物车详情页面"""
-    # cart, created = Cart.objects.get_or_create(user=request.user)
-    #
-    # context = {
-    #     'cart': cart,
-    # }
-    # return render(request, 'cart/detail.html', context)
-    """购物车详情页面"""
-    cart = _get_user_cart(request.user)
+    # 一次查询构建购物车快照，模板中的行小计、总价均不再查询数据库
+    cart = get_cart_store().snapshot(request.user.id)
     return render(request, 'cart/detail.html', {'cart': cart})
 
 
@@ -73,31 +31,15 @@ def cart_detail(request):
 @login_required
 def cart_add(request, product_id):
     """添加商品到购物车"""
-    # product = get_object_or_404(Product, id=product_id)
-    #
-    # # 获取或创建用户的购物车
-    # cart, created = Cart.objects.get_or_create(user=request.user)
     product = _get_product(product_id)
-    cart = _get_user_cart(request.user)
     form = CartAddProductForm(request.POST)
 
     if form.is_valid():
-        cd = form.cleaned_data
-        # 检查商品是否已在购物车中,不存在则创建新的购物车商品记录
-        # cart_item, item_created = CartItem.objects.get_or_create(
-        #     cart=cart,
-        #     product=product,
-        #     defaults={'quantity': cd['quantity']}
-        # )
-        cart_item, item_created = _get_user_cart_item(cart, product, cd)
-
-        # 如果商品已存在，增加数量
-        if not item_created:
-            cart_item.quantity += cd['quantity']
-            cart_item.save()
-            messages.success(request, f'已更新 {product.name} 的数量')
-        else:
+        try:
+            get_cart_store().add(request.user.id, product, form.cleaned_data['quantity'])
             messages.success(request, f'已添加 {product.name} 到购物车')
+        except CartOperationError as e:
+            messages.error(request, str(e))
 
     return redirect('cart:cart_detail')
 
@@ -106,17 +48,13 @@ def cart_add(request, product_id):
 @login_required
 def cart_remove(request, product_id):
     """从购物车移除商品"""
-    # product = get_object_or_404(Product, id=product_id)
-    # cart = get_object_or_404(Cart, user=request.user)
     product = _get_product(product_id)
-    cart = _get_user_cart(request.user)
 
     try:
-        cart_item = _get_user_cart_item_remove(cart, product)
-        cart_item.delete()
+        get_cart_store().remove(request.user.id, product.id)
         messages.success(request, f'已从购物车移除 {product.name}')
-    except CartItem.DoesNotExist:
-        messages.error(request, '商品不在购物车中')
+    except CartOperationError as e:
+        messages.error(request, str(e))
 
     return redirect('cart:cart_detail')
 
@@ -125,27 +63,21 @@ def cart_remove(request, product_id):
 @login_required
 def cart_update(request, product_id):
     """更新购物车商品数量"""
-    # product = get_object_or_404(Product, id=product_id)
-    # cart = get_object_or_404(Cart, user=request.user)
     product = _get_product(product_id)
-    cart = _get_user_cart(request.user)
-    quantity = int(request.POST.get('quantity', 0))
+    try:
+        quantity = int(request.POST.get('quantity', 0))
+    except ValueError:
+        quantity = 0
 
     if quantity < 1:
         messages.error(request, '数量必须大于0')
         return redirect('cart:cart_detail')
 
     try:
-        cart_item = _get_user_cart_item_remove(cart, product)
-        if quantity == 0:
-            cart_item.delete()
-            messages.success(request, f'已从购物车移除 {product.name}')
-        else:
-            cart_item.quantity = quantity
-            cart_item.save()
-            messages.success(request, f'已更新 {product.name} 的数量')
-    except CartItem.DoesNotExist:
-        messages.error(request, '商品不在购物车中')
+        get_cart_store().set(request.user.id, product, quantity)
+        messages.success(request, f'已更新 {product.name} 的数量')
+    except CartOperationError as e:
+        messages.error(request, str(e))
 
     return redirect('cart:cart_detail')
 
@@ -154,8 +86,146 @@ def cart_update(request, product_id):
 @login_required
 def cart_clear(request):
     """清空购物车"""
-    # cart = get_object_or_404(Cart, user=request.user)
-    cart = _get_user_cart(request.user)
-    cart.items.all().delete()
+    get_cart_store().clear(request.user.id)
     messages.success(request, '购物车已清空')
-    return redirect('cart:cart_detail')
\ No newline at end of file
+    return redirect('cart:cart_detail')
+
+# ---------------- JSON 接口：只返回变化的行、新的合计和角标数量 ----------------
+
+# 批量接口单次最多处理的行数
+CART_API_BATCH_LIMIT = 100
+
+
+def _read_payload(request):
+    """读取请求数据：支持 JSON 请求体和普通表单"""
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            raise CartOperationError('请求数据格式错误')
+        if not isinstance(payload, dict):
+            raise CartOperationError('请求数据格式错误')
+        return payload
+    return request.POST
+
+
+def _read_quantity(payload, default=None):
+    try:
+        return int(payload.get('quantity', default))
+    except (TypeError, ValueError):
+        raise CartOperationError('数量必须是整数')
+
+
+def _get_api_products(product_ids):
+    """一次查询取出接口涉及的在售商品（库存校验读取 available_stock，需要 stock 和 reserved）"""
+    return Product.objects.filter(available=True).only('id', 'name', 'price', 'stock', 'reserved').in_bulk(product_ids)
+
+
+def _line_data(product, quantity):
+    return {
+        'product_id': product.id,
+        'quantity': quantity,
+        'price': str(product.price),
+        'total_price': str(product.price * quantity),
+    }
+
+
+def _cart_response(user_id, lines):
+    """返回变化的行和新合计（写操作已失效摘要缓存，这里只重新计算一次）"""
+    summary = get_cart_store().summary(user_id)
+    return JsonResponse({
+        'lines': lines,
+        'totals': {
+            'item_count': summary['item_count'],
+            'quantity': summary['quantity'],
+            'subtotal': str(summary['subtotal']),
+        },
+        'badge': summary['quantity'],
+    })
+
+
+def _api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+@require_POST
+@login_required
+def cart_api_add(request, product_id):
+    """JSON接口：添加商品（累加数量）"""
+    product = _get_api_products([product_id]).get(product_id)
+    if product is None:
+        return _api_error('商品不存在或已下架', status=404)
+    try:
+        quantity = _read_quantity(_read_payload(request), default=1)
+        quantity = get_cart_store().add(request.user.id, product, quantity)
+    except CartOperationError as e:
+        return _api_error(str(e))
+    return _cart_response(request.user.id, [_line_data(product, quantity)])
+
+
+@require_POST
+@login_required
+def cart_api_update(request, product_id):
+    """JSON接口：设置商品数量，数量为0时移除"""
+    product = _get_api_products([product_id]).get(product_id)
+    if product is None:
+        return _api_error('商品不存在或已下架', status=404)
+    try:
+        quantity = _read_quantity(_read_payload(request))
+        quantity = get_cart_store().set(request.user.id, product, quantity)
+    except CartOperationError as e:
+        return _api_error(str(e))
+    return _cart_response(request.user.id, [_line_data(product, quantity)])
+
+
+@require_POST
+@login_required
+def cart_api_remove(request, product_id):
+    """JSON接口：移除商品"""
+    try:
+        get_cart_store().remove(request.user.id, product_id)
+    except CartOperationError as e:
+        return _api_error(str(e), status=404)
+    return _cart_response(request.user.id, [{'product_id': product_id, 'quantity': 0}])
+
+
+@require_POST
+@login_required
+def cart_api_clear(request):
+    """JSON接口：清空购物车"""
+    get_cart_store().clear(request.user.id)
+    return _cart_response(request.user.id, [])
+
+
+@require_POST
+@login_required
+def cart_api_batch(request):
+    """
+    JSON接口：在一个事务中批量设置多行数量
+    请求体：{"lines": [{"product_id": 1, "quantity": 2}, ...]}，数量为0表示移除；
+    写入前先校验全部行，任一行不合法则不做任何修改
+    """
+    try:
+        lines = _read_payload(request).get('lines')
+        if not isinstance(lines, list) or not lines:
+            raise CartOperationError('lines 不能为空')
+        if len(lines) > CART_API_BATCH_LIMIT:
+            raise CartOperationError(f'单次最多修改 {CART_API_BATCH_LIMIT} 行')
+        changes = {}
+        for line in lines:
+            try:
+                changes[int(line['product_id'])] = _read_quantity(line)
+            except (KeyError, TypeError, ValueError):
+                raise CartOperationError('lines 格式错误')
+
+        products = _get_api_products(list(changes))
+        missing = [product_id for product_id in changes if product_id not in products]
+        if missing:
+            return _api_error(f'商品不存在或已下架: {missing}', status=404)
+        # 存储先校验全部行再一次性写入（数据库存储只解析一次购物车ID，一条 DELETE 加一条 upsert）
+        updates = [(products[product_id], quantity) for product_id, quantity in changes.items()]
+        get_cart_store().set_many(request.user.id, updates)
+        result = [_line_data(product, quantity) for product, quantity in updates]
+    except CartOperationError as e:
+        return _api_error(str(e))
+    return _cart_response(request.user.id, result)
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.gzip.GZipMiddleware',  # 添加GZip压缩
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cart.middleware.CartCookieMiddleware',  # 未登录购物车cookie模式下写出购物车cookie
     'django.middleware.common.CommonMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # 放在SecurityMiddleware, CommonMiddleware 之后，确保静态文件被正确处理
     'django.middleware.csrf.CsrfViewMiddleware',# CSRF 中间件（必须在 Session 之后）
@@ -164,6 +165,29 @@ CACHES = {
 
 # Celery 配置（若使用 Redis 作为 broker）
 CELERY_BROKER_URL = f"redis://:{os.environ.get('REDIS_PASSWORD')}@{os.environ.get('REDIS_HOST')}:{os.environ.get('REDIS_PORT')}/0"  # 确保与 Redis 实际端口一致
+# 定时任务（celery -A ecommerce_celery beat）
+CELERY_BEAT_SCHEDULE = {
+    # 归还超时未支付订单锁定的库存
+    'release-expired-reservations': {
+        'task': 'shop.tasks.release_expired_reservations',
+        'schedule': 60.0,
+    },
+    # 发送发件箱中到期的邮件
+    'send-outbox-emails': {
+        'task': 'orders.tasks.send_outbox_emails',
+        'schedule': 60.0,
+    },
+    # 把 RedisCartStore 中被修改过的购物车写回数据库（数据库存储时任务直接返回）
+    'persist-dirty-carts': {
+        'task': 'cart.tasks.persist_dirty_carts',
+        'schedule': 60.0,
+    },
+    # 处理收到的支付网关 webhook 事件
+    'process-webhook-events': {
+        'task': 'payment.tasks.process_webhook_events',
+        'schedule': 10.0,
+    },
+}
 
 # Session 配置优化
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
@@ -197,6 +221,18 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # 购物车session配置
 CART_SESSION_ID = 'cart'
+# 登录用户购物车存储：默认直接读写数据库；改为 'cart.stores.RedisCartStore' 时购物车保存在 Redis，
+# 由 cart.tasks.persist_dirty_carts 定期批量写回数据库
+CART_STORE_BACKEND = 'cart.stores.DatabaseCartStore'
+# 下单锁定库存的有效期（秒），超时未支付由 shop.tasks.release_expired_reservations 归还
+STOCK_RESERVATION_TTL = 60 * 15
+# 未登录用户购物车存放位置：'session'（默认）或 'cookie'。
+# cookie 模式下购物车签名压缩后存入独立cookie，匿名访客加购不会创建 Redis session；
+# 签名后超过 CART_COOKIE_MAX_SIZE 字节时退回session存储
+CART_GUEST_STORAGE = 'session'
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_AGE = SESSION_COOKIE_AGE
+CART_COOKIE_MAX_SIZE = 3800
 
 # 国际化
 LANGUAGE_CODE = 'zh-hans'
@@ -255,6 +291,11 @@ STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
 
 DEFAULT_FROM_EMAIL = 'noreply@yourdomain.com'  # 默认发件人
+# 邮件由 orders.tasks.send_outbox_emails 从发件箱批量发送；开发环境默认输出到控制台，生产环境默认 SMTP
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND',
+    'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend',
+)
 
 # 调试工具栏配置
 # if DEBUG:
@@ -318,6 +359,8 @@ SESSION_CACHE_ALIAS = 'default'
 CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 300  # 5分钟
 CACHE_MIDDLEWARE_KEY_PREFIX = 'shop'
+# 商品详情页主体缓存时间（秒），设为 0 则每次都重新渲染
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 10
 
 # 静态文件优化
 # settings.py（仅开发环境）
@@ -1,3 +1,52 @@
+from django import forms
 from django.contrib import admin
 
-# Register your models here.
+from .models import Order, OrderItem, OutboxEmail
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    raw_id_fields = ('product',)
+    extra = 0
+
+
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean_status(self):
+        """只允许 Order.TRANSITIONS 中的状态流转，避免保存时抛出 InvalidStatusTransition"""
+        status = self.cleaned_data['status']
+        order = self.instance
+        if order.pk and status != order.status and not order.can_transition(status):
+            raise forms.ValidationError(
+                f'订单不能从「{order.get_status_display()}」变为「{dict(Order.STATUS_CHOICES)[status]}」'
+            )
+        return status
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
+    # 总金额、商品件数读取下单时保存的合计
+    list_display = ('id', 'user', 'first_name', 'last_name', 'total_amount', 'item_count',
+                    'status', 'created')
+    list_filter = ('status', 'created')
+    search_fields = ('id', 'user__username', 'email')
+    raw_id_fields = ('user',)
+    readonly_fields = ('total_amount', 'item_count', 'is_paid', 'is_waiting', 'is_refunded')
+    inlines = [OrderItemInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # 在后台修改订单项后重新计算合计
+        form.instance.update_totals()
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'sent_at', 'created')
@@ -0,0 +1,42 @@
+# orders/exports.py
+"""订单与订单项的流式导出（供财务/运营对账使用）"""
+from django.db.models import DecimalField, F, Sum
+
+from shop.exports import EXPORT_CHUNK_SIZE, filter_by_date_range
+from .models import Order, OrderItem
+
+ORDER_EXPORT_FIELDS = (
+    'id', 'user_id', 'email', 'city', 'created', 'status', 'is_paid', 'is_waiting',
+    'is_refunded', 'refund_amount', 'payment_method', 'total_cost', 'item_count',
+)
+
+ORDER_ITEM_EXPORT_FIELDS = (
+    'id', 'order_id', 'order__created', 'product_id', 'product__name',
+    'price', 'quantity', 'line_total',
+)
+
+
+def export_orders(start=None, end=None):
+    """
+    导出订单数据（按下单时间筛选）
+    对账导出不依赖订单上保存的合计，总价与件数仍按 OrderItem.price 快照在数据库中聚合，
+    件数的聚合结果与 Order.item_count 字段同名，查询时使用别名，导出列名不变
+    """
+    queryset = filter_by_date_range(Order.objects.all(), 'created', start, end)
+    rows = queryset.annotate(
+        total_cost=Sum(
+            F('items__price') * F('items__quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        items_quantity=Sum('items__quantity'),
+    ).order_by('id').values_list(*ORDER_EXPORT_FIELDS[:-1], 'items_quantity').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return ORDER_EXPORT_FIELDS, rows
+
+
+def export_order_items(start=None, end=None):
+    """导出订单项数据（按所属订单的下单时间筛选）"""
+    queryset = filter_by_date_range(OrderItem.objects.all(), 'order__created', start, end)
+    rows = queryset.annotate(
+        line_total=F('price') * F('quantity'),
+    ).order_by('id').values_list(*ORDER_ITEM_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return ORDER_ITEM_EXPORT_FIELDS, rows
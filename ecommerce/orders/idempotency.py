@@ -0,0 +1,127 @@
+# orders/idempotency.py
+"""
+幂等键（防止重复点击、客户端重试导致重复下单、重复创建支付记录和 PaymentIntent）
+
+客户端在 POST 中带上幂等键：请求头 Idempotency-Key，或表单隐藏字段 idempotency_key（模板中用 {% idempotency_key %} 生成）。
+@idempotent 装饰的视图按 (视图, 用户, 幂等键) 在缓存中记录：
+- 首个请求用 cache.add 占位后执行视图，成功（状态码 < 400）时保存响应摘要（重定向地址或 JSON 内容）
+- 同一键的重放请求直接返回保存的响应，不再执行视图；原请求仍在处理中时返回 409
+- 同一键用于参数不同的请求（请求指纹不一致）时返回 422
+- 视图出错、表单校验失败等其余响应不保存，释放占位后客户端可以用同一键重试；
+  业务失败时返回的重定向（如库存不足跳回购物车）状态码也小于400，视图需用 mark_failed 标记，同样不保存
+没有幂等键的请求和非 POST 请求照常执行
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+# 已完成请求的响应保存时间
+KEY_TTL = 60 * 60 * 24
+# 处理中占位的过期时间，进程异常退出时占位不会一直存在
+LOCK_TIMEOUT = 60
+MAX_KEY_LENGTH = 255
+
+_PROCESSING = 'processing'
+_DONE = 'done'
+# 不参与请求指纹的表单字段
+_IGNORED_FIELDS = ('csrfmiddlewaretoken', FIELD)
+
+
+def get_idempotency_key(request):
+    key = request.headers.get(HEADER) or request.POST.get(FIELD)
+    return key[:MAX_KEY_LENGTH] if key else None
+
+
+def request_fingerprint(request):
+    """请求指纹：路径和请求参数（表单按字段排序，忽略 CSRF 令牌和幂等键；其他类型用原始请求体）"""
+    digest = hashlib.sha256(request.path.encode())
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        fields = sorted((name, values) for name, values in request.POST.lists() if name not in _IGNORED_FIELDS)
+        digest.update(json.dumps(fields, ensure_ascii=False).encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _cache_key(scope, request, key):
+    owner = request.user.pk if request.user.is_authenticated else request.session.session_key
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'idempotency:{scope}:{owner}:{digest}'
+
+
+def mark_failed(response):
+    """标记响应为失败结果（没有完成请求的操作），不保存，客户端可以用同一幂等键重试"""
+    response.idempotency_failed = True
+    return response
+
+
+def _summarize(response):
+    """保存的响应摘要，只支持重定向和 JSON 响应，其余（包括失败的响应）返回 None"""
+    if response.status_code >= 400 or getattr(response, 'idempotency_failed', False):
+        return None
+    if isinstance(response, HttpResponseRedirect):
+        return {'status': response.status_code, 'location': response['Location']}
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json') and not response.streaming:
+        return {'status': response.status_code, 'content': response.content.decode(), 'content_type': content_type}
+    return None
+
+
+def _replay(summary):
+    if 'location' in summary:
+        response = HttpResponseRedirect(summary['location'])
+        response.status_code = summary['status']
+    else:
+        response = HttpResponse(summary['content'], status=summary['status'], content_type=summary['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func=None, *, scope=None, timeout=KEY_TTL):
+    """
+    视图装饰器：同一幂等键的 POST 只执行一次，重放请求返回首次的结果
+    放在 login_required 之后（内层）使用，scope 默认为视图函数名
+    """
+    def decorator(func):
+        view_scope = scope or func.__name__
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            key = get_idempotency_key(request) if request.method == 'POST' else None
+            if not key:
+                return func(request, *args, **kwargs)
+
+            cache_key = _cache_key(view_scope, request, key)
+            fingerprint = request_fingerprint(request)
+            if not cache.add(cache_key, {'state': _PROCESSING, 'fingerprint': fingerprint}, LOCK_TIMEOUT):
+                entry = cache.get(cache_key)
+                if entry is not None:
+                    if entry['fingerprint'] != fingerprint:
+                        return HttpResponse('幂等键已用于其他请求', status=422)
+                    if entry['state'] == _PROCESSING:
+                        return HttpResponse('请求正在处理中，请稍候', status=409)
+                    return _replay(entry['response'])
+                # 占位恰好过期，按首个请求处理
+                cache.set(cache_key, {'state': _PROCESSING, 'fingerprint': fingerprint}, LOCK_TIMEOUT)
+
+            try:
+                response = func(request, *args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+            summary = _summarize(response)
+            if summary is None:
+                cache.delete(cache_key)
+            else:
+                cache.set(cache_key, {'state': _DONE, 'fingerprint': fingerprint, 'response': summary}, timeout)
+            return response
+        return wrapper
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
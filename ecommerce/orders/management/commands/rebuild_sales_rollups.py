@@ -0,0 +1,75 @@
+# orders/management/commands/rebuild_sales_rollups.py
+"""
+重建日销售汇总（orders.rollups）
+
+按下单日期把 [--start, --end] 切成每段 --chunk-days 天，每段在一个事务中删除并重新聚合写入；
+--workers 大于1时各段由多个进程并行重建，各段日期互不重叠
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from orders.models import Order
+from orders.rollups import date_chunks, rebuild_range
+
+CHUNK_DAYS = 31
+
+
+def _rebuild_worker(start, end):
+    """子进程入口：使用独立的数据库连接重建一段日期"""
+    connections.close_all()
+    return rebuild_range(start, end)
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'{name} 日期格式应为 YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = '按日期区间重建日销售汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='开始日期（YYYY-MM-DD），默认最早的订单日期')
+        parser.add_argument('--end', help='结束日期（YYYY-MM-DD），默认今天')
+        parser.add_argument('--chunk-days', type=int, default=CHUNK_DAYS, help='每段的天数')
+        parser.add_argument('--workers', type=int, default=1, help='并行重建的进程数')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days 必须大于0')
+        if options['start']:
+            start = _parse_date(options['start'], '--start')
+        else:
+            first = Order.objects.order_by('created').values_list('created', flat=True).first()
+            if first is None:
+                self.stdout.write('没有订单，无需重建')
+                return
+            start = timezone.localdate(first)
+        end = _parse_date(options['end'], '--end') if options['end'] else timezone.localdate()
+        if start > end:
+            raise CommandError('--start 不能晚于 --end')
+
+        chunks = date_chunks(start, end, options['chunk_days'])
+        self.stdout.write(f'开始重建 {start} ~ {end} 的销售汇总，共 {len(chunks)} 段...')
+        written = 0
+        if options['workers'] > 1:
+            # fork 之前关闭数据库连接，避免子进程共用父进程的连接
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                futures = {executor.submit(_rebuild_worker, *chunk): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    chunk_start, chunk_end = futures[future]
+                    count = future.result()
+                    written += count
+                    self.stdout.write(f'{chunk_start} ~ {chunk_end} 重建完成，写入 {count} 行')
+        else:
+            for chunk_start, chunk_end in chunks:
+                written += rebuild_range(chunk_start, chunk_end)
+
+        self.stdout.write(self.style.SUCCESS(f'销售汇总重建完成，共写入 {written} 行'))
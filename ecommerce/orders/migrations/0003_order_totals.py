@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:01
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+BATCH_SIZE = 1000
+
+
+def backfill_order_totals(apps, schema_editor):
+    """按订单ID分批回填订单总金额与商品件数（按订单项价格快照聚合）"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not order_ids:
+            break
+        last_id = order_ids[-1]
+        totals = OrderItem.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+            total=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            count=Sum('quantity'),
+        ).order_by()
+        orders = [
+            Order(
+                id=row['order_id'],
+                total_amount=Decimal(row['total'] or 0).quantize(Decimal('0.01')),
+                item_count=row['count'] or 0,
+            )
+            for row in totals
+        ]
+        Order.objects.bulk_update(orders, ['total_amount', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_is_refunded_order_refund_amount_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='商品件数'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='订单总金额'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created'], name='order_user_created_idx'),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
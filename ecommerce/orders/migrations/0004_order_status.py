@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def backfill_order_status(apps, schema_editor):
+    """
+    按订单ID区间分批由布尔字段回填状态，每批三条 UPDATE，不逐行保存
+    优先级与 Order.status_from_flags 一致：已退款 > 待调货 > 已支付 > 待支付（默认值，无需更新）
+    """
+    Order = apps.get_model('orders', 'Order')
+    last = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, last, BATCH_SIZE):
+        batch = Order.objects.filter(id__gt=start, id__lte=start + BATCH_SIZE)
+        batch.filter(is_paid=True, is_waiting=False, is_refunded=False).update(status='paid')
+        batch.filter(is_waiting=True, is_refunded=False).update(status='waiting')
+        batch.filter(is_refunded=True).update(status='refunded')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', '待支付'), ('paid', '已支付'), ('waiting', '待调货'), ('refunded', '已退款')], default='pending', max_length=20, verbose_name='订单状态'),
+        ),
+        # 先回填再建索引，避免回填时维护索引
+        migrations.RunPython(backfill_order_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', '-created'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created'], name='order_status_created_idx'),
+        ),
+    ]
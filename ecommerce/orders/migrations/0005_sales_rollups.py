@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_status'),
+        ('shop', '0009_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPaymentMethodSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='销售额')),
+                ('units', models.IntegerField(default=0, verbose_name='销售件数')),
+                ('orders', models.IntegerField(default=0, verbose_name='订单数')),
+                ('payment_method', models.CharField(blank=True, max_length=20)),
+            ],
+            options={
+                'verbose_name': '支付方式日销售汇总',
+                'constraints': [models.UniqueConstraint(fields=('date', 'payment_method'), name='daily_payment_sales_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='销售额')),
+                ('units', models.IntegerField(default=0, verbose_name='销售件数')),
+                ('orders', models.IntegerField(default=0, verbose_name='订单数')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='shop.category')),
+            ],
+            options={
+                'verbose_name': '分类日销售汇总',
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='daily_category_sales_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='销售额')),
+                ('units', models.IntegerField(default=0, verbose_name='销售件数')),
+                ('orders', models.IntegerField(default=0, verbose_name='订单数')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='shop.product')),
+            ],
+            options={
+                'verbose_name': '商品日销售汇总',
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='daily_product_sales_unique')],
+            },
+        ),
+    ]
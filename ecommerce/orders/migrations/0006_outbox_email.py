@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='主题')),
+                ('body', models.TextField(verbose_name='正文')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='发件人')),
+                ('to', models.JSONField(default=list, verbose_name='收件人')),
+                ('status', models.CharField(choices=[('pending', '待发送'), ('sent', '已发送'), ('failed', '发送失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='发送次数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次发送时间')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+            ],
+            options={
+                'verbose_name': '待发送邮件',
+                'verbose_name_plural': '待发送邮件',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_email_pending_idx')],
+            },
+        ),
+    ]
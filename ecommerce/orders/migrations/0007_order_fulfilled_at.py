@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+BATCH_SIZE = 5000
+
+
+def backfill_fulfilled_at(apps, schema_editor):
+    """已支付过的订单在旧代码中已经扣减过库存，按订单ID区间分批把履约时间回填为最后更新时间"""
+    Order = apps.get_model('orders', 'Order')
+    last = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, last, BATCH_SIZE):
+        Order.objects.filter(
+            id__gt=start, id__lte=start + BATCH_SIZE, status__in=['paid', 'waiting', 'refunded'],
+        ).update(fulfilled_at=F('updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='fulfilled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='履约时间'),
+        ),
+        migrations.RunPython(backfill_fulfilled_at, migrations.RunPython.noop),
+    ]
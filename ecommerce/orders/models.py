@@ -1,10 +1,61 @@
+from decimal import Decimal
+
 from django.db import models
 from django.conf import settings
 from shop.models import Product
 from django.db.models import Sum, F
+from django.utils import timezone
+
+
+class InvalidStatusTransition(ValueError):
+    """不允许的订单状态流转"""
+
+
+class OrderQuerySet(models.QuerySet):
+    def transition(self, order_id, status, from_statuses=None, **fields):
+        """
+        条件 UPDATE 流转订单状态：只有当前状态允许流转到 status 时才更新，返回是否更新成功
+        from_statuses 可进一步限定来源状态（如支付回调只把待支付订单标记为已支付，重复回调不产生影响）
+        支付回调、信号等处使用，不会用内存中的旧状态覆盖数据库
+        """
+        sources = [source for source, targets in Order.TRANSITIONS.items() if status in targets]
+        if from_statuses is not None:
+            sources = [source for source in sources if source in from_statuses]
+        return bool(self.filter(id=order_id, status__in=sources).update(
+            status=status, updated=timezone.now(), **Order.status_flags(status), **fields
+        ))
+
+    def claim_fulfilment(self, order_id):
+        """
+        条件 UPDATE 标记订单已履约（库存、销量已扣减），返回本次是否抢到
+        webhook、货到付款、支付成功回调等多个入口重复触发时只有一个能抢到
+        """
+        return bool(self.filter(id=order_id, fulfilled_at__isnull=True).update(fulfilled_at=timezone.now()))
+
+    def awaiting_stock(self):
+        """待调货订单（走 (status, created) 索引）"""
+        return self.filter(status=Order.STATUS_WAITING)
 
 
 class Order(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PAID = 'paid'
+    STATUS_WAITING = 'waiting'
+    STATUS_REFUNDED = 'refunded'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '待支付'),
+        (STATUS_PAID, '已支付'),
+        (STATUS_WAITING, '待调货'),
+        (STATUS_REFUNDED, '已退款'),
+    ]
+    # 允许的状态流转：支付成功后发现库存不足转为待调货，调货完成后回到已支付
+    TRANSITIONS = {
+        STATUS_PENDING: {STATUS_PAID, STATUS_WAITING},
+        STATUS_PAID: {STATUS_WAITING, STATUS_REFUNDED},
+        STATUS_WAITING: {STATUS_PAID, STATUS_REFUNDED},
+        STATUS_REFUNDED: set(),
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
@@ -26,18 +77,149 @@ class Order(models.Model):
         ('paypal', 'PayPal'),
         ('cod', 'Cash on Delivery'),
     ], blank=True, null=True)
+    # 下单时按订单项价格快照计算并保存的合计，列表、支付、退款直接读取，无需聚合查询
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='订单总金额')
+    item_count = models.PositiveIntegerField(default=0, verbose_name='商品件数')
+    # 订单状态（唯一的状态来源），is_paid / is_waiting / is_refunded 随状态同步保留以兼容旧代码
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='订单状态')
+    # 支付成功后扣减库存、计入销量的时间，只通过 OrderQuerySet.claim_fulfilment 写入，保证只履约一次
+    fulfilled_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='履约时间')
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            # 我的订单列表按 (user, created) 游标分页
+            models.Index(fields=['user', '-created'], name='order_user_created_idx'),
+            # 按状态筛选用户订单、运营按状态查询（如待调货订单）都是索引范围扫描
+            models.Index(fields=['user', 'status', '-created'], name='order_user_status_idx'),
+            models.Index(fields=['status', '-created'], name='order_status_created_idx'),
+        ]
+
+    # 实例上缓存的 (总金额, 商品件数)，见 get_totals
+    _totals = None
 
     def __str__(self):
         return f'Order {self.id}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录从数据库加载时的状态，保存时据此校验状态流转
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_status', None)
+        flags = (self.is_paid, self.is_waiting, self.is_refunded)
+        if self._state.adding:
+            if self.status == self.STATUS_PENDING:
+                # 直接按布尔字段创建的订单（旧代码、测试数据）推导出状态
+                self.status = self.status_from_flags(*flags)
+        elif loaded is not None and self.status != loaded:
+            # 直接修改了 status：校验流转（布尔字段在下面统一同步）
+            self._check_transition(loaded, self.status)
+        elif loaded is not None and self.status_from_flags(*flags) != self.status:
+            # 旧代码直接修改布尔字段：按布尔字段推导出的状态流转
+            status = self.status_from_flags(*flags)
+            self._check_transition(self.status, status)
+            self.status = status
+        for name, value in self.status_flags(self.status).items():
+            setattr(self, name, value)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # 履约时间由条件 UPDATE 写入，保存整个实例时不能用内存中的旧值覆盖
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'fulfilled_at'
+            ]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and loaded is not None and self.status != loaded:
+            kwargs['update_fields'] = {*update_fields, 'status', 'is_paid', 'is_waiting', 'is_refunded'}
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    def _check_transition(self, current, status):
+        if status not in self.TRANSITIONS[current]:
+            raise InvalidStatusTransition(f'订单 {self.id} 不能从 {current} 变为 {status}')
+
+    @classmethod
+    def status_flags(cls, status):
+        """状态对应的兼容布尔字段"""
+        return {
+            'is_paid': status != cls.STATUS_PENDING,
+            'is_waiting': status == cls.STATUS_WAITING,
+            'is_refunded': status == cls.STATUS_REFUNDED,
+        }
+
+    @classmethod
+    def status_from_flags(cls, is_paid, is_waiting, is_refunded):
+        if is_refunded:
+            return cls.STATUS_REFUNDED
+        if is_waiting:
+            return cls.STATUS_WAITING
+        if is_paid:
+            return cls.STATUS_PAID
+        return cls.STATUS_PENDING
+
+    def can_transition(self, status):
+        return status in self.TRANSITIONS[self.status]
+
+    def set_status(self, status, **fields):
+        """
+        流转订单状态并保存（同时保存 fields 中的其他字段），不允许的流转抛出 InvalidStatusTransition
+        以数据库中的当前状态为准：条件 UPDATE 失败说明状态已被其他请求修改
+        """
+        self._check_transition(self.status, status)
+        if not Order.objects.transition(self.id, status, **fields):
+            self.refresh_from_db(fields=['status', 'is_paid', 'is_waiting', 'is_refunded'])
+            raise InvalidStatusTransition(f'订单 {self.id} 当前状态为 {self.get_status_display()}，不能变为 {status}')
+        self.status = self._loaded_status = status
+        for name, value in {**self.status_flags(status), **fields}.items():
+            setattr(self, name, value)
+
+    def compute_totals(self):
+        """按订单项价格快照计算 (总金额, 商品件数)：已预取订单项时在内存中计算，否则一次聚合查询"""
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('items')
+        if prefetched is not None:
+            total = sum((item.get_cost() for item in prefetched), Decimal('0'))
+            return Decimal(total).quantize(Decimal('0.01')), sum(item.quantity for item in prefetched)
+        totals = self.items.aggregate(
+            total=Sum(F('price') * F('quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            count=Sum('quantity'),
+        )
+        return Decimal(totals['total'] or 0).quantize(Decimal('0.01')), totals['count'] or 0
+
+    def get_totals(self):
+        """
+        (总金额, 商品件数)，每个实例只计算一次：优先读取下单时保存的合计，
+        没有保存合计的订单（直接创建订单项）按订单项计算后缓存在实例上；订单项变化后调用 invalidate_totals
+        """
+        if self._totals is None:
+            if self.item_count:
+                self._totals = (self.total_amount, self.item_count)
+            else:
+                self._totals = self.compute_totals()
+        return self._totals
+
+    def invalidate_totals(self):
+        """订单项被修改后清除实例上缓存的合计"""
+        self._totals = None
+
+    def update_totals(self, save=True):
+        """重新计算并保存合计（订单项被修改后调用）"""
+        self.invalidate_totals()
+        self.total_amount, self.item_count = self.compute_totals()
+        if save:
+            self.save(update_fields=['total_amount', 'item_count', 'updated'])
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.invalidate_totals()
+
     def get_total_cost(self):
-        """使用数据库聚合计算总价（替代循环）"""
-        return self.items.aggregate(
-            total=Sum(F('product__price') * F('quantity'))  # 数据库层面计算乘积和
-        )['total'] or 0  # 处理空购物车的情况
+        """订单总价（每个实例只计算一次，见 get_totals）"""
+        return self.get_totals()[0]
 
     # def get_total_cost(self):
     #     return sum(item.get_cost() for item in self.items.all())
@@ -45,7 +227,7 @@ class Order(models.Model):
     # 新增方法：判断是否可以退款
     def can_refund(self):
         # 已支付且未退款的订单可以申请退款
-        return self.is_paid and not self.is_refunded
+        return self.can_transition(self.STATUS_REFUNDED)
 
 
 class OrderItem(models.Model):
@@ -58,4 +240,87 @@ class OrderItem(models.Model):
         return str(self.id)
 
     def get_cost(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+
+class SalesRollup(models.Model):
+    """
+    按天汇总的销售数据（净额：已退款订单已扣除），由 orders.rollups 在支付成功、退款时增量维护，
+    可用 rebuild_sales_rollups 命令按日期区间重建；报表只读这些表，不扫描订单项
+    日期为下单日期（本地时区）
+    """
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='销售额')
+    units = models.IntegerField(default=0, verbose_name='销售件数')
+    orders = models.IntegerField(default=0, verbose_name='订单数')
+
+    class Meta:
+        abstract = True
+
+
+class DailyProductSales(SalesRollup):
+    product = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = '商品日销售汇总'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='daily_product_sales_unique'),
+        ]
+
+
+class DailyCategorySales(SalesRollup):
+    category = models.ForeignKey('shop.Category', related_name='daily_sales', on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = '分类日销售汇总'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='daily_category_sales_unique'),
+        ]
+
+
+class DailyPaymentMethodSales(SalesRollup):
+    # 订单没有支付方式时为空字符串
+    payment_method = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        verbose_name = '支付方式日销售汇总'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'payment_method'], name='daily_payment_sales_unique'),
+        ]
+
+
+class OutboxEmail(models.Model):
+    """
+    待发送邮件（发件箱）：请求中只写入一行，由 orders.tasks.send_outbox_emails 批量发送
+    发送失败按指数退避重试，超过最大次数后标记为发送失败
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, '待发送'),
+        (STATUS_SENT, '已发送'),
+        (STATUS_FAILED, '发送失败'),
+    )
+
+    subject = models.CharField(max_length=255, verbose_name='主题')
+    body = models.TextField(verbose_name='正文')
+    from_email = models.CharField(max_length=255, blank=True, verbose_name='发件人')
+    to = models.JSONField(default=list, verbose_name='收件人')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='发送次数')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='下次发送时间')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='发送时间')
+
+    class Meta:
+        verbose_name = '待发送邮件'
+        verbose_name_plural = '待发送邮件'
+        indexes = [
+            # 发送任务按 status = pending AND next_attempt_at <= now 取批次
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_email_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.to)}'
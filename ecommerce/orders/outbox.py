@@ -0,0 +1,105 @@
+# orders/outbox.py
+"""
+邮件发件箱
+
+- 请求中只调用 enqueue_email 写入一行 OutboxEmail，不连接 SMTP；在下单等事务中写入时随事务一起提交或回滚
+- send_pending_emails（由 orders.tasks.send_outbox_emails 定时调用）按批次取出到期的邮件，
+  每批只打开一个 get_connection() 连接，逐封 send_messages 以便分别记录成功或失败
+- 发送失败的邮件按 RETRY_BASE_DELAY * 2^(attempts-1) 退避重试，达到 MAX_ATTEMPTS 次后标记为发送失败
+- 多个 worker 同时发送时 select_for_update(skip_locked) 保证同一封邮件只被一个 worker 取到
+- 开发环境 EMAIL_BACKEND 为 console，测试中 Django 使用 locmem，都不需要真实的 SMTP 服务器
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """写入一封待发送邮件，to 为收件人地址或地址列表"""
+    if isinstance(to, str):
+        to = [to]
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts):
+    """第 attempts 次发送失败后的等待时间"""
+    return timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def _send_batch(emails, connection, now):
+    for email in emails:
+        message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+        email.attempts += 1
+        try:
+            connection.send_messages([message])
+        except Exception as e:
+            email.last_error = str(e)
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = OutboxEmail.STATUS_FAILED
+            else:
+                email.next_attempt_at = now + retry_delay(email.attempts)
+        else:
+            email.status = OutboxEmail.STATUS_SENT
+            email.sent_at = now
+            email.last_error = ''
+    OutboxEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+
+def send_pending_emails(batch_size=BATCH_SIZE, now=None):
+    """发送全部到期的待发送邮件（所有批次共用一个连接），返回发送成功的数量"""
+    now = now or timezone.now()
+    sent = 0
+    last_id = 0
+    connection = get_connection(fail_silently=False)
+    with connection:
+        while True:
+            with transaction.atomic():
+                # 按ID递增取批次，本轮失败等待重试的邮件不会被再次取到
+                emails = list(
+                    OutboxEmail.objects.select_for_update(skip_locked=True)
+                    .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now, id__gt=last_id)
+                    .order_by('id')[:batch_size]
+                )
+                if not emails:
+                    return sent
+                _send_batch(emails, connection, now)
+            last_id = emails[-1].id
+            sent += sum(email.status == OutboxEmail.STATUS_SENT for email in emails)
+
+
+def queue_order_confirmation(order):
+    """订单确认邮件"""
+    return enqueue_email(
+        f'订单确认 #{order.id}',
+        f'尊敬的{order.first_name}，您的订单已确认...',
+        order.email,
+    )
+
+
+def queue_refund_confirmation(order):
+    """退款确认邮件"""
+    return enqueue_email(
+        f'退款确认 #{order.id}',
+        (f'尊敬的{order.first_name}，您的退款已处理完成\n\n'
+         f'订单号: #{order.id}\n'
+         f'退款金额: ¥{order.refund_amount}\n'
+         f'退款原因: {order.refund_reason}\n\n'
+         '资金将在1-3个工作日内退回您的原支付账户'),
+        order.email,
+    )
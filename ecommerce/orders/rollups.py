@@ -0,0 +1,174 @@
+# orders/rollups.py
+"""
+销售汇总（日粒度）
+
+- 支付成功时 apply_order(order) 把订单计入下单当天的商品、分类、支付方式汇总，退款时 apply_order(order, -1) 扣除；
+  每张表两条语句：先 bulk_create(ignore_conflicts) 补齐缺失的行，再用一条带 CASE 的 UPDATE 累加
+- rebuild_range(start, end) 在一个事务中删除区间内的汇总，再用三条 GROUP BY 聚合查询重新写入，
+  rebuild_sales_rollups 命令把长区间切成多段并行重建
+- dashboard_data 只读取汇总表
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    DailyCategorySales, DailyPaymentMethodSales, DailyProductSales, Order, OrderItem,
+)
+
+# 计入汇总的订单状态（已支付、待调货）
+COUNTED_STATUSES = (Order.STATUS_PAID, Order.STATUS_WAITING)
+DASHBOARD_TOP_LIMIT = 10
+
+_ROLLUPS = (
+    (DailyProductSales, 'product_id'),
+    (DailyCategorySales, 'category_id'),
+    (DailyPaymentMethodSales, 'payment_method'),
+)
+
+
+def _order_rows(order):
+    """订单在三张汇总表中的增量 {model: {key: [revenue, units, orders]}}（一次查询订单项）"""
+    rows = {model: defaultdict(lambda: [Decimal('0.00'), 0, 0]) for model, _ in _ROLLUPS}
+    products, categories = rows[DailyProductSales], rows[DailyCategorySales]
+    seen_products, seen_categories = set(), set()
+    revenue, units = Decimal('0.00'), 0
+    for product_id, category_id, price, quantity in order.items.values_list(
+            'product_id', 'product__category_id', 'price', 'quantity'):
+        amount = price * quantity
+        revenue += amount
+        units += quantity
+        for totals, key, seen in ((products, product_id, seen_products),
+                                  (categories, category_id, seen_categories)):
+            totals[key][0] += amount
+            totals[key][1] += quantity
+            # 同一订单只计一次订单数
+            if key not in seen:
+                seen.add(key)
+                totals[key][2] += 1
+    if units:
+        rows[DailyPaymentMethodSales][order.payment_method or ''] = [revenue, units, 1]
+    return rows
+
+
+def _apply(model, key_field, date, totals, sign):
+    if not totals:
+        return
+    model.objects.bulk_create(
+        [model(date=date, **{key_field: key}) for key in totals],
+        ignore_conflicts=True,
+    )
+
+    def delta(index, output_field):
+        return Case(
+            *[When(**{key_field: key}, then=Value(values[index] * sign)) for key, values in totals.items()],
+            default=Value(0),
+            output_field=output_field,
+        )
+
+    model.objects.filter(date=date, **{f'{key_field}__in': list(totals)}).update(
+        revenue=F('revenue') + delta(0, DecimalField(max_digits=14, decimal_places=2)),
+        units=F('units') + delta(1, IntegerField()),
+        orders=F('orders') + delta(2, IntegerField()),
+    )
+
+
+def apply_order(order, sign=1):
+    """把订单计入（sign=1，支付成功）或扣出（sign=-1，退款）下单当天的汇总"""
+    date = timezone.localdate(order.created)
+    with transaction.atomic():
+        for model, totals in _order_rows(order).items():
+            key_field = dict(_ROLLUPS)[model]
+            _apply(model, key_field, date, totals, sign)
+
+
+def date_chunks(start, end, days):
+    """把 [start, end] 切成每段 days 天的闭区间列表"""
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def rebuild_range(start, end):
+    """重建 [start, end]（下单日期，闭区间）的汇总，返回写入的行数"""
+    items = OrderItem.objects.filter(
+        order__status__in=COUNTED_STATUSES,
+        order__created__date__gte=start,
+        order__created__date__lte=end,
+    ).annotate(day=TruncDate('order__created'))
+    amount = Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    written = 0
+    with transaction.atomic():
+        for model, key_field in _ROLLUPS:
+            model.objects.filter(date__gte=start, date__lte=end).delete()
+            group_by = {
+                'product_id': 'product_id',
+                'category_id': 'product__category_id',
+                'payment_method': 'order__payment_method',
+            }[key_field]
+            rows = items.values('day', group_by).annotate(
+                revenue=amount,
+                units=Sum('quantity'),
+                orders=Count('order_id', distinct=True),
+            ).order_by()
+            objects = []
+            for row in rows:
+                key = row[group_by]
+                if key_field == 'payment_method':
+                    key = key or ''
+                objects.append(model(
+                    date=row['day'], revenue=row['revenue'], units=row['units'], orders=row['orders'],
+                    **{key_field: key},
+                ))
+            written += len(model.objects.bulk_create(objects, batch_size=1000))
+    return written
+
+
+def dashboard_data(start, end):
+    """
+    报表数据（只读汇总表）：按月的销售额/件数/订单数、销售额最高的商品与分类、各支付方式占比
+    每个订单在支付方式表中只有一行，总计和按月数据都从支付方式表汇总；聚合结果统一用 total_ 前缀，避免与字段重名
+    """
+    payment_rows = DailyPaymentMethodSales.objects.filter(date__gte=start, date__lte=end)
+    totals = payment_rows.aggregate(
+        total_revenue=Coalesce(Sum('revenue'), Value(Decimal('0.00'))),
+        total_units=Coalesce(Sum('units'), Value(0)),
+        total_orders=Coalesce(Sum('orders'), Value(0)),
+    )
+    monthly = list(
+        payment_rows.annotate(month=TruncMonth('date')).values('month')
+        .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'), total_orders=Sum('orders'))
+        .order_by('month')
+    )
+    by_payment_method = list(
+        payment_rows.values('payment_method')
+        .annotate(total_revenue=Sum('revenue'), total_orders=Sum('orders'))
+        .order_by('-total_revenue')
+    )
+    top_products = list(
+        DailyProductSales.objects.filter(date__gte=start, date__lte=end)
+        .values('product_id', name=F('product__name'))
+        .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'))
+        .order_by('-total_revenue')[:DASHBOARD_TOP_LIMIT]
+    )
+    top_categories = list(
+        DailyCategorySales.objects.filter(date__gte=start, date__lte=end)
+        .values('category_id', name=F('category__name'))
+        .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'))
+        .order_by('-total_revenue')[:DASHBOARD_TOP_LIMIT]
+    )
+    return {
+        'totals': totals,
+        'monthly': monthly,
+        'by_payment_method': by_payment_method,
+        'top_products': top_products,
+        'top_categories': top_categories,
+    }
@@ -0,0 +1,71 @@
+# orders/services.py
+"""
+下单服务
+
+create_order 在一个事务中完成整个下单流程，查询数量与购物车商品数无关：
+1. 按商品ID顺序 select_for_update 锁定涉及的商品行，并发下单时不会交叉加锁死锁
+2. 用这一次查询的结果在内存中校验上下架状态和可售库存
+3. 保存订单（含总金额与商品件数），一条 bulk_create 写入全部订单项（价格取锁定时的商品价格）
+4. 一条带 CASE 的条件 UPDATE 锁定库存（见 shop.reservations.reserve_items），支付成功后才转为实际扣减
+5. 一条 DELETE 清空购物车
+6. 订单确认邮件写入发件箱（orders.outbox），与订单一起提交，不在请求中连接 SMTP
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from cart.stores import get_cart_store
+from shop.models import Product
+from shop.reservations import InsufficientStock, reserve_items
+from .models import OrderItem
+from .outbox import queue_order_confirmation
+
+
+class CheckoutError(Exception):
+    """下单失败（购物车为空、商品已下架或库存不足），消息可直接展示给用户"""
+
+
+def create_order(order, user, quantities):
+    """
+    为 user 创建订单并清空其购物车
+    order 为尚未保存的 Order（如 OrderCreateForm.save(commit=False)），quantities 为 {product_id: quantity}
+    失败时整个事务回滚并抛出 CheckoutError
+    """
+    if not quantities:
+        raise CheckoutError('您的购物车是空的，无法创建订单')
+
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update()
+            .filter(id__in=list(quantities))
+            .order_by('id')
+        )
+        if len(products) != len(quantities):
+            raise CheckoutError('购物车中有商品已不存在，请调整购物车后再结算')
+        for product in products:
+            if not product.available:
+                raise CheckoutError(f'{product.name} 已下架，请调整购物车后再结算')
+            if product.available_stock < quantities[product.id]:
+                raise CheckoutError(f'{product.name} 库存不足，仅剩 {product.available_stock} 件')
+
+        items = [
+            OrderItem(product=product, price=product.price, quantity=quantities[product.id])
+            for product in products
+        ]
+        order.user = user
+        # 合计在下单时保存，之后列表、支付、退款都不再聚合订单项
+        order.total_amount = sum((item.get_cost() for item in items), Decimal('0.00'))
+        order.item_count = sum(item.quantity for item in items)
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        try:
+            reserve_items(quantities.items(), order=order, user=user)
+        except InsufficientStock:
+            # 商品行已锁定并校验过，正常不会发生
+            raise CheckoutError('部分商品库存不足，请调整购物车后再结算')
+
+        get_cart_store().clear(user.id)
+        queue_order_confirmation(order)
+    return order
@@ -0,0 +1,14 @@
+import uuid
+
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_key():
+    """
+    生成新的幂等键（每次渲染页面生成一个），用于 @idempotent 装饰的视图
+    使用方式: <input type="hidden" name="idempotency_key" value="{% idempotency_key %}">
+    """
+    return uuid.uuid4().hex
@@ -0,0 +1,144 @@
+import pytest
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product
+from cart.models import CartItem
+from orders.idempotency import _cache_key, idempotent, mark_failed
+from orders.models import Order
+from orders.services import CheckoutError
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestIdempotent:
+    def setup_method(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.calls = 0
+
+    def _post(self, view, data=None, key='key-1', **extra):
+        request = self.factory.post('/checkout/', data or {'amount': '10'}, HTTP_IDEMPOTENCY_KEY=key, **extra)
+        request.user = self.user
+        return view(request)
+
+    def _json_view(self):
+        @idempotent
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'call': self.calls})
+        return view
+
+    def test_replay_returns_original_response(self):
+        """测试同一幂等键的重放请求返回首次响应，不再执行视图"""
+        view = self._json_view()
+        first = self._post(view)
+        second = self._post(view)
+        assert self.calls == 1
+        assert second.content == first.content
+        assert second['Idempotent-Replayed'] == 'true'
+
+        # 不同的键、没有键的请求照常执行
+        self._post(view, key='key-2')
+        self._post(view, key='')
+        assert self.calls == 3
+
+    def test_key_reused_with_different_payload(self):
+        """测试同一幂等键用于参数不同的请求时返回422"""
+        view = self._json_view()
+        self._post(view)
+        assert self._post(view, data={'amount': '20'}).status_code == 422
+        assert self.calls == 1
+
+    def test_in_progress_returns_conflict(self):
+        """测试原请求仍在处理中时返回409"""
+        @idempotent
+        def view(request):
+            self.calls += 1
+            # 处理过程中客户端重试
+            return HttpResponse(status=self._post(view).status_code)
+
+        assert self._post(view).status_code == 409
+        assert self.calls == 1
+
+    def test_failed_response_not_stored(self):
+        """测试失败的响应不保存，可以用同一幂等键重试"""
+        @idempotent
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'error': '支付服务暂时不可用'}, status=400 if self.calls == 1 else 200)
+
+        assert self._post(view).status_code == 400
+        assert self._post(view).status_code == 200
+        assert self.calls == 2
+        request = self.factory.post('/checkout/')
+        request.user = self.user
+        assert cache.get(_cache_key('view', request, 'key-1'))['state'] == 'done'
+
+    def test_marked_failed_redirect_not_stored(self):
+        """测试视图标记为失败的重定向不保存，可以用同一幂等键重试"""
+        @idempotent
+        def view(request):
+            self.calls += 1
+            if self.calls == 1:
+                return mark_failed(HttpResponseRedirect('/cart/'))
+            return HttpResponseRedirect('/orders/1/')
+
+        assert self._post(view)['Location'] == '/cart/'
+        assert self._post(view)['Location'] == '/orders/1/'
+        assert self._post(view)['Location'] == '/orders/1/'
+        assert self.calls == 2
+
+
+@pytest.mark.django_db
+class TestCheckoutIdempotency:
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        product = Product.objects.create(category=category, name='手机', slug='phone', price=100, stock=5)
+        CartItem.objects.create(cart=self.user.cart, product=product, quantity=1)
+        self.client.login(username='buyer', password='testpass123')
+
+    def test_double_submit_creates_one_order(self):
+        """测试重复提交下单表单只创建一个订单"""
+        data = {
+            'first_name': '张', 'last_name': '三', 'email': 'zhangsan@example.com',
+            'address': '北京市朝阳区', 'postal_code': '100000', 'city': '北京',
+            'idempotency_key': 'checkout-1',
+        }
+        first = self.client.post(reverse('orders:order_create'), data)
+        second = self.client.post(reverse('orders:order_create'), data)
+
+        order = Order.objects.get(user=self.user)
+        assert first.status_code == second.status_code == 302
+        assert first['Location'] == second['Location'] == reverse('orders:order_detail', args=[order.id])
+
+    def test_retry_after_checkout_error(self):
+        """测试下单失败跳回购物车后，用同一幂等键重新提交可以创建订单"""
+        data = {
+            'first_name': '张', 'last_name': '三', 'email': 'zhangsan@example.com',
+            'address': '北京市朝阳区', 'postal_code': '100000', 'city': '北京',
+            'idempotency_key': 'checkout-1',
+        }
+        with mock.patch('orders.views.create_order', side_effect=CheckoutError('手机 库存不足，仅剩 0 件')):
+            first = self.client.post(reverse('orders:order_create'), data)
+        assert first['Location'] == reverse('cart:cart_detail')
+        assert not Order.objects.filter(user=self.user).exists()
+
+        second = self.client.post(reverse('orders:order_create'), data)
+        order = Order.objects.get(user=self.user)
+        assert second['Location'] == reverse('orders:order_detail', args=[order.id])
+
+    def test_form_renders_idempotency_key(self):
+        """测试下单页面的表单带有幂等键"""
+        response = self.client.get(reverse('orders:order_create'))
+        assert b'name="idempotency_key"' in response.content
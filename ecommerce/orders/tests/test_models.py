@@ -1,8 +1,12 @@
 import pytest
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from shop.models import Product, Category
-from orders.models import Order, OrderItem
+from orders.models import Order, OrderItem, InvalidStatusTransition
 
 User = get_user_model()
 
@@ -144,6 +148,43 @@ class TestOrderModel:
         assert orders[1] == order1
 
 
+    def _legacy_order(self):
+        """直接创建订单项、没有保存合计的订单"""
+        order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        OrderItem.objects.create(order=order, product=self.product1, price=Decimal('5999.00'), quantity=2)
+        return order
+
+    def test_total_cost_computed_once_per_instance(self):
+        """测试同一实例多次读取总价只聚合一次"""
+        order = Order.objects.get(id=self._legacy_order().id)
+        with CaptureQueriesContext(connection) as queries:
+            assert order.get_total_cost() == Decimal('11998.00')
+            assert order.get_total_cost() == Decimal('11998.00')
+        assert len(queries) == 1
+
+    def test_total_cost_from_prefetched_items(self):
+        """测试已预取订单项时不再查询"""
+        order_id = self._legacy_order().id
+        order = Order.objects.prefetch_related('items').get(id=order_id)
+        with CaptureQueriesContext(connection) as queries:
+            assert order.get_totals() == (Decimal('11998.00'), 2)
+        assert len(queries) == 0
+
+    def test_invalidate_totals(self):
+        """测试订单项变化后清除缓存重新计算"""
+        order = self._legacy_order()
+        assert order.get_total_cost() == Decimal('11998.00')
+        OrderItem.objects.create(order=order, product=self.product2, price=Decimal('12999.00'), quantity=1)
+        assert order.get_total_cost() == Decimal('11998.00')
+
+        order.invalidate_totals()
+        assert order.get_total_cost() == Decimal('24997.00')
+        order.update_totals()
+        assert order.get_totals() == (Decimal('24997.00'), 3)
+
 @pytest.mark.django_db
 class TestOrderPaymentFields:
     def setup_method(self):
@@ -208,4 +249,79 @@ class TestOrderPaymentFields:
 
         order.payment_method = 'cod'
         order.save()
-        assert order.payment_method == 'cod'
\ No newline at end of file
+        assert order.payment_method == 'cod'
+
+@pytest.mark.django_db
+class TestOrderStatus:
+    def setup_method(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+
+    def _order(self, **kwargs):
+        return Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京', **kwargs
+        )
+
+    def test_status_derived_from_flags_on_create(self):
+        """测试按布尔字段创建的订单推导出状态"""
+        assert self._order().status == Order.STATUS_PENDING
+        assert self._order(is_paid=True).status == Order.STATUS_PAID
+        assert self._order(is_paid=True, is_waiting=True).status == Order.STATUS_WAITING
+        assert self._order(is_paid=True, is_refunded=True).status == Order.STATUS_REFUNDED
+
+    def test_set_status_enforces_transitions(self):
+        """测试状态流转校验并同步布尔字段"""
+        order = self._order()
+        with pytest.raises(InvalidStatusTransition):
+            order.set_status(Order.STATUS_REFUNDED)
+
+        order.set_status(Order.STATUS_PAID)
+        order.set_status(Order.STATUS_REFUNDED, refund_amount=Decimal('10.00'))
+        order = Order.objects.get(id=order.id)
+        assert (order.status, order.is_paid, order.is_refunded) == (Order.STATUS_REFUNDED, True, True)
+        assert order.refund_amount == Decimal('10.00')
+        with pytest.raises(InvalidStatusTransition):
+            order.set_status(Order.STATUS_PAID)
+
+    def test_stale_instance_cannot_overwrite_status(self):
+        """测试内存中的旧状态不会覆盖数据库中已流转的状态"""
+        order = self._order(is_paid=True)
+        stale = Order.objects.get(id=order.id)
+        order.set_status(Order.STATUS_REFUNDED)
+        with pytest.raises(InvalidStatusTransition):
+            stale.set_status(Order.STATUS_WAITING)
+        assert Order.objects.get(id=order.id).status == Order.STATUS_REFUNDED
+
+    def test_legacy_flag_update_transitions_status(self):
+        """测试直接修改布尔字段的旧代码按状态机流转"""
+        order = Order.objects.get(id=self._order().id)
+        order.is_paid = True
+        order.save()
+        assert Order.objects.get(id=order.id).status == Order.STATUS_PAID
+
+        order.is_paid = False
+        with pytest.raises(InvalidStatusTransition):
+            order.save()
+
+    def test_conditional_transition(self):
+        """测试条件 UPDATE 只流转允许的来源状态"""
+        order = self._order(is_paid=True, is_waiting=True)
+        assert not Order.objects.transition(order.id, Order.STATUS_PAID, from_statuses=[Order.STATUS_PENDING])
+        assert list(Order.objects.awaiting_stock()) == [order]
+        assert Order.objects.transition(order.id, Order.STATUS_PAID)
+        assert not Order.objects.awaiting_stock().exists()
+
+    def test_admin_form_rejects_invalid_transition(self):
+        """测试后台表单校验状态流转，不允许的流转显示表单错误而不是保存时报错"""
+        from django.forms.models import model_to_dict
+        from orders.admin import OrderAdminForm
+
+        order = Order.objects.get(id=self._order().id)
+        form = OrderAdminForm(data={**model_to_dict(order), 'status': Order.STATUS_REFUNDED}, instance=order)
+        assert not form.is_valid()
+        assert 'status' in form.errors
+
+        form = OrderAdminForm(data={**model_to_dict(order), 'status': Order.STATUS_PAID}, instance=order)
+        assert form.is_valid(), form.errors
+        form.save()
+        assert Order.objects.get(id=order.id).status == Order.STATUS_PAID
@@ -0,0 +1,97 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from orders.models import Order, OutboxEmail
+from orders.outbox import MAX_ATTEMPTS, enqueue_email, retry_delay, send_pending_emails
+from payment.models import Payment
+
+User = get_user_model()
+
+
+class FlakyBackend(EmailBackend):
+    """发给 bad@example.com 的邮件发送失败，其余写入 mail.outbox"""
+
+    def send_messages(self, messages):
+        if any('bad@example.com' in message.to for message in messages):
+            raise ConnectionError('SMTP 连接被拒绝')
+        return super().send_messages(messages)
+
+
+@pytest.mark.django_db
+class TestOutbox:
+    def test_send_task_scheduled(self):
+        """测试定时任务配置中包含发送发件箱邮件的任务"""
+        from django.conf import settings
+        from orders.tasks import send_outbox_emails as task
+        tasks = {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        assert task.name in tasks
+
+    def test_enqueue_does_not_send(self):
+        """测试写入发件箱时不发送邮件"""
+        email = enqueue_email('主题', '正文', 'buyer@example.com')
+        assert email.to == ['buyer@example.com']
+        assert email.status == OutboxEmail.STATUS_PENDING
+        assert len(mail.outbox) == 0
+
+    def test_batches_share_one_connection(self):
+        """测试多个批次共用一个连接发送"""
+        for i in range(5):
+            enqueue_email(f'主题{i}', '正文', f'user{i}@example.com')
+
+        with mock.patch('orders.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            assert send_pending_emails(batch_size=2) == 5
+        assert get_connection.call_count == 1
+        assert [message.subject for message in mail.outbox] == [f'主题{i}' for i in range(5)]
+        assert not OutboxEmail.objects.exclude(status=OutboxEmail.STATUS_SENT).exists()
+
+        # 已发送的邮件不会重复发送
+        assert send_pending_emails() == 0
+        assert len(mail.outbox) == 5
+
+    @override_settings(EMAIL_BACKEND='orders.tests.test_outbox.FlakyBackend')
+    def test_failure_backs_off_then_gives_up(self):
+        """测试发送失败的邮件退避重试，超过最大次数后标记为失败，不影响同批其他邮件"""
+        bad = enqueue_email('失败', '正文', 'bad@example.com')
+        enqueue_email('成功', '正文', 'good@example.com')
+        now = timezone.now()
+
+        assert send_pending_emails(now=now) == 1
+        bad.refresh_from_db()
+        assert (bad.status, bad.attempts) == (OutboxEmail.STATUS_PENDING, 1)
+        assert bad.next_attempt_at == now + retry_delay(1)
+        assert 'SMTP' in bad.last_error
+
+        # 退避时间未到不会重试
+        assert send_pending_emails(now=now + timedelta(seconds=1)) == 0
+        bad.refresh_from_db()
+        assert bad.attempts == 1
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            now = bad.next_attempt_at
+            send_pending_emails(now=now)
+            bad.refresh_from_db()
+        assert (bad.status, bad.attempts) == (OutboxEmail.STATUS_FAILED, MAX_ATTEMPTS)
+        assert [message.subject for message in mail.outbox] == ['成功']
+
+    def test_payment_completed_queues_notification_once(self):
+        """测试支付成功时支付通知写入发件箱，重复保存不会重复写入"""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        order = Order.objects.create(
+            user=user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        payment = Payment.objects.create(order=order, user=user, payment_method='cod', amount=0)
+        payment.payment_status = 'completed'
+        payment.save()
+        payment.save()
+
+        email = OutboxEmail.objects.get()
+        assert email.subject == f'支付成功 - 订单 #{order.id}'
+        assert len(mail.outbox) == 0
@@ -0,0 +1,141 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product
+from orders.models import (
+    DailyCategorySales, DailyPaymentMethodSales, DailyProductSales, Order, OrderItem,
+)
+from orders.rollups import apply_order, dashboard_data, date_chunks, rebuild_range
+
+User = get_user_model()
+
+
+def _snapshot():
+    """三张汇总表的内容，用于比较增量维护与重建的结果"""
+    return {
+        model: set(model.objects.values_list(
+            'date', key, 'revenue', 'units', 'orders'
+        ))
+        for model, key in (
+            (DailyProductSales, 'product_id'),
+            (DailyCategorySales, 'category_id'),
+            (DailyPaymentMethodSales, 'payment_method'),
+        )
+    }
+
+
+@pytest.mark.django_db
+class TestSalesRollups:
+    def setup_method(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.phones = Category.objects.create(name='手机', slug='phones')
+        self.books = Category.objects.create(name='图书', slug='books')
+        self.phone = Product.objects.create(category=self.phones, name='手机', slug='phone', price=Decimal('100.00'), stock=50)
+        self.case = Product.objects.create(category=self.phones, name='手机壳', slug='case', price=Decimal('10.00'), stock=50)
+        self.book = Product.objects.create(category=self.books, name='小说', slug='novel', price=Decimal('20.00'), stock=50)
+
+    def _paid_order(self, items, payment_method='alipay'):
+        order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京',
+        )
+        for product, quantity in items:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        order.set_status(Order.STATUS_PAID, payment_method=payment_method)
+        return order
+
+    def test_apply_order_increments_rollups(self):
+        """测试支付成功的订单按商品、分类、支付方式累加"""
+        apply_order(self._paid_order([(self.phone, 1), (self.case, 2)]))
+        apply_order(self._paid_order([(self.phone, 2), (self.book, 1)], payment_method='wechat'))
+
+        phone = DailyProductSales.objects.get(product=self.phone)
+        assert (phone.revenue, phone.units, phone.orders) == (Decimal('300.00'), 3, 2)
+        phones = DailyCategorySales.objects.get(category=self.phones)
+        # 同一订单的两件手机类商品只计一次订单数
+        assert (phones.revenue, phones.units, phones.orders) == (Decimal('320.00'), 5, 2)
+        methods = dict(DailyPaymentMethodSales.objects.values_list('payment_method', 'revenue'))
+        assert methods == {'alipay': Decimal('120.00'), 'wechat': Decimal('220.00')}
+
+    def test_refund_subtracts_order(self):
+        """测试退款从汇总中扣除订单"""
+        kept = self._paid_order([(self.phone, 1)])
+        refunded = self._paid_order([(self.phone, 2)])
+        apply_order(kept)
+        apply_order(refunded)
+
+        refunded.set_status(Order.STATUS_REFUNDED)
+        apply_order(refunded, -1)
+
+        phone = DailyProductSales.objects.get(product=self.phone)
+        assert (phone.revenue, phone.units, phone.orders) == (Decimal('100.00'), 1, 1)
+
+    def test_rebuild_matches_incremental(self):
+        """测试按区间重建的结果与增量维护一致（已退款订单不计入）"""
+        for order in (
+            self._paid_order([(self.phone, 1), (self.case, 2)]),
+            self._paid_order([(self.book, 3)], payment_method='wechat'),
+        ):
+            apply_order(order)
+        refunded = self._paid_order([(self.case, 1)])
+        apply_order(refunded)
+        refunded.set_status(Order.STATUS_REFUNDED)
+        apply_order(refunded, -1)
+        # 未支付订单不计入
+        Order.objects.create(
+            user=self.user, first_name='李', last_name='四', email='lisi@example.com',
+            address='上海市', postal_code='200000', city='上海',
+        )
+        # 增量维护会留下归零的行，重建不会写入，比较前先去掉
+        incremental = {model: {row for row in rows if row[4]} for model, rows in _snapshot().items()}
+
+        today = timezone.localdate()
+        rebuild_range(today - timedelta(days=1), today)
+        assert _snapshot() == incremental
+
+        DailyProductSales.objects.all().delete()
+        call_command('rebuild_sales_rollups', start=str(today), end=str(today), chunk_days=1)
+        assert _snapshot() == incremental
+
+    def test_date_chunks(self):
+        """测试日期区间按天数切分"""
+        start = timezone.localdate().replace(month=1, day=1)
+        chunks = date_chunks(start, start + timedelta(days=9), 4)
+        assert chunks == [
+            (start, start + timedelta(days=3)),
+            (start + timedelta(days=4), start + timedelta(days=7)),
+            (start + timedelta(days=8), start + timedelta(days=9)),
+        ]
+
+    def test_dashboard_data(self):
+        """测试报表数据只从汇总表读取"""
+        apply_order(self._paid_order([(self.phone, 1), (self.book, 1)]))
+        today = timezone.localdate()
+        data = dashboard_data(today, today)
+
+        assert data['totals'] == {'total_revenue': Decimal('120.00'), 'total_units': 2, 'total_orders': 1}
+        assert [row['name'] for row in data['top_products']] == ['手机', '小说']
+        assert data['monthly'][0]['total_revenue'] == Decimal('120.00')
+
+    def test_dashboard_view_requires_staff(self):
+        """测试销售报表仅限管理员访问"""
+        client = Client()
+        url = reverse('orders:sales_dashboard')
+        client.force_login(self.user)
+        assert client.get(url).status_code == 302
+
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        apply_order(self._paid_order([(self.phone, 1)]))
+        client.force_login(staff)
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.context['totals']['total_revenue'] == Decimal('100.00')
@@ -0,0 +1,89 @@
+import pytest
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from shop.models import Product, Category, StockReservation
+from cart.models import CartItem
+from orders.models import Order, OrderItem, OutboxEmail
+from orders.services import CheckoutError, create_order
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    def setup_method(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.products = [
+            Product.objects.create(category=self.category, name=f'商品{i}', slug=f'product-{i}', price=10 + i, stock=5)
+            for i in range(6)
+        ]
+
+    def _order(self):
+        return Order(
+            first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+
+    def _fill_cart(self, products, quantity=1):
+        for product in products:
+            CartItem.objects.create(cart=self.user.cart, product=product, quantity=quantity)
+        return {product.id: quantity for product in products}
+
+    def _count_queries(self, quantities):
+        with CaptureQueriesContext(connection) as queries:
+            create_order(self._order(), self.user, quantities)
+        return len(queries)
+
+    def test_creates_items_reserves_stock_and_clears_cart(self):
+        """测试下单写入订单项、锁定库存并清空购物车"""
+        quantities = self._fill_cart(self.products[:2], quantity=2)
+        order = create_order(self._order(), self.user, quantities)
+
+        assert order.user == self.user
+        assert (order.total_amount, order.item_count) == (Decimal('42.00'), 4)
+        assert dict(OrderItem.objects.filter(order=order).values_list('product_id', 'quantity')) == quantities
+        assert set(Product.objects.filter(id__in=quantities).values_list('reserved', flat=True)) == {2}
+        assert StockReservation.objects.filter(order=order).count() == 2
+        assert not CartItem.objects.filter(cart__user=self.user).exists()
+
+    def test_query_count_independent_of_cart_size(self):
+        """测试查询数量与购物车商品数无关"""
+        small = self._count_queries(self._fill_cart(self.products[:1]))
+        large = self._count_queries(self._fill_cart(self.products[1:]))
+        assert small == large
+
+    def test_insufficient_stock_rolls_back(self):
+        """测试库存不足时整单回滚，购物车保持不变"""
+        quantities = self._fill_cart(self.products[:2])
+        quantities[self.products[1].id] = 6
+        with pytest.raises(CheckoutError):
+            create_order(self._order(), self.user, quantities)
+
+        assert not Order.objects.exists()
+        assert not Product.objects.filter(reserved__gt=0).exists()
+        assert CartItem.objects.filter(cart__user=self.user).count() == 2
+
+    def test_unavailable_product_rejected(self):
+        """测试已下架商品不能下单"""
+        Product.objects.filter(id=self.products[0].id).update(available=False)
+        with pytest.raises(CheckoutError):
+            create_order(self._order(), self.user, self._fill_cart(self.products[:1]))
+        assert not Order.objects.exists()
+
+    def test_queues_order_confirmation(self):
+        """测试下单后订单确认邮件写入发件箱，回滚时不写入"""
+        order = create_order(self._order(), self.user, self._fill_cart(self.products[:1]))
+        email = OutboxEmail.objects.get()
+        assert email.subject == f'订单确认 #{order.id}'
+        assert email.to == ['zhangsan@example.com']
+
+        with pytest.raises(CheckoutError):
+            create_order(self._order(), self.user, {self.products[1].id: 6})
+        assert OutboxEmail.objects.count() == 1
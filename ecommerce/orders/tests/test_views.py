@@ -1,9 +1,17 @@
 import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from shop.models import Product, Category
 from cart.cart import Cart
+from orders.models import Order
+from orders.views import ORDERS_PAGE_SIZE
 
 User = get_user_model()
 
@@ -139,4 +147,52 @@ class TestOrderViews:
         orders = response.context['orders']
         assert len(orders) == 2
         assert order1 in orders
-        assert order2 in orders
\ No newline at end of file
+        assert order2 in orders
+
+@pytest.mark.django_db
+class TestOrderListPagination:
+    def setup_method(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.client.force_login(self.user)
+        base = timezone.now()
+        Order.objects.bulk_create([
+            Order(
+                user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+                address='北京市朝阳区', postal_code='100000', city='北京',
+                total_amount=Decimal('10.00') * (i + 1), item_count=1,
+            )
+            for i in range(ORDERS_PAGE_SIZE + 5)
+        ])
+        # 其中两个订单下单时间相同，验证游标在时间相同时按ID继续
+        orders = list(Order.objects.order_by('id'))
+        for i, order in enumerate(orders):
+            order.created = base - timedelta(minutes=i // 2 * 2)
+        Order.objects.bulk_update(orders, ['created'])
+
+    def test_pages_cover_all_orders_once(self):
+        """测试游标分页按下单时间倒序遍历全部订单，不重复不遗漏"""
+        seen = []
+        url = reverse('orders:order_list')
+        while url:
+            response = self.client.get(url)
+            seen += [order.id for order in response.context['orders']]
+            cursor = response.context['next_cursor']
+            url = f"{reverse('orders:order_list')}?cursor={cursor}" if cursor else None
+        expected = list(Order.objects.order_by('-created', '-id').values_list('id', flat=True))
+        assert seen == expected
+
+    def test_list_uses_stored_totals(self):
+        """测试订单列表读取保存的总金额，不聚合订单项"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:order_list'))
+        assert '¥20.00' in response.content.decode()
+        assert not [q for q in queries.captured_queries if 'orders_orderitem' in q['sql']]
+        assert len([q for q in queries.captured_queries if 'orders_order' in q['sql']]) == 1
+
+    def test_invalid_cursor_redirects(self):
+        """测试无效游标返回第一页"""
+        response = self.client.get(reverse('orders:order_list'), {'cursor': 'bad'})
+        assert response.status_code == 302
+        response = self.client.get(reverse('orders:order_list'), {'cursor': f'{10 ** 20}-1'})
+        assert response.status_code == 302
@@ -11,4 +11,9 @@ urlpatterns = [
     # 新增退款相关URL
     path('refund/request/<int:order_id>/', views.refund_request, name='refund_request'),
     path('refund/process/<int:order_id>/', views.process_refund, name='process_refund'),
+    # 数据导出（仅限管理员）
+    path('export/', views.order_export, name='order_export'),
+    path('export/items/', views.order_item_export, name='order_item_export'),
+    # 销售报表（仅限管理员）
+    path('dashboard/', views.sales_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
@@ -1,18 +1,33 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from cart.models import Cart
-from .models import Order, OrderItem
+from cart.stores import get_cart_store
+from shop.reservations import release_order_reservations
+from .idempotency import idempotent, mark_failed
+from .models import Order
+from .rollups import apply_order, dashboard_data
+from .services import CheckoutError, create_order
 from django.urls import reverse
 from django.contrib import messages
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from django.utils import timezone
 from django.db import transaction
 from .forms import OrderCreateForm, RefundRequestForm
-from .tasks import send_refund_confirmation_email
+from .outbox import queue_refund_confirmation
 # 假设payment应用中有处理支付网关退款的工具函数
 from payment.utils import process_payment_refund  # 需要根据实际payment应用实现
+from django.contrib.admin.views.decorators import staff_member_required
+from shop.exports import export_response
+from .exports import export_orders, export_order_items
+
+ORDERS_PAGE_SIZE = 20
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
 
 # 辅助函数：获取订单（不存在返回404）
 def _get_order(order_id,user):
@@ -34,8 +49,9 @@ def refund_request(request, order_id):
         if form.is_valid():
             # 验证退款金额是否合理
             amount = form.cleaned_data['amount']
-            if amount > order.get_total_cost():
-                messages.error(request, f'退款金额不能超过订单总金额 ¥{order.get_total_cost()}')
+            total_cost = order.get_total_cost()
+            if amount > total_cost:
+                messages.error(request, f'退款金额不能超过订单总金额 ¥{total_cost}')
                 return render(request, 'orders/refund_request.html', {'order': order, 'form': form})
 
             return redirect('orders:process_refund', order_id=order.id)
@@ -72,15 +88,18 @@ def process_refund(request, order_id):
             )
 
             if refund_success:
-                # 2. 更新订单状态（使用事务确保数据一致性）
-                order.is_refunded = True
-                order.refund_reason = form.cleaned_data['reason']
-                order.refund_amount = form.cleaned_data['amount']
-                order.refund_date = timezone.now()
-                order.save()
+                # 2. 更新订单状态（使用事务确保数据一致性，状态流转不合法时抛出 InvalidStatusTransition）
+                order.set_status(
+                    Order.STATUS_REFUNDED,
+                    refund_reason=form.cleaned_data['reason'],
+                    refund_amount=form.cleaned_data['amount'],
+                    refund_date=timezone.now(),
+                )
+                # 从日销售汇总中扣除该订单
+                apply_order(order, -1)
 
-                # 3. 发送退款确认邮件（异步任务）
-                send_refund_confirmation_email.delay(order.id)
+                # 3. 退款确认邮件写入发件箱，由 orders.tasks.send_outbox_emails 批量发送
+                queue_refund_confirmation(order)
 
                 messages.success(request, '退款申请已处理，资金将在1-3个工作日内退回原支付账户')
                 return redirect('orders:order_detail', order_id=order.id)
@@ -101,6 +120,7 @@ def process_refund(request, order_id):
     })
 
 @login_required
+@idempotent
 def order_create(request):
     """创建订单 - 使用数据库购物车"""
     # 检查用户是否已登录
@@ -110,32 +130,30 @@ def order_create(request):
         next_url = reverse('orders:order_create')
         redirect_url = f"{login_url}?next={next_url}"
         return redirect(redirect_url)
-    # 获取用户的数据库购物车
-    cart = Cart.objects.get(user=request.user)
-    cart_items = cart.items.all()
+    # 一次查询构建购物车快照，下单和模板渲染都使用快照
+    store = get_cart_store()
+    cart = store.snapshot(request.user.id)
 
-    if not cart_items:
+    if not cart:
         messages.error(request, '您的购物车是空的，无法创建订单')
-        return redirect('cart:cart_detail')
+        return mark_failed(redirect('cart:cart_detail'))
 
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
+        if not cart.can_checkout:
+            messages.error(request, '部分商品库存不足或已下架，请调整购物车后再结算')
+            return mark_failed(redirect('cart:cart_detail'))
         if form.is_valid():
-            order = form.save(commit=False)
-            order.user = request.user
-            order.save()
-
-            # 创建订单项
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    price=item.product.price,
-                    quantity=item.quantity
+            try:
+                # 锁定商品、校验库存、批量写入订单项、锁定库存、清空购物车，在同一事务中完成
+                order = create_order(
+                    form.save(commit=False),
+                    request.user,
+                    {line.product.id: line.quantity for line in cart},
                 )
-
-            # 清空购物车
-            cart_items.all().delete()
+            except CheckoutError as e:
+                messages.error(request, str(e))
+                return mark_failed(redirect('cart:cart_detail'))
 
             return redirect('orders:order_detail', order_id=order.id)
     else:
@@ -143,15 +161,14 @@ def order_create(request):
 
     return render(request, 'orders/create.html', {
         'cart': cart,
-        'cart_items': cart_items,
         'form': form,
-        'total_price': cart.get_total_price()
     })
 
 
 @login_required
 def order_detail(request, order_id):
-    order = _get_order(order_id, request.user)
+    # 预取订单项：列表展示和没有保存合计的订单计算总价都使用同一份数据
+    order = get_object_or_404(Order.objects.prefetch_related('items__product'), id=order_id, user=request.user)
 
     # 如果订单未支付，显示支付按钮
     show_payment_button = not order.is_paid
@@ -163,6 +180,9 @@ def order_detail(request, order_id):
 def order_delete(request, order_id):
     order = _get_order(order_id, request.user)
 
+    # 未支付订单删除前归还锁定的库存
+    release_order_reservations(order)
+
     order_items = order.items.all()
     for item in order_items:
         item.delete()
@@ -174,7 +194,75 @@ def order_delete(request, order_id):
 
 
 
+def _encode_order_cursor(order):
+    """将本页最后一个订单的 (created, id) 编码为游标"""
+    micros = (order.created - _EPOCH) // _MICROSECOND
+    return f'{micros}-{order.id}'
+
+
+def _decode_order_cursor(cursor):
+    """解析游标，格式错误或时间超出范围时抛出 ValueError"""
+    micros, order_id = cursor.split('-', 1)
+    try:
+        created = _EPOCH + timedelta(microseconds=int(micros))
+    except OverflowError:
+        raise ValueError(f'游标超出范围: {cursor}')
+    return created, int(order_id)
+
+
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user)
-    return render(request, 'orders/list.html', {'orders': orders})
\ No newline at end of file
+    """
+    我的订单：基于 (user, created) 索引的游标分页，每页一次查询
+    总金额读取订单上保存的合计，不再逐个订单聚合订单项
+    """
+    queryset = Order.objects.filter(user=request.user)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            created, order_id = _decode_order_cursor(cursor)
+        except ValueError:
+            return redirect('orders:order_list')
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=order_id))
+
+    # 多取一条用来判断是否还有下一页，无需 COUNT 查询
+    orders = list(queryset.order_by('-created', '-id')[:ORDERS_PAGE_SIZE + 1])
+    next_cursor = _encode_order_cursor(orders[ORDERS_PAGE_SIZE - 1]) if len(orders) > ORDERS_PAGE_SIZE else None
+    return render(request, 'orders/list.html', {
+        'orders': orders[:ORDERS_PAGE_SIZE],
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+    })
+
+
+@staff_member_required
+def order_export(request):
+    """导出订单数据（仅限管理员，流式输出）"""
+    return export_response(request, 'orders', export_orders)
+
+
+@staff_member_required
+def order_item_export(request):
+    """导出订单项数据（仅限管理员，流式输出）"""
+    return export_response(request, 'order_items', export_order_items)
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """销售报表（仅限管理员）：只读取日销售汇总表，查询耗时与订单量无关，默认最近12个自然月（含本月）"""
+    end = timezone.localdate()
+    month_start = end.replace(day=1)
+    if month_start.month == 12:
+        start = month_start.replace(month=1)
+    else:
+        start = month_start.replace(year=month_start.year - 1, month=month_start.month + 1)
+    try:
+        if request.GET.get('start'):
+            start = date.fromisoformat(request.GET['start'])
+        if request.GET.get('end'):
+            end = date.fromisoformat(request.GET['end'])
+    except ValueError:
+        messages.error(request, '日期格式应为 YYYY-MM-DD')
+    context = dashboard_data(start, end)
+    context.update({'start': start, 'end': end})
+    return render(request, 'orders/dashboard.html', context)
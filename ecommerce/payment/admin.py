@@ -1,6 +1,6 @@
 # payment/admin.py - 优化支付记录管理
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, WebhookEvent
 
 
 @admin.register(Payment)
@@ -14,4 +14,12 @@ class PaymentAdmin(admin.ModelAdmin):
     def order_id(self, obj):
         return obj.order.id
 
-    order_id.short_description = '订单号'
\ No newline at end of file
+    order_id.short_description = '订单号'
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'provider', 'event_type', 'event_id', 'status', 'attempts', 'event_created', 'processed_at']
+    list_filter = ['provider', 'status', 'event_type']
+    search_fields = ['event_id']
+    readonly_fields = ['payload', 'attempts', 'last_error', 'received_at', 'processed_at']
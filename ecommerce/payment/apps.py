@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PaymentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payment'
+
+    def ready(self):
+        """应用准备好时导入信号"""
+        import payment.signals
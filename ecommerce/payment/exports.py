@@ -0,0 +1,17 @@
+# payment/exports.py
+"""支付记录的流式导出"""
+from shop.exports import EXPORT_CHUNK_SIZE, filter_by_date_range
+from .models import Payment
+
+PAYMENT_EXPORT_FIELDS = (
+    'id', 'order_id', 'user_id', 'payment_method', 'payment_status',
+    'amount', 'transaction_id', 'created_at', 'updated_at',
+)
+
+
+def export_payments(start=None, end=None):
+    """导出支付记录（按创建时间筛选）"""
+    queryset = filter_by_date_range(Payment.objects.all(), 'created_at', start, end)
+    rows = queryset.order_by('id').values_list(*PAYMENT_EXPORT_FIELDS) \
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return PAYMENT_EXPORT_FIELDS, rows
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(default='stripe', max_length=20, verbose_name='支付网关')),
+                ('event_id', models.CharField(max_length=255, verbose_name='事件ID')),
+                ('event_type', models.CharField(max_length=100, verbose_name='事件类型')),
+                ('payload', models.JSONField(verbose_name='事件内容')),
+                ('event_created', models.DateTimeField(verbose_name='事件时间')),
+                ('status', models.CharField(choices=[('pending', '待处理'), ('processed', '已处理'), ('failed', '处理失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='处理次数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次处理时间')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='接收时间')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='处理时间')),
+            ],
+            options={
+                'verbose_name': 'Webhook事件',
+                'verbose_name_plural': 'Webhook事件',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'event_id'), name='webhook_event_unique')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 # payment/models.py
 from django.db import models
+from django.utils import timezone
 from orders.models import Order
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -25,15 +26,65 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default='pending')
     amount = models.DecimalField(max_digits=65, decimal_places=2)
-    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    # Stripe webhook 按 PaymentIntent ID 查找支付记录
+    transaction_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     payment_date = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录从数据库加载时的支付状态，用于判断保存时是否刚变为支付成功
+        instance._loaded_status = instance.payment_status
+        return instance
+
     def __str__(self):
         return f"支付 #{self.id} - {self.get_payment_method_display()} - ¥{self.amount}"
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = '支付记录'
-        verbose_name_plural = '支付记录'
\ No newline at end of file
+        verbose_name_plural = '支付记录'
+
+
+class WebhookEvent(models.Model):
+    """
+    支付网关 webhook 事件收件箱：验证签名后只写入一行就返回200，由 payment.tasks.process_webhook_events 按顺序处理
+    事件ID唯一，网关重试推送同一事件时不会重复写入、重复处理
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '待处理'),
+        (STATUS_PROCESSED, '已处理'),
+        (STATUS_FAILED, '处理失败'),
+    ]
+
+    provider = models.CharField(max_length=20, default='stripe', verbose_name='支付网关')
+    event_id = models.CharField(max_length=255, verbose_name='事件ID')
+    event_type = models.CharField(max_length=100, verbose_name='事件类型')
+    payload = models.JSONField(verbose_name='事件内容')
+    # 网关生成事件的时间，按此顺序处理
+    event_created = models.DateTimeField(verbose_name='事件时间')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='处理次数')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='下次处理时间')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='接收时间')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='处理时间')
+
+    class Meta:
+        verbose_name = 'Webhook事件'
+        verbose_name_plural = 'Webhook事件'
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='webhook_event_unique'),
+        ]
+        indexes = [
+            # 处理任务按 status = pending AND next_attempt_at <= now 取批次
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.provider} {self.event_type} {self.event_id}'
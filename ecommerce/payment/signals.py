@@ -0,0 +1,49 @@
+# payment/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from orders.models import Order
+from orders.rollups import apply_order
+from shop.reservations import commit_order_reservations
+from shop.trending import record_sales
+from .models import Payment
+from .utils import send_payment_success_notification
+
+
+@receiver(post_save, sender=Payment)
+def record_sales_on_payment_completed(sender, instance, created, **kwargs):
+    """
+    支付状态变为支付成功时履约（每个订单只履约一次：同一订单的 webhook、货到付款、支付成功回调重复触发，
+    或同一支付记录被并发保存时，只有抢到 Order.objects.claim_fulfilment 的一次执行以下操作）：
+    - 把订单的库存锁定转为实际扣减，锁定已过期且库存不足时把订单和支付标记为待调货
+    - 把订单计入日销售汇总（orders.rollups）
+    - 把订单销量计入热销榜
+    - 支付成功邮件写入发件箱
+    """
+    if instance.payment_status != 'completed':
+        return
+    if not created and getattr(instance, '_loaded_status', None) == 'completed':
+        return
+    instance._loaded_status = instance.payment_status
+    with transaction.atomic():
+        # 履约标记与库存扣减、汇总在同一事务中，任一步失败都整体回滚，下次回调可以重新履约
+        if not Order.objects.claim_fulfilment(instance.order_id):
+            return
+
+        shortages = commit_order_reservations(instance.order)
+        if shortages:
+            # 用条件 UPDATE 直接修改，避免再次触发本信号
+            if Order.objects.transition(instance.order_id, Order.STATUS_WAITING):
+                order = instance.order
+                order.status = order._loaded_status = Order.STATUS_WAITING
+                order.is_paid = order.is_waiting = True
+            Payment.objects.filter(id=instance.id).update(payment_status='waiting')
+            instance.payment_status = instance._loaded_status = 'waiting'
+
+        apply_order(instance.order)
+        send_payment_success_notification(instance.order, instance)
+
+    items = list(instance.order.items.values_list('product_id', 'quantity'))
+    # 事务提交后再写 Redis，避免回滚的支付进入热销榜
+    transaction.on_commit(lambda: record_sales(items))
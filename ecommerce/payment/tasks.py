@@ -0,0 +1,10 @@
+# payment/tasks.py
+from celery import shared_task
+
+
+@shared_task
+def process_webhook_events():
+    """按顺序处理收件箱中的支付网关 webhook 事件（celery beat 每10秒执行一次，见 settings.CELERY_BEAT_SCHEDULE）"""
+    from .webhooks import process_pending_events
+    count = process_pending_events()
+    return f"Processed {count} webhook events"
@@ -94,6 +94,29 @@ class TestPaymentViews:
         payment = Payment.objects.get(order=self.order, payment_method='stripe')
         assert payment.payment_status == 'pending'
 
+    def test_payment_options_reuses_payment_when_total_changes(self):
+        """测试订单合计变化后仍复用同一条待支付记录并更新金额"""
+        self.client.force_login(self.user)
+        url = reverse('payment:payment_options', args=[self.order.id])
+        self.client.post(url, {'payment_method': 'stripe'})
+        OrderItem.objects.create(order=self.order, product=self.product, price=self.product.price, quantity=1)
+        self.client.post(url, {'payment_method': 'stripe'})
+
+        payment = Payment.objects.get(order=self.order, payment_method='stripe')
+        assert payment.amount == self.order.compute_totals()[0]
+
+    def test_completed_payment_keeps_amount(self):
+        """测试订单合计变化后已完成的支付记录不修改金额"""
+        from payment.views import _get_payment
+        payment, created = _get_payment(self.order, self.user, 'cod', 'completed')
+        paid = payment.amount
+        OrderItem.objects.create(order=self.order, product=self.product, price=self.product.price, quantity=1)
+
+        order = Order.objects.get(id=self.order.id)
+        payment, created = _get_payment(order, self.user, 'cod', 'completed')
+        assert not created
+        assert Payment.objects.get(id=payment.id).amount == paid
+
     def test_payment_options_post_paypal(self):
         """测试选择PayPal支付"""
         self.client.force_login(self.user)
@@ -0,0 +1,141 @@
+# payment/tests/test_webhooks.py
+import hashlib
+import hmac
+import json
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product
+from orders.models import Order, OrderItem
+from payment.models import Payment, WebhookEvent
+from payment.webhooks import HANDLERS, MAX_ATTEMPTS, process_pending_events, retry_delay
+
+User = get_user_model()
+
+WEBHOOK_SECRET = 'whsec_test_secret'
+FIXTURES = Path(__file__).parent / 'fixtures' / 'stripe_events'
+
+
+def load_event(name, **overrides):
+    """读取录制的 Stripe 事件"""
+    event = json.loads((FIXTURES / f'{name}.json').read_text(encoding='utf-8'))
+    event.update(overrides)
+    return event
+
+
+def replay(client, event, secret=WEBHOOK_SECRET):
+    """本地替身：按 Stripe 的签名方式签名后把录制的事件推送到 webhook"""
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        reverse('payment:stripe_webhook'), payload, content_type='application/json',
+        HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}',
+    )
+
+
+@pytest.mark.django_db
+class TestStripeWebhookInbox:
+    @pytest.fixture(autouse=True)
+    def webhook_secret(self, settings):
+        settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+
+    def setup_method(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        product = Product.objects.create(category=category, name='手机', slug='phone', price=599, stock=10)
+        self.order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        OrderItem.objects.create(order=self.order, product=product, price=product.price, quantity=1)
+        self.payment = Payment.objects.create(
+            order=self.order, user=self.user, payment_method='stripe', amount=599,
+            transaction_id='pi_3QxRecorded0001',
+        )
+
+    def test_process_task_scheduled(self):
+        """测试定时任务配置中包含处理 webhook 事件的任务"""
+        from django.conf import settings
+        from payment.tasks import process_webhook_events as task
+        tasks = {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        assert task.name in tasks
+
+    def test_webhook_only_records_event(self):
+        """测试 webhook 验证签名后只写入收件箱，不修改支付记录"""
+        response = replay(self.client, load_event('payment_intent.succeeded'))
+        assert response.status_code == 200
+
+        event = WebhookEvent.objects.get()
+        assert (event.event_id, event.status) == ('evt_3QxRecorded0001', WebhookEvent.STATUS_PENDING)
+        self.payment.refresh_from_db()
+        assert self.payment.payment_status == 'pending'
+
+    def test_invalid_signature_rejected(self):
+        """测试签名无效的事件返回400且不写入"""
+        response = replay(self.client, load_event('payment_intent.succeeded'), secret='whsec_wrong')
+        assert response.status_code == 400
+        assert not WebhookEvent.objects.exists()
+
+    def test_retried_delivery_processed_once(self):
+        """测试 Stripe 重试推送同一事件只写入、处理一次"""
+        event = load_event('payment_intent.succeeded')
+        assert replay(self.client, event).status_code == 200
+        assert replay(self.client, event).status_code == 200
+        assert WebhookEvent.objects.count() == 1
+
+        assert process_pending_events() == 1
+        assert process_pending_events() == 0
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        assert self.payment.payment_status == 'completed'
+        assert (self.order.status, self.order.payment_method) == (Order.STATUS_PAID, 'stripe')
+        assert self.order.fulfilled_at is not None
+
+    def test_events_processed_in_event_order(self):
+        """测试按事件时间顺序处理，没有处理函数的事件类型直接标记为已处理"""
+        replay(self.client, load_event('payment_intent.succeeded'))
+        replay(self.client, load_event('charge.refunded'))
+        seen = []
+        with patch.dict(HANDLERS, {
+            'payment_intent.succeeded': lambda event: seen.append(event['id']),
+            'charge.refunded': lambda event: seen.append(event['id']),
+        }):
+            assert process_pending_events() == 2
+        assert seen == ['evt_3QxRecorded0002', 'evt_3QxRecorded0001']
+
+        replay(self.client, load_event('charge.refunded', id='evt_3QxRecorded0003'))
+        assert process_pending_events() == 1
+        assert not WebhookEvent.objects.exclude(status=WebhookEvent.STATUS_PROCESSED).exists()
+
+    def test_failed_event_retried_with_backoff(self):
+        """测试处理失败的事件回滚后退避重试，超过最大次数后标记为失败"""
+        replay(self.client, load_event('payment_intent.succeeded'))
+
+        def fail(event):
+            Payment.objects.filter(id=self.payment.id).update(payment_status='completed')
+            raise RuntimeError('数据库暂时不可用')
+
+        now = timezone.now()
+        with patch.dict(HANDLERS, {'payment_intent.succeeded': fail}):
+            assert process_pending_events(now=now) == 0
+            event = WebhookEvent.objects.get()
+            assert (event.status, event.attempts) == (WebhookEvent.STATUS_PENDING, 1)
+            assert event.next_attempt_at == now + retry_delay(1)
+            # 失败事件的修改整体回滚
+            self.payment.refresh_from_db()
+            assert self.payment.payment_status == 'pending'
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                process_pending_events(now=event.next_attempt_at)
+                event.refresh_from_db()
+        assert (event.status, event.attempts) == (WebhookEvent.STATUS_FAILED, MAX_ATTEMPTS)
+        assert '数据库暂时不可用' in event.last_error
@@ -15,4 +15,5 @@ urlpatterns = [
     path('success/<int:order_id>/', views.payment_success, name='payment_success'),
     path('cancel/<int:order_id>/', views.payment_cancel, name='payment_cancel'),
     path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
+    path('export/', views.payment_export, name='payment_export'),
 ]
\ No newline at end of file
@@ -1,12 +1,22 @@
 """
-支付网关退款处理工具函数
-需要根据实际使用的支付网关进行实现
+支付工具函数：标记订单已支付、支付网关退款处理（需要根据实际使用的支付网关进行实现）、支付成功通知
 """
 import logging
 
+from orders.models import Order
+
 logger = logging.getLogger(__name__)
 
 
+def mark_order_paid(order, payment_method):
+    """把待支付订单标记为已支付（条件 UPDATE，重复回调不会覆盖待调货、已退款等后续状态）"""
+    if Order.objects.transition(order.id, Order.STATUS_PAID, from_statuses=[Order.STATUS_PENDING],
+                                payment_method=payment_method):
+        order.status = order._loaded_status = Order.STATUS_PAID
+        order.is_paid = True
+        order.payment_method = payment_method
+
+
 def process_payment_refund(order_id, amount, payment_method):
     """
     处理支付退款
@@ -48,4 +58,21 @@ def process_payment_refund(order_id, amount, payment_method):
 
     except Exception as e:
         logger.error(f"退款处理失败: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def send_payment_success_notification(order, payment):
+    """支付成功通知：写入发件箱，由 orders.tasks.send_outbox_emails 批量发送，不在请求中连接 SMTP"""
+    from orders.outbox import enqueue_email
+
+    subject = f'支付成功 - 订单 #{order.id}'
+    message = f'''
+        尊敬的{order.first_name} {order.last_name}，
+
+        您的订单 #{order.id} 已支付成功。
+        支付金额：¥{payment.amount}
+        支付方式：{payment.get_payment_method_display()}
+
+        感谢您的购买！
+        '''
+    return enqueue_email(subject, message, order.email)
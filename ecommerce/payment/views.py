@@ -1,4 +1,5 @@
 # payment/views.py
+import json
 import stripe
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
@@ -6,9 +7,14 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse
 from django.contrib import messages
+from orders.idempotency import idempotent
 from orders.models import Order
-from shop.models import Product
 from .models import Payment
+from .utils import mark_order_paid
+from .webhooks import record_event
+from django.contrib.admin.views.decorators import staff_member_required
+from shop.exports import export_response
+from .exports import export_payments
 
 # 配置Stripe
 if hasattr(settings, 'STRIPE_SECRET_KEY'):
@@ -19,18 +25,28 @@ def _get_order(order_id,user):
     """获取商品实例，不存在则返回404"""
     return get_object_or_404(Order, id=order_id, user=user)
 
-# 辅助函数：创建待处理的支付记录（不存在返回404）
+# 辅助函数：获取或创建支付记录
 def _get_payment(order,user,payment_method,payment_status):
-    """获取商品实例，不存在则返回404"""
-    return Payment.objects.get_or_create(
-                order=order,
-                user=user,
-                payment_method=payment_method,
-                payment_status=payment_status,
-                amount=order.get_total_cost()
-            )
+    """
+    获取或创建订单的支付记录，返回 (payment, created)
+    金额不参与查找（订单合计变化后仍然复用同一条记录），只在创建时写入；
+    已有的待支付记录金额与订单合计不一致时更新，已完成的支付记录保留实际支付的金额
+    """
+    amount = order.get_total_cost()
+    payment, created = Payment.objects.get_or_create(
+        order=order,
+        user=user,
+        payment_method=payment_method,
+        payment_status=payment_status,
+        defaults={'amount': amount},
+    )
+    if not created and payment.payment_status == 'pending' and payment.amount != amount:
+        payment.amount = amount
+        payment.save(update_fields=['amount', 'updated_at'])
+    return payment, created
 
 @login_required
+@idempotent
 def payment_options(request, order_id):
     """支付选项页面"""
     order = _get_order(order_id,request.user)
@@ -82,10 +98,9 @@ def payment_options(request, order_id):
             #     payment_status='completed',
             #     amount=order.get_total_cost()
             # )
+            # 先标记订单已支付，支付记录变为成功时的库存扣减可能再把订单转为待调货
+            mark_order_paid(order, 'cod')
             _get_payment(order, request.user, 'cod', 'completed')
-            order.is_paid = True
-            order.payment_method = 'cod'
-            order.save()
 
             messages.success(request, '订单创建成功！我们将安排发货，请准备现金支付。')
             return redirect('payment:payment_success', order_id=order.id)
@@ -115,7 +130,7 @@ def stripe_checkout(request, order_id):
     #         'amount': order.get_total_cost()
     #     }
     # )
-    payment = _get_payment(order, request.user,'stripe','pending')
+    payment, _ = _get_payment(order, request.user, 'stripe', 'pending')
 
     context = {
         'order': order,
@@ -126,6 +141,7 @@ def stripe_checkout(request, order_id):
 
 
 @login_required
+@idempotent
 def create_stripe_payment_intent(request, order_id):
     """创建Stripe支付意向 - 增强错误日志"""
     # print(f"=== 创建Stripe支付意向请求 ===")
@@ -241,6 +257,7 @@ def stripe_payment_success(request, order_id):
     order = _get_order(order_id, request.user)
 
     # 更新订单和支付状态
+    mark_order_paid(order, 'stripe')
     payment = Payment.objects.filter(
         order=order,
         payment_method='stripe',
@@ -250,11 +267,6 @@ def stripe_payment_success(request, order_id):
         payment.payment_status = 'completed'
         payment.save()
 
-
-    order.is_paid = True
-    order.payment_method = 'stripe'
-    order.save()
-
     messages.success(request, '支付成功！感谢您的购买。')
     return redirect('payment:payment_success', order_id=order.id)
 
@@ -293,6 +305,7 @@ def paypal_success(request, order_id):
     order = _get_order(order_id, request.user)
 
     # 更新订单和支付状态
+    mark_order_paid(order, 'paypal')
     payment = Payment.objects.filter(
         order=order,
         payment_method='paypal',
@@ -303,10 +316,6 @@ def paypal_success(request, order_id):
         payment.transaction_id = f"paypal_{order.id}_{payment.id}"
         payment.save()
 
-    order.is_paid = True
-    order.payment_method = 'paypal'
-    order.save()
-
     messages.success(request, 'PayPal支付成功！感谢您的购买。')
     return redirect('payment:payment_success', order_id=order.id)
 
@@ -315,28 +324,7 @@ def paypal_success(request, order_id):
 def payment_success(request, order_id):
     """支付成功页面"""
     order = _get_order(order_id, request.user)
-
-    order_items = order.items.all()
-    payment = Payment.objects.filter(
-        order=order,
-        payment_status='completed'
-    ).first()
-    for item in order_items:
-        product = get_object_or_404(Product, id=item.product_id)
-        if not product or product.stock < item.quantity:
-            if payment:
-                payment.payment_status = 'waiting'
-                payment.save()
-                order.is_waiting = True
-                order.save()
-
-        # 更新库存与销量
-        product.stock -= item.quantity
-        product.sales += item.quantity
-        product.save()
-
-    # 发送通知
-    # send_payment_success_notification(order, payment)
+    # 库存与销量在支付变为成功时由 payment.signals 把锁定转为实际扣减，支付成功邮件也由信号写入发件箱，本页面只做展示
 
     return render(request, 'payment/payment_success.html', {'order': order})
 
@@ -366,7 +354,7 @@ def stripe_webhook(request):
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
         )
     except ValueError as e:
@@ -374,22 +362,8 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return HttpResponse(status=400)
 
-    # 处理支付成功事件
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-
-        try:
-            payment = Payment.objects.get(transaction_id=payment_intent['id'])
-            payment.payment_status = 'completed'
-            payment.save()
-
-            order = payment.order
-            order.is_paid = True
-            order.payment_method = 'stripe'
-            order.save()
-        except Payment.DoesNotExist:
-            pass
-
+    # 只写入收件箱就返回，由 payment.tasks.process_webhook_events 异步处理；重复推送的事件不会重复写入
+    record_event(json.loads(payload))
     return HttpResponse(status=200)
 
 
@@ -411,31 +385,8 @@ def payment_status(request, order_id):
     })
 
 
-# 添加支付成功后的邮件或消息通知
-from django.core.mail import send_mail
-# payment/views.py - 添加支付成功通知
-def send_payment_success_notification(order, payment):
-    """发送支付成功通知"""
-    subject = f'支付成功 - 订单 #{order.id}'
-    message = f'''
-        尊敬的{order.first_name} {order.last_name}，
-
-        您的订单 #{order.id} 已支付成功。
-        支付金额：¥{payment.amount}
-        支付方式：{payment.get_payment_method_display()}
+@staff_member_required
+def payment_export(request):
+    """导出支付记录（仅限管理员，流式输出）"""
+    return export_response(request, 'payments', export_payments)
 
-        感谢您的购买！
-        '''
-    try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,  # 使用配置的默认发件人
-            [order.email],
-            fail_silently=False,  # 设置为 True 可以在出错时不抛出异常
-        )
-        messages.success(f"支付成功邮件已发送至 {order.email}")
-    except Exception as e:
-        messages.error(f"发送支付成功邮件失败: {str(e)}")
-        # 可以选择记录到数据库或其他处理方式
-        # 但不要让邮件发送失败影响主要业务流程
\ No newline at end of file
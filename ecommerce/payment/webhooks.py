@@ -0,0 +1,111 @@
+# payment/webhooks.py
+"""
+支付网关 webhook 收件箱
+
+- stripe_webhook 视图验证签名后调用 record_event 写入一行 WebhookEvent 就返回200，不在请求中查询、修改支付记录
+- 事件ID有唯一约束，Stripe 重试推送同一事件时 record_event 返回 False，不会重复处理
+- process_pending_events（由 payment.tasks.process_webhook_events 定时调用）按事件时间顺序分批处理，
+  处理失败按 RETRY_BASE_DELAY * 2^(attempts-1) 退避重试，达到 MAX_ATTEMPTS 次后标记为处理失败
+- 每个事件在独立的事务中处理，失败时回滚该事件的全部修改
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+from .utils import mark_order_paid
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 30
+
+
+def record_event(event, provider='stripe'):
+    """写入收到的事件，返回是否为新事件（重复推送的事件返回 False）"""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(
+                provider=provider,
+                event_id=event['id'],
+                event_type=event['type'],
+                payload=event,
+                event_created=datetime.fromtimestamp(event['created'], tz=dt_timezone.utc),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def handle_payment_intent_succeeded(event):
+    """PaymentIntent 支付成功：把订单标记为已支付，支付记录变为支付成功（由 payment.signals 履约）"""
+    intent = event['data']['object']
+    payment = (
+        Payment.objects.select_related('order').select_for_update()
+        .filter(transaction_id=intent['id']).first()
+    )
+    if payment is None:
+        # 不是本系统创建的 PaymentIntent
+        logger.warning('Stripe webhook: 找不到 PaymentIntent %s 对应的支付记录', intent['id'])
+        return
+    if payment.payment_status != 'pending':
+        return
+    mark_order_paid(payment.order, 'stripe')
+    payment.payment_status = 'completed'
+    payment.save()
+
+
+HANDLERS = {
+    'payment_intent.succeeded': handle_payment_intent_succeeded,
+}
+
+
+def retry_delay(attempts):
+    """第 attempts 次处理失败后的等待时间"""
+    return timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def process_event(event):
+    """处理一个事件（需在事务中调用），没有处理函数的事件类型直接视为已处理"""
+    handler = HANDLERS.get(event.event_type)
+    if handler is not None:
+        handler(event.payload)
+
+
+def process_pending_events(batch_size=BATCH_SIZE, now=None):
+    """处理全部到期的待处理事件，返回处理成功的数量"""
+    now = now or timezone.now()
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # 失败的事件下次处理时间晚于 now，本轮不会被再次取到
+            events = list(
+                WebhookEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=WebhookEvent.STATUS_PENDING, next_attempt_at__lte=now)
+                .order_by('event_created', 'id')[:batch_size]
+            )
+            if not events:
+                return processed
+            for event in events:
+                event.attempts += 1
+                try:
+                    with transaction.atomic():
+                        process_event(event)
+                except Exception as e:
+                    logger.exception('处理 webhook 事件 %s 失败', event.event_id)
+                    event.last_error = str(e)
+                    if event.attempts >= MAX_ATTEMPTS:
+                        event.status = WebhookEvent.STATUS_FAILED
+                    else:
+                        event.next_attempt_at = now + retry_delay(event.attempts)
+                else:
+                    event.status = WebhookEvent.STATUS_PROCESSED
+                    event.processed_at = timezone.now()
+                    event.last_error = ''
+                    processed += 1
+            WebhookEvent.objects.bulk_update(
+                events, ['status', 'attempts', 'next_attempt_at', 'last_error', 'processed_at']
+            )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Review
+from .models import Category, Product, Review, ProductRecommendation, StockReservation
 from django.core.exceptions import ValidationError
 
 @admin.register(Category)
@@ -10,7 +10,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'available', 'created', 'updated')
+    list_display = ('name', 'category', 'price', 'stock', 'reserved', 'available', 'created', 'updated')
     list_filter = ('available', 'created', 'updated', 'category')
     list_editable = ('price', 'available')
     prepopulated_fields = {'slug': ('name',)}
@@ -30,4 +30,16 @@ class ProductAdmin(admin.ModelAdmin):
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('product', 'user', 'rating', 'created')
     list_filter = ('rating', 'created')
-    search_fields = ('product__name', 'user__username', 'comment')
\ No newline at end of file
+    search_fields = ('product__name', 'user__username', 'comment')
+
+@admin.register(ProductRecommendation)
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'neighbor_ids', 'updated')
+    raw_id_fields = ('product',)
+    readonly_fields = ('neighbor_ids', 'scores', 'updated')
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'order', 'user', 'quantity', 'expires_at', 'created')
+    list_filter = ('expires_at',)
+    raw_id_fields = ('product', 'order', 'user')
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
-    verbose_name = '商品管理'
\ No newline at end of file
+    verbose_name = '商品管理'
+
+    def ready(self):
+        """应用准备好时导入信号"""
+        import shop.signals
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import BASKET_CHUNK_SIZE, TOP_N, build_recommendations
+
+
+class Command(BaseCommand):
+    help = '根据已支付订单计算商品共现推荐（买了该商品的顾客还买了）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_N, help='每个商品保留的推荐数量')
+        parser.add_argument('--chunk-size', type=int, default=BASKET_CHUNK_SIZE, help='每批读取的订单项行数')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始计算商品推荐...')
+        count = build_recommendations(top_n=options['top'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'推荐计算完成，共为 {count} 个商品生成推荐'))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.exports import export_orders, export_order_items
+from payment.exports import export_payments
+from shop.exports import EXPORT_FORMATS, parse_date_range, stream_rows, export_products
+
+DATASETS = {
+    'products': export_products,
+    'orders': export_orders,
+    'order_items': export_order_items,
+    'payments': export_payments,
+}
+
+
+class Command(BaseCommand):
+    help = '流式导出商品/订单/订单项/支付数据（CSV 或 JSONL，可选 gzip 压缩）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS), help='要导出的数据集')
+        parser.add_argument('--format', dest='fmt', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='使用 gzip 压缩输出')
+        parser.add_argument('--start', help='起始日期 YYYY-MM-DD（含）')
+        parser.add_argument('--end', help='结束日期 YYYY-MM-DD（含）')
+        parser.add_argument('-o', '--output', help='输出文件路径，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_date_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        header, rows = DATASETS[options['dataset']](start, end)
+        chunks = stream_rows(header, rows, options['fmt'], options['gzip'])
+
+        output = options['output']
+        if output:
+            with open(output, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'导出完成: {output}'))
+        else:
+            stream = sys.stdout.buffer
+            for chunk in chunks:
+                stream.write(chunk)
+            stream.flush()
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:37
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 500
+STAR_FIELDS = ['star1', 'star2', 'star3', 'star4', 'star5']
+
+
+def backfill_review_stats(apps, schema_editor):
+    """按商品分批回填评论数、星级分布与平均分"""
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+
+    rows = Review.objects.values('product_id', 'rating').annotate(n=Count('id')) \
+        .order_by('product_id').iterator(chunk_size=2000)
+
+    stats = {}
+    for row in rows:
+        histogram = stats.setdefault(row['product_id'], [0] * 5)
+        histogram[row['rating'] - 1] += row['n']
+        if len(stats) > BATCH_SIZE:
+            product_id, last = stats.popitem()
+            _flush(Product, stats)
+            stats = {product_id: last}
+    _flush(Product, stats)
+
+
+def _calculate_rating(histogram):
+    # 迁移中不能引用模型方法，这里与 Product.calculate_rating 保持一致
+    total = sum(histogram)
+    if not total:
+        return Decimal('0.0')
+    weighted = sum(star * n for star, n in enumerate(histogram, start=1))
+    return (Decimal(weighted) / total).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+def _flush(Product, stats):
+    products = Product.objects.in_bulk(list(stats))
+    for product_id, histogram in stats.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        count = sum(histogram)
+        for field, value in zip(STAR_FIELDS, histogram):
+            setattr(product, field, value)
+        product.review_count = count
+        product.rating = _calculate_rating(histogram)
+    Product.objects.bulk_update(products.values(), STAR_FIELDS + ['review_count', 'rating'])
+    stats.clear()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='评论数'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
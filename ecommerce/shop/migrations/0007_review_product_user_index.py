@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_review_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'user'], name='shop_review_product_f098d7_idx'),
+        ),
+    ]
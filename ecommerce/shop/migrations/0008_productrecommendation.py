@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_review_product_user_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation', serialize=False, to='shop.product')),
+                ('neighbor_ids', models.JSONField(default=list)),
+                ('scores', models.JSONField(default=list)),
+                ('updated', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_is_refunded_order_refund_amount_and_more'),
+        ('shop', '0008_productrecommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='锁定库存'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shop.product')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '库存锁定',
+                'verbose_name_plural': '库存锁定',
+            },
+        ),
+    ]
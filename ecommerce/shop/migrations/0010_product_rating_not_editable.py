@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='rating',
+            field=models.DecimalField(db_index=True, decimal_places=1, default=0.0, editable=False, max_digits=3),
+        ),
+    ]
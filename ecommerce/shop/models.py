@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, transaction
+from django.db.models import F
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator, FileExtensionValidator
 from django.conf import settings
@@ -34,14 +37,27 @@ class Product(models.Model):
     created = models.DateTimeField(auto_now_add=True, db_index=True)
     updated = models.DateTimeField(auto_now=True)
     stock = models.IntegerField(default=0, db_index=True)
+    # 已被未支付订单锁定的库存（见 shop.reservations），只通过条件 UPDATE 修改
+    reserved = models.PositiveIntegerField(default=0, editable=False, verbose_name="锁定库存")
     sales = models.IntegerField(default=0, db_index=True)
     name_initial = models.CharField(max_length=10, blank=True, verbose_name="名称首字母", db_index=True)  # 新增字段
+    # 平均评分：和评论统计一样由信号维护，后台表单中不可编辑
     rating = models.DecimalField(
         max_digits=3,  # 如 4.5 占3位（整数1位+小数1位）
         decimal_places=1,  # 保留1位小数
         default=0.0,
+        editable=False,
         db_index=True
     )
+    # 评论统计（反范式字段）：由 Review 的增删改通过信号原子维护，详情页无需再做聚合查询
+    review_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="评论数")
+    star1 = models.PositiveIntegerField(default=0, editable=False)
+    star2 = models.PositiveIntegerField(default=0, editable=False)
+    star3 = models.PositiveIntegerField(default=0, editable=False)
+    star4 = models.PositiveIntegerField(default=0, editable=False)
+    star5 = models.PositiveIntegerField(default=0, editable=False)
+    # 由 F 表达式 UPDATE 并发维护的字段，保存整个实例时不写入（见 save）
+    CONCURRENT_FIELDS = ('reserved', 'review_count', 'star1', 'star2', 'star3', 'star4', 'star5', 'rating')
     image = models.ImageField(
         upload_to='products/%Y/%m/%d',
         storage=MediaCloudinaryStorage(),
@@ -71,6 +87,12 @@ class Product(models.Model):
             else:
                 # 非中文字符（英文/数字等）：直接取首字符大写
                 self.name_initial = first_char.upper()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # 锁定库存、评论统计由 F 表达式 UPDATE 并发维护，保存整个实例时不能用内存中的旧值覆盖
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CONCURRENT_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     class Meta:
@@ -93,6 +115,94 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('shop:product_detail', args=[self.id, self.slug])
 
+    @property
+    def available_stock(self):
+        """可售库存 = 库存 - 已锁定库存"""
+        return max(self.stock - self.reserved, 0)
+
+    def get_rating_stats(self):
+        """评分统计（直接读取反范式字段，不查询评论表）"""
+        return {
+            'average': self.rating,
+            'count': self.review_count,
+            'distribution': {str(star): getattr(self, f'star{star}') for star in range(5, 0, -1)},
+        }
+
+    @classmethod
+    def update_review_stats(cls, product_id, added=None, removed=None):
+        """
+        原子更新商品的评论统计：added/removed 为新增/移除的评分（1-5）
+        先用 F 表达式调整计数（UPDATE 同时锁定该行），再在同一事务内读回计数计算平均分，
+        整个过程与评论总数无关，固定 3 条语句
+        """
+        changes = {}
+        for rating, delta in ((added, 1), (removed, -1)):
+            if rating is None:
+                continue
+            for field in (f'star{rating}', 'review_count'):
+                changes[field] = changes.get(field, 0) + delta
+        changes = {field: F(field) + delta for field, delta in changes.items() if delta}
+        if not changes:
+            return
+
+        with transaction.atomic():
+            products = cls.objects.filter(id=product_id)
+            products.update(**changes)
+            counts = products.values_list('star1', 'star2', 'star3', 'star4', 'star5').first()
+            if counts is None:
+                return
+            products.update(rating=cls.calculate_rating(counts))
+
+    @staticmethod
+    def calculate_rating(counts):
+        """根据 1-5 星的数量计算平均分（保留1位小数）"""
+        total = sum(counts)
+        if not total:
+            return Decimal('0.0')
+        weighted = sum(star * n for star, n in enumerate(counts, start=1))
+        return (Decimal(weighted) / total).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+class ProductRecommendation(models.Model):
+    """
+    “买了该商品的顾客还买了”推荐结果（由离线任务 build_recommendations 生成）
+    每个商品一行，邻居商品ID与得分按得分从高到低存成紧凑列表
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='recommendation'
+    )
+    neighbor_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f'Recommendations for product {self.product_id}'
+
+
+class StockReservation(models.Model):
+    """
+    库存锁：结算时为订单中的每个商品锁定库存，到期未支付自动释放，支付成功后转为实际扣减
+    锁定数量同时累加在 Product.reserved 上，可售库存 = stock - reserved
+    订单或用户被删除时保留锁定记录，由到期释放任务归还库存
+    """
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    order = models.ForeignKey(
+        'orders.Order', related_name='reservations', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='stock_reservations', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = '库存锁定'
+        verbose_name_plural = '库存锁定'
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} (至 {self.expires_at:%Y-%m-%d %H:%M})'
+
 
 class SearchQuery(models.Model):
     query = models.CharField(max_length=100)
@@ -119,7 +229,16 @@ class Review(models.Model):
         ordering = ('-created',)
         indexes = [
             models.Index(fields=['product', 'created']),  # 加速“商品的评论按时间排序”
+            models.Index(fields=['product', 'user']),  # 加速“用户是否已评论过该商品”
         ]
 
     def __str__(self):
-        return f'Review by {self.user.username} for {self.product.name}'
\ No newline at end of file
+        return f'Review by {self.user.username} for {self.product.name}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """记录从数据库加载时的评分，编辑评论时据此增量更新商品的评论统计"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = instance.__dict__.get('rating')
+        instance._loaded_product_id = instance.__dict__.get('product_id')
+        return instance
\ No newline at end of file
@@ -0,0 +1,51 @@
+# shop/page_cache.py
+"""
+商品详情页缓存（挖洞式缓存）
+
+页面主体只依赖商品数据与评论，按 (商品更新时间, 评论统计, 评论第一页版本) 组成的版本化键缓存渲染结果；
+购买表单、评论表单等与当前用户相关的片段，以及随下单锁定实时变化的可售库存，在主体中以 <!--hole:名称--> 占位，
+每次请求单独渲染这些小片段后替换进去。消息提示和导航栏购物车徽标由 base.html 按请求渲染。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+BODY_TEMPLATE = 'shop/product/_detail_body.html'
+HOLE_TEMPLATES = {
+    'stock': 'shop/product/_stock.html',
+    'buy_form': 'shop/product/_buy_form.html',
+    'review_form': 'shop/product/_review_form.html',
+}
+
+
+def _hole(name):
+    return f'<!--hole:{name}-->'
+
+
+def product_body_cache_key(product, review_version):
+    """版本化缓存键：商品信息或评论有任何变化都会生成新键，旧内容自然过期"""
+    # 评论统计可能通过 UPDATE 语句直接修改而不更新 updated，因此单独加入键中；库存在 stock 片段中按请求渲染，不进入键
+    updated = int(product.updated.timestamp() * 1000000)
+    return (
+        f'shop:product:{product.id}:body:{updated}:'
+        f'{product.review_count}:{product.rating}:{review_version}'
+    )
+
+
+def get_product_body(product, context, review_version):
+    """获取商品详情页主体HTML（带缓存），渲染时不传入 request，确保内容与用户无关"""
+    key = product_body_cache_key(product, review_version)
+    body = cache.get(key)
+    if body is None:
+        body = render_to_string(BODY_TEMPLATE, context)
+        cache.set(key, body, getattr(settings, 'PRODUCT_DETAIL_CACHE_TIMEOUT', 60 * 10))
+    return body
+
+
+def fill_holes(body, request, context):
+    """按当前请求渲染用户相关片段并填入主体的占位符"""
+    for name, template_name in HOLE_TEMPLATES.items():
+        fragment = render_to_string(template_name, context, request=request)
+        body = body.replace(_hole(name), fragment)
+    return mark_safe(body)
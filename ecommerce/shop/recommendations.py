@@ -0,0 +1,164 @@
+# shop/recommendations.py
+"""
+“买了该商品的顾客还买了”离线推荐
+
+离线任务按订单ID分批流式读取已支付订单的订单项，把同一订单内的商品两两计数，
+得到一个稀疏的 商品×商品 共现矩阵（字典形式的稀疏矩阵，只保存非零项），
+再用余弦相似度归一化，为每个商品保留得分最高的 N 个邻居写入 ProductRecommendation。
+
+内存只与“不同商品对”的数量有关，与订单行数无关；商品对超过上限时会剪掉低频对，
+从而在上千万订单行上也保持内存有界。
+详情页读取推荐时只需一次缓存读取 + 一次 in_bulk 查询。
+"""
+import heapq
+import math
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from orders.models import OrderItem
+from .models import Product, ProductRecommendation
+
+# 每批从数据库读取的订单项行数
+BASKET_CHUNK_SIZE = 5000
+# 单个订单参与计数的最大商品数（超大订单会产生 n² 个商品对且参考价值低）
+MAX_BASKET_SIZE = 50
+# 共现矩阵中最多保留的商品对数量，超过后剪掉低频对
+MAX_PAIRS = 2000000
+# 每个商品保留的推荐数量
+TOP_N = 10
+# 写入推荐结果的批大小
+WRITE_BATCH_SIZE = 1000
+
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(product_id):
+    return f'shop:product:{product_id}:recommendations'
+
+
+def iter_baskets(chunk_size=BASKET_CHUNK_SIZE):
+    """
+    按订单ID游标分批读取已支付订单的订单项，逐个产出订单内的商品ID集合
+    每批末尾可能只读到半个订单，该订单留到下一批完整读取
+    """
+    items = OrderItem.objects.filter(order__is_paid=True).order_by('order_id')
+    last_order_id = 0
+    while True:
+        rows = list(items.filter(order_id__gt=last_order_id).values_list('order_id', 'product_id')[:chunk_size])
+        if not rows:
+            return
+        if len(rows) == chunk_size:
+            boundary = rows[-1][0]
+            complete = [row for row in rows if row[0] != boundary]
+            # 单个订单的商品行数超过批大小时，单独完整读取该订单
+            rows = complete or list(items.filter(order_id=boundary).values_list('order_id', 'product_id'))
+
+        for _, group in groupby(rows, key=itemgetter(0)):
+            yield sorted({product_id for _, product_id in group})
+        last_order_id = rows[-1][0]
+
+
+def build_cooccurrence(baskets, max_basket_size=MAX_BASKET_SIZE, max_pairs=MAX_PAIRS):
+    """
+    构建稀疏共现矩阵，返回 (pair_counts, item_counts)
+    pair_counts[(a, b)] 为同时包含 a、b 的订单数（a < b），item_counts[a] 为包含 a 的订单数
+    """
+    pair_counts = defaultdict(int)
+    item_counts = defaultdict(int)
+    min_count = 1
+    for basket in baskets:
+        basket = basket[:max_basket_size]
+        for i, a in enumerate(basket):
+            item_counts[a] += 1
+            for b in basket[i + 1:]:
+                pair_counts[(a, b)] += 1
+
+        if len(pair_counts) > max_pairs:
+            # 剪掉低频商品对，逐步提高阈值，保证内存有界
+            pair_counts = defaultdict(int, {
+                pair: count for pair, count in pair_counts.items() if count > min_count
+            })
+            min_count += 1
+    return pair_counts, item_counts
+
+
+def top_neighbors(pair_counts, item_counts, top_n=TOP_N):
+    """用余弦相似度 c(a,b) / sqrt(n(a) * n(b)) 归一化，返回每个商品得分最高的 top_n 个邻居"""
+    neighbors = defaultdict(list)
+    for (a, b), count in pair_counts.items():
+        score = count / math.sqrt(item_counts[a] * item_counts[b])
+        for source, target in ((a, b), (b, a)):
+            heap = neighbors[source]
+            if len(heap) < top_n:
+                heapq.heappush(heap, (score, target))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, target))
+
+    return {
+        product_id: sorted(heap, reverse=True)
+        for product_id, heap in neighbors.items()
+    }
+
+
+def save_recommendations(neighbors, batch_size=WRITE_BATCH_SIZE):
+    """批量写入推荐结果并刷新缓存，删除本次没有结果的旧推荐"""
+    started = timezone.now()
+    existing_ids = set(Product.objects.values_list('id', flat=True))
+    batch = []
+    for product_id, ranked in neighbors.items():
+        if product_id not in existing_ids:
+            continue
+        batch.append(ProductRecommendation(
+            product_id=product_id,
+            neighbor_ids=[target for _, target in ranked],
+            scores=[round(score, 4) for score, _ in ranked],
+        ))
+        if len(batch) >= batch_size:
+            _write_batch(batch)
+            batch = []
+    if batch:
+        _write_batch(batch)
+
+    stale = ProductRecommendation.objects.filter(updated__lt=started)
+    cache.delete_many([_cache_key(product_id) for product_id in stale.values_list('product_id', flat=True)])
+    stale.delete()
+
+
+def _write_batch(batch):
+    ProductRecommendation.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['neighbor_ids', 'scores', 'updated'],
+    )
+    cache.set_many(
+        {_cache_key(rec.product_id): rec.neighbor_ids for rec in batch},
+        RECOMMENDATION_CACHE_TIMEOUT,
+    )
+
+
+def build_recommendations(top_n=TOP_N, chunk_size=BASKET_CHUNK_SIZE):
+    """完整执行一次推荐计算，返回生成推荐的商品数量"""
+    pair_counts, item_counts = build_cooccurrence(iter_baskets(chunk_size))
+    neighbors = top_neighbors(pair_counts, item_counts, top_n)
+    save_recommendations(neighbors)
+    return len(neighbors)
+
+
+def get_recommendations(product_id, limit=TOP_N):
+    """获取商品的推荐列表：推荐ID走缓存，商品本身用一次 in_bulk 查询"""
+    key = _cache_key(product_id)
+    neighbor_ids = cache.get(key)
+    if neighbor_ids is None:
+        neighbor_ids = ProductRecommendation.objects.filter(product_id=product_id) \
+            .values_list('neighbor_ids', flat=True).first() or []
+        cache.set(key, neighbor_ids, RECOMMENDATION_CACHE_TIMEOUT)
+    if not neighbor_ids:
+        return []
+
+    products = Product.objects.filter(available=True).in_bulk(neighbor_ids[:limit])
+    return [products[product_id] for product_id in neighbor_ids[:limit] if product_id in products]
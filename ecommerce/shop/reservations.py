@@ -0,0 +1,209 @@
+# shop/reservations.py
+"""
+库存锁（避免超卖）
+
+- 结算时 reserve_items 用一条带 CASE 的条件 UPDATE 锁定订单中的全部商品：
+  UPDATE product SET reserved = reserved + CASE id WHEN ... END WHERE (id = ? AND stock - reserved >= qty) OR ...
+  数据库行锁保证同一热门商品在高并发下也不会锁出超过库存的数量，任一商品不足则整单回滚
+- 锁定记录带过期时间，release_expired_reservations 定时任务（CELERY_BEAT_SCHEDULE 每分钟）把过期未支付的锁定归还；
+  reserve_items 锁定前也会先归还所涉及商品上已过期的锁定，不依赖定时任务
+- 支付成功后 commit_order_reservations 把锁定转为实际扣减（一条带 CASE 的 UPDATE，stock 与 reserved 同时减少，sales 增加），
+  由 payment.signals 在订单首次履约时调用一次
+- 页面展示的可售库存 stock - reserved 通过 get_available_stock 从缓存读取，库存变动时主动失效
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+DEFAULT_RESERVATION_TTL = 60 * 15
+AVAILABLE_STOCK_CACHE_TIMEOUT = 30
+EXPIRE_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """可售库存不足，product 为库存不足的商品ID"""
+
+    def __init__(self, product_id, message='库存不足'):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+def _available_cache_key(product_id):
+    return f'shop:product:{product_id}:available'
+
+
+def invalidate_available_stock(product_ids):
+    keys = [_available_cache_key(product_id) for product_id in product_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_available_stock(product_ids):
+    """批量读取可售库存 {product_id: stock - reserved}，缓存缺失的用一次查询补齐"""
+    product_ids = list(product_ids)
+    cached = cache.get_many([_available_cache_key(product_id) for product_id in product_ids])
+    result = {}
+    missing = []
+    for product_id in product_ids:
+        value = cached.get(_available_cache_key(product_id))
+        if value is None:
+            missing.append(product_id)
+        else:
+            result[product_id] = value
+    if missing:
+        fresh = {
+            product_id: max(stock - reserved, 0)
+            for product_id, stock, reserved in Product.objects.filter(id__in=missing)
+            .values_list('id', 'stock', 'reserved')
+        }
+        cache.set_many(
+            {_available_cache_key(product_id): value for product_id, value in fresh.items()},
+            AVAILABLE_STOCK_CACHE_TIMEOUT,
+        )
+        result.update(fresh)
+    return result
+
+
+def _by_product(values):
+    """{product_id: value} 转为 CASE id WHEN ... THEN value ELSE 0 END"""
+    return Case(
+        *[When(id=product_id, then=Value(value)) for product_id, value in values.items()],
+        default=Value(0),
+    )
+
+
+def reserve_items(items, order=None, user=None, ttl=None):
+    """
+    为 (product_id, quantity) 列表锁定库存，全部成功或全部回滚；库存不足时抛出 InsufficientStock
+    所有商品用一条带 CASE 的条件 UPDATE 锁定：每一行都满足 stock - reserved >= qty 才会被更新，
+    更新行数少于商品数即说明有商品不足，整单回滚
+    并发下单时调用方应先按商品ID顺序 select_for_update 锁定商品行（见 orders.services），避免交叉加锁死锁
+    """
+    ttl = ttl or getattr(settings, 'STOCK_RESERVATION_TTL', DEFAULT_RESERVATION_TTL)
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    quantities = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        return []
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(id=product_id, stock__gte=F('reserved') + quantity)
+
+    with transaction.atomic():
+        # 先归还涉及商品上已过期的锁定，放弃支付的订单不依赖定时任务也不会一直占用库存
+        expired = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(product_id__in=list(quantities), expires_at__lte=now)
+        )
+        if expired:
+            _release(expired)
+        try:
+            with transaction.atomic():
+                updated = Product.objects.filter(condition).update(reserved=F('reserved') + _by_product(quantities))
+                if updated != len(quantities):
+                    raise InsufficientStock(None)
+        except InsufficientStock:
+            # 出错路径：UPDATE 已回滚，再查一次找出不足的商品
+            rows = Product.objects.filter(id__in=list(quantities)).values_list('id', 'stock', 'reserved')
+            available = {product_id: stock - reserved for product_id, stock, reserved in rows}
+            raise InsufficientStock(next(
+                (product_id for product_id, quantity in sorted(quantities.items())
+                 if available.get(product_id, 0) < quantity),
+                min(quantities),
+            ))
+        reservations = StockReservation.objects.bulk_create([
+            StockReservation(product_id=product_id, order=order, user=user, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in quantities.items()
+        ])
+    invalidate_available_stock(quantities)
+    return reservations
+
+
+def _release(reservations):
+    """归还一批锁定记录（需在事务中调用，reservations 已用 select_for_update 锁定）"""
+    quantities = {}
+    for reservation in reservations:
+        quantities[reservation.product_id] = quantities.get(reservation.product_id, 0) + reservation.quantity
+    if quantities:
+        Product.objects.filter(id__in=list(quantities)).update(reserved=F('reserved') - _by_product(quantities))
+    StockReservation.objects.filter(id__in=[reservation.id for reservation in reservations]).delete()
+    invalidate_available_stock(quantities)
+    return quantities
+
+
+def release_order_reservations(order):
+    """取消订单时归还该订单的全部锁定"""
+    with transaction.atomic():
+        return _release(list(StockReservation.objects.select_for_update().filter(order=order)))
+
+
+def release_expired_reservations(now=None, batch_size=EXPIRE_BATCH_SIZE):
+    """分批归还过期的锁定，返回归还的记录数"""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now).order_by('id')[:batch_size]
+            )
+            if not batch:
+                return released
+            _release(batch)
+        released += len(batch)
+
+
+def commit_order_reservations(order):
+    """
+    支付成功后把订单的锁定转为实际扣减，返回锁定不足（已过期）且库存也不够的商品ID列表
+    锁定已过期的商品需要可售库存足够才扣减，仍然不足时由调用方标记为待调货
+    按商品ID顺序锁定涉及的商品行后在内存中判断，再用一条带 CASE 的 UPDATE 同时修改全部商品的
+    stock、reserved、sales；每个订单只应调用一次（见 Order.objects.claim_fulfilment）
+    """
+    items = {}
+    for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+        items[product_id] = items.get(product_id, 0) + quantity
+
+    shortages = []
+    with transaction.atomic():
+        reserved = {}
+        reservations = list(StockReservation.objects.select_for_update().filter(order=order))
+        for reservation in reservations:
+            reserved[reservation.product_id] = reserved.get(reservation.product_id, 0) + reservation.quantity
+        StockReservation.objects.filter(id__in=[reservation.id for reservation in reservations]).delete()
+
+        rows = (
+            Product.objects.select_for_update().filter(id__in=set(items) | set(reserved))
+            .order_by('id').values_list('id', 'stock', 'reserved')
+        )
+        deducted, released = {}, {}
+        for product_id, stock, reserved_total in rows:
+            # 订单的锁定（包括多于订单数量的部分）无论是否扣减成功都归还
+            held = reserved.get(product_id, 0)
+            if held:
+                released[product_id] = held
+            quantity = items.get(product_id, 0)
+            if not quantity:
+                continue
+            # 未锁定的部分需要可售库存足够：stock - (reserved - held) >= quantity - held
+            if held < quantity and stock - reserved_total + held < quantity:
+                shortages.append(product_id)
+            else:
+                deducted[product_id] = quantity
+
+        if deducted or released:
+            Product.objects.filter(id__in=set(deducted) | set(released)).update(
+                stock=F('stock') - _by_product(deducted),
+                reserved=F('reserved') - _by_product(released),
+                sales=F('sales') + _by_product(deducted),
+            )
+    invalidate_available_stock(set(items) | set(reserved))
+    return shortages
@@ -0,0 +1,83 @@
+# shop/reviews.py
+"""
+商品评论列表：基于 (product, created) 索引的游标分页（新的在前）
+
+不使用 OFFSET 分页，翻到任意位置的代价都只是一次索引范围扫描；
+第一页按商品缓存，评论增删改时由信号失效。
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .models import Review
+
+REVIEWS_PAGE_SIZE = 10
+REVIEWS_CACHE_TIMEOUT = 60 * 60  # 1小时，评论写入时主动失效
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+REVIEW_FIELDS = ('id', 'rating', 'comment', 'created')
+
+
+def _first_page_cache_key(product_id):
+    return f'shop:product:{product_id}:reviews:first'
+
+
+def encode_cursor(review):
+    """将最后一条评论的 (created, id) 编码为 URL 安全的游标"""
+    micros = (review['created'] - _EPOCH) // _MICROSECOND
+    return f"{micros}-{review['id']}"
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误或时间超出范围时抛出 ValueError"""
+    micros, review_id = cursor.split('-', 1)
+    try:
+        created = _EPOCH + timedelta(microseconds=int(micros))
+    except OverflowError:
+        raise ValueError(f'游标超出范围: {cursor}')
+    return created, int(review_id)
+
+
+def get_review_page(product_id, cursor=None, limit=REVIEWS_PAGE_SIZE):
+    """
+    获取一页评论（字典列表），返回 (reviews, next_cursor)
+    多取一条用来判断是否还有下一页，无需 COUNT 查询
+    """
+    queryset = Review.objects.filter(product_id=product_id)
+    if cursor:
+        created, review_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=review_id))
+
+    rows = list(
+        queryset.order_by('-created', '-id')
+        .values(*REVIEW_FIELDS, username=F('user__username'))[:limit + 1]
+    )
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def get_first_review_page(product_id):
+    """
+    获取第一页评论（带缓存），返回 (reviews, next_cursor, version)
+    version 为缓存生成时间，评论写入导致缓存失效后会变化，可用于依赖评论的其他缓存键
+    """
+    key = _first_page_cache_key(product_id)
+    page = cache.get(key)
+    if page is None:
+        page = (*get_review_page(product_id), time.time_ns())
+        cache.set(key, page, REVIEWS_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_review_cache(product_id):
+    """评论写入后失效该商品的评论缓存"""
+    cache.delete(_first_page_cache_key(product_id))
+
+
+def user_has_reviewed(product_id, user_id):
+    """判断用户是否已评论过该商品（走 (product, user) 复合索引，只查是否存在）"""
+    return Review.objects.filter(product_id=product_id, user_id=user_id).exists()
@@ -0,0 +1,39 @@
+# shop/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product, Review
+from .reviews import invalidate_review_cache
+
+
+@receiver(post_save, sender=Review)
+def update_stats_on_review_save(sender, instance, created, **kwargs):
+    """评论新增或修改评分时，增量更新商品的评论统计"""
+    invalidate_review_cache(instance.product_id)
+    if created:
+        Product.update_review_stats(instance.product_id, added=instance.rating)
+        # 同一实例之后再次修改保存时，据此计算评分变化
+        instance._loaded_rating = instance.rating
+        instance._loaded_product_id = instance.product_id
+        return
+
+    old_rating = getattr(instance, '_loaded_rating', None)
+    old_product_id = getattr(instance, '_loaded_product_id', None)
+    if old_rating is None:
+        return
+    if old_product_id == instance.product_id:
+        if old_rating != instance.rating:
+            Product.update_review_stats(instance.product_id, added=instance.rating, removed=old_rating)
+    else:
+        invalidate_review_cache(old_product_id)
+        Product.update_review_stats(old_product_id, removed=old_rating)
+        Product.update_review_stats(instance.product_id, added=instance.rating)
+    instance._loaded_rating = instance.rating
+    instance._loaded_product_id = instance.product_id
+
+
+@receiver(post_delete, sender=Review)
+def update_stats_on_review_delete(sender, instance, **kwargs):
+    """评论删除时，从商品的评论统计中移除该评分"""
+    invalidate_review_cache(instance.product_id)
+    Product.update_review_stats(instance.product_id, removed=instance.rating)
@@ -11,4 +11,18 @@ def update_search_count(query_text):
         from django.db.models import F
         query.count = F('count') + 1  # 原子操作，防止竞态条件
         query.save()
-    return f"Updated search count for: {query_text}"
\ No newline at end of file
+    return f"Updated search count for: {query_text}"
+
+@shared_task
+def build_product_recommendations():
+    """离线计算“买了该商品的顾客还买了”推荐（建议每天定时执行一次）"""
+    from .recommendations import build_recommendations
+    count = build_recommendations()
+    return f"Built recommendations for {count} products"
+
+@shared_task
+def release_expired_reservations():
+    """归还超时未支付订单锁定的库存（建议每分钟定时执行一次）"""
+    from .reservations import release_expired_reservations as release
+    count = release()
+    return f"Released {count} expired stock reservations"
@@ -0,0 +1,90 @@
+import gzip
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product
+from shop.exports import parse_date_range
+from orders.models import Order, OrderItem
+
+User = get_user_model()
+
+
+def _read(response):
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+class TestExports:
+    def setup_method(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123'
+        )
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.product = Product.objects.create(
+            category=self.category, name='iPhone 13', slug='iphone-13', price=Decimal('5999.00'), stock=10
+        )
+        self.order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('5000.00'), quantity=2)
+
+    def test_export_requires_staff(self):
+        """测试非管理员无法导出"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('shop:product_export'))
+        assert response.status_code == 302
+
+    def test_product_export_csv(self):
+        """测试商品CSV流式导出"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('shop:product_export'))
+        assert response.status_code == 200
+        assert response.streaming
+        lines = _read(response).decode('utf-8-sig').splitlines()
+        assert lines[0].startswith('id,name,slug')
+        assert 'iPhone 13' in lines[1]
+
+    def test_order_export_uses_price_snapshot(self):
+        """测试订单导出的总价按订单项价格快照计算"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('orders:order_export'), {'format': 'jsonl'})
+        row = json.loads(_read(response).decode('utf-8').splitlines()[0])
+        assert Decimal(row['total_cost']) == Decimal('10000.00')
+        assert row['item_count'] == 2
+
+    def test_gzip_export(self):
+        """测试gzip压缩导出"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('payment:payment_export'), {'gzip': '1'})
+        assert response['Content-Type'] == 'application/gzip'
+        assert 'payments.csv.gz' in response['Content-Disposition']
+        content = gzip.decompress(_read(response)).decode('utf-8-sig')
+        assert content.startswith('id,order_id')
+
+    def test_date_range_filter(self):
+        """测试日期区间筛选"""
+        self.client.force_login(self.staff)
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('orders:order_item_export'), {'start': tomorrow})
+        lines = _read(response).decode('utf-8-sig').splitlines()
+        assert len(lines) == 1  # 只有表头
+
+    def test_invalid_date(self):
+        """测试非法日期返回400"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('shop:product_export'), {'start': '2025-13-40'})
+        assert response.status_code == 400
+        with pytest.raises(ValueError):
+            parse_date_range('not-a-date')
@@ -60,4 +60,88 @@ class TestProductModel:
         )
         url = product.get_absolute_url()
         assert str(product.id) in url
-        assert product.slug in url
\ No newline at end of file
+        assert product.slug in url
+
+@pytest.mark.django_db
+class TestProductReviewStats:
+    def setup_method(self):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(username=f'reviewer{i}', email=f'r{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        self.product = Product.objects.create(
+            category=category, name='iPhone 13', slug='iphone-13', price=5999.00, stock=100
+        )
+
+    def _review(self, user, rating):
+        from ..models import Review
+        return Review.objects.create(product=self.product, user=user, rating=rating, comment='测试')
+
+    def test_stats_on_create(self):
+        """测试新增评论时增量更新统计"""
+        self._review(self.users[0], 5)
+        self._review(self.users[1], 4)
+        self.product.refresh_from_db()
+        assert self.product.review_count == 2
+        assert self.product.star5 == 1
+        assert self.product.star4 == 1
+        assert float(self.product.rating) == 4.5
+
+    def test_stats_on_edit(self):
+        """测试修改评分时统计随之调整"""
+        from ..models import Review
+        self._review(self.users[0], 5)
+        review = Review.objects.get(user=self.users[0])
+        review.rating = 1
+        review.save()
+        self.product.refresh_from_db()
+        assert self.product.review_count == 1
+        assert self.product.star5 == 0
+        assert self.product.star1 == 1
+        assert float(self.product.rating) == 1.0
+
+    def test_stats_on_edit_after_create(self):
+        """测试新建后直接修改同一评论实例，统计随之调整"""
+        review = self._review(self.users[0], 5)
+        review.rating = 1
+        review.save()
+        self.product.refresh_from_db()
+        assert (self.product.review_count, self.product.star5, self.product.star1) == (1, 0, 1)
+        assert float(self.product.rating) == 1.0
+
+    def test_product_save_keeps_review_stats(self):
+        """测试保存整个商品实例不会覆盖并发维护的评论统计"""
+        product = Product.objects.get(id=self.product.id)
+        self._review(self.users[0], 4)
+        product.name = 'iPhone 13 Pro'
+        product.save()
+        self.product.refresh_from_db()
+        assert self.product.name == 'iPhone 13 Pro'
+        assert (self.product.review_count, self.product.star4) == (1, 1)
+        assert float(self.product.rating) == 4.0
+
+    def test_admin_form_excludes_concurrent_fields(self):
+        """测试后台商品表单不包含保存时会被忽略的统计字段"""
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        request = RequestFactory().get('/')
+        request.user = self.users[0]
+        form_class = site._registry[Product].get_form(request, self.product)
+        assert not set(Product.CONCURRENT_FIELDS) & set(form_class.base_fields)
+
+    def test_stats_on_delete(self):
+        """测试删除评论后统计回退"""
+        review = self._review(self.users[0], 3)
+        self._review(self.users[1], 4)
+        self._review(self.users[2], 4)
+        review.delete()
+        self.product.refresh_from_db()
+        assert self.product.review_count == 2
+        assert self.product.star3 == 0
+        assert float(self.product.rating) == 4.0
+        stats = self.product.get_rating_stats()
+        assert stats['count'] == 2
+        assert stats['distribution']['4'] == 2
@@ -0,0 +1,65 @@
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product, ProductRecommendation
+from shop.recommendations import build_cooccurrence, build_recommendations, iter_baskets, top_neighbors
+from orders.models import Order, OrderItem
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestRecommendations:
+    def setup_method(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone, self.case, self.charger, self.tv = [
+            Product.objects.create(category=category, name=name, slug=slug, price=100, stock=10)
+            for name, slug in (('手机', 'phone'), ('手机壳', 'case'), ('充电器', 'charger'), ('电视', 'tv'))
+        ]
+        self._order([self.phone, self.case])
+        self._order([self.phone, self.case, self.charger])
+        self._order([self.phone, self.charger])
+        self._order([self.tv])
+        # 未支付订单不参与计算
+        self._order([self.phone, self.tv], is_paid=False)
+
+    def _order(self, products, is_paid=True):
+        order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京', is_paid=is_paid
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=1)
+
+    def test_iter_baskets_handles_chunk_boundaries(self):
+        """测试分批读取时订单不会被拆开"""
+        baskets = list(iter_baskets(chunk_size=2))
+        assert sorted(map(tuple, baskets)) == sorted([
+            (self.phone.id, self.case.id),
+            (self.phone.id, self.case.id, self.charger.id),
+            (self.phone.id, self.charger.id),
+            (self.tv.id,),
+        ])
+
+    def test_cosine_scores(self):
+        """测试共现计数与余弦归一化"""
+        pair_counts, item_counts = build_cooccurrence(iter_baskets())
+        assert pair_counts[(self.phone.id, self.case.id)] == 2
+        assert item_counts[self.phone.id] == 3
+        neighbors = top_neighbors(pair_counts, item_counts, top_n=1)
+        assert neighbors[self.case.id][0][1] == self.phone.id
+
+    def test_build_and_lookup(self):
+        """测试推荐结果落库并在详情页展示"""
+        assert build_recommendations() == 3
+        rec = ProductRecommendation.objects.get(product=self.phone)
+        assert set(rec.neighbor_ids) == {self.case.id, self.charger.id}
+        assert self.tv.id not in rec.neighbor_ids
+
+        response = Client().get(reverse('shop:product_detail', args=[self.phone.id, self.phone.slug]))
+        assert {p.id for p in response.context['recommendations']} == {self.case.id, self.charger.id}
@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from shop.models import Category, Product, StockReservation
+from shop.reservations import (
+    InsufficientStock, get_available_stock, reserve_items,
+    release_expired_reservations, commit_order_reservations,
+)
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from payment.models import Payment
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestStockReservations:
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone = Product.objects.create(category=self.category, name='手机', slug='phone', price=100, stock=5)
+        self.case = Product.objects.create(category=self.category, name='手机壳', slug='case', price=10, stock=50)
+
+    def _order(self, items):
+        order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        for product, quantity in items:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        return order
+
+    def _refresh(self, product):
+        product.refresh_from_db()
+        return product
+
+    def test_reserve_prevents_overselling(self):
+        """测试锁定后可售库存减少，超过可售库存的锁定整单失败"""
+        reserve_items([(self.phone.id, 3)])
+        assert self._refresh(self.phone).available_stock == 2
+
+        with pytest.raises(InsufficientStock) as excinfo:
+            reserve_items([(self.case.id, 1), (self.phone.id, 3)])
+        assert excinfo.value.product_id == self.phone.id
+        # 整单回滚，手机壳没有被锁定
+        assert self._refresh(self.case).reserved == 0
+        assert StockReservation.objects.count() == 1
+
+    def test_available_stock_cache_invalidated(self):
+        """测试锁定后缓存的可售库存立即失效"""
+        assert get_available_stock([self.phone.id]) == {self.phone.id: 5}
+        reserve_items([(self.phone.id, 2)])
+        assert get_available_stock([self.phone.id]) == {self.phone.id: 3}
+
+    def test_save_does_not_overwrite_reserved(self):
+        """测试保存商品实例时不会用旧值覆盖并发修改的锁定库存"""
+        product = Product.objects.get(id=self.phone.id)
+        reserve_items([(self.phone.id, 2)])
+        product.price = 120
+        product.save()
+        assert self._refresh(self.phone).reserved == 2
+
+    def test_release_expired(self):
+        """测试过期未支付的锁定被归还"""
+        reserve_items([(self.phone.id, 2)], ttl=60)
+        reserve_items([(self.phone.id, 1)], ttl=3600)
+        released = release_expired_reservations(now=timezone.now() + timedelta(minutes=5))
+        assert released == 1
+        assert self._refresh(self.phone).reserved == 1
+        assert StockReservation.objects.count() == 1
+
+    def test_reserve_reclaims_expired_holds(self):
+        """测试锁定时先归还该商品上已过期的锁定，不依赖定时任务"""
+        reserve_items([(self.phone.id, 4)], ttl=60)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        reserve_items([(self.phone.id, 5)])
+        phone = self._refresh(self.phone)
+        assert (phone.reserved, phone.available_stock) == (5, 0)
+        assert StockReservation.objects.get().quantity == 5
+
+    def test_release_task_scheduled(self):
+        """测试定时任务配置中包含归还过期锁定的任务"""
+        from django.conf import settings
+        from shop.tasks import release_expired_reservations as task
+        tasks = {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        assert task.name in tasks
+
+    def test_commit_converts_reservation(self):
+        """测试支付成功后锁定转为实际扣减"""
+        order = self._order([(self.phone, 2)])
+        reserve_items([(self.phone.id, 2)], order=order)
+        assert commit_order_reservations(order) == []
+        phone = self._refresh(self.phone)
+        assert (phone.stock, phone.reserved, phone.sales) == (3, 0, 2)
+        assert not StockReservation.objects.exists()
+
+    def test_commit_updates_products_in_one_statement(self):
+        """测试锁定转扣减的 UPDATE 语句数量与商品数无关"""
+        def count_updates(products):
+            order = self._order([(product, 1) for product in products])
+            reserve_items([(product.id, 1) for product in products], order=order)
+            with CaptureQueriesContext(connection) as queries:
+                assert commit_order_reservations(order) == []
+            return sum(query['sql'].startswith('UPDATE') for query in queries)
+
+        extra = [
+            Product.objects.create(category=self.category, name=f'配件{i}', slug=f'part-{i}', price=5, stock=5)
+            for i in range(3)
+        ]
+        assert count_updates([self.phone]) == count_updates([self.case, *extra]) == 1
+        assert [self._refresh(product).stock for product in extra] == [4, 4, 4]
+
+    def test_fulfilment_runs_once_per_order(self):
+        """测试同一订单的多条支付记录（webhook、回调重复触发）变为支付成功时只扣减一次库存"""
+        order = self._order([(self.phone, 2)])
+        reserve_items([(self.phone.id, 2)], order=order)
+        for method in ('stripe', 'cod'):
+            Payment.objects.create(
+                order=order, user=self.user, payment_method=method,
+                payment_status='completed', amount=order.get_total_cost()
+            )
+
+        phone = self._refresh(self.phone)
+        assert (phone.stock, phone.reserved, phone.sales) == (3, 0, 2)
+        order.refresh_from_db()
+        assert order.fulfilled_at is not None
+
+        # 保存整个订单实例不会清除履约标记
+        stale = Order.objects.get(id=order.id)
+        stale.fulfilled_at = None
+        stale.save()
+        order.refresh_from_db()
+        assert order.fulfilled_at is not None
+
+    def test_expired_commit_marks_waiting(self):
+        """测试锁定过期且库存已被买走时，支付成功后订单标记为待调货且库存不为负"""
+        order = self._order([(self.phone, 2)])
+        reserve_items([(self.phone.id, 2)], order=order, ttl=1)
+        release_expired_reservations(now=timezone.now() + timedelta(minutes=1))
+        reserve_items([(self.phone.id, 4)])
+
+        payment = Payment.objects.create(
+            order=order, user=self.user, payment_method='stripe', amount=order.get_total_cost()
+        )
+        payment = Payment.objects.get(id=payment.id)
+        payment.payment_status = 'completed'
+        payment.save()
+
+        order.refresh_from_db()
+        payment.refresh_from_db()
+        assert order.is_waiting
+        assert payment.payment_status == 'waiting'
+        phone = self._refresh(self.phone)
+        assert (phone.stock, phone.reserved) == (5, 4)
+
+    def test_checkout_reserves_stock(self):
+        """测试下单时锁定库存，支付成功页面不再重复扣减"""
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=2)
+        self.client.login(username='buyer', password='testpass123')
+        self.client.post(reverse('orders:order_create'), {
+            'first_name': '张', 'last_name': '三', 'email': 'zhangsan@example.com',
+            'address': '北京市朝阳区', 'postal_code': '100000', 'city': '北京',
+        })
+        order = Order.objects.get(user=self.user)
+        assert self._refresh(self.phone).reserved == 2
+        assert StockReservation.objects.get().order == order
+
+        Payment.objects.create(
+            order=order, user=self.user, payment_method='cod',
+            payment_status='completed', amount=order.get_total_cost()
+        )
+        # 刷新支付成功页面不会再次扣减
+        self.client.get(reverse('payment:payment_success', args=[order.id]))
+        self.client.get(reverse('payment:payment_success', args=[order.id]))
+        phone = self._refresh(self.phone)
+        assert (phone.stock, phone.reserved, phone.sales) == (3, 0, 2)
+
+    def test_checkout_fails_when_reserved_by_others(self):
+        """测试可售库存已被其他订单锁定时不能下单"""
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=2)
+        Product.objects.filter(id=self.phone.id).update(reserved=4)
+        self.client.login(username='buyer', password='testpass123')
+        response = self.client.post(reverse('orders:order_create'), {
+            'first_name': '张', 'last_name': '三', 'email': 'zhangsan@example.com',
+            'address': '北京市朝阳区', 'postal_code': '100000', 'city': '北京',
+        })
+        assert response.url == reverse('cart:cart_detail')
+        assert not Order.objects.exists()
@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from shop import trending
+from shop.models import Category, Product
+from orders.models import Order, OrderItem
+from payment.models import Payment
+
+User = get_user_model()
+
+
+class FakeRedis:
+    """测试用的内存有序集合，只实现热销榜用到的命令"""
+
+    def __init__(self):
+        self.data = defaultdict(dict)
+        self.union_calls = 0
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def zincrby(self, key, amount, member):
+        zset = self.data[key]
+        zset[str(member)] = zset.get(str(member), 0) + amount
+
+    def expire(self, key, ttl):
+        return True
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def zunionstore(self, dest, keys):
+        self.union_calls += 1
+        result = defaultdict(int)
+        for key in keys:
+            for member, score in self.data.get(key, {}).items():
+                result[member] += score
+        if result:
+            self.data[dest] = dict(result)
+        return len(result)
+
+    def zrevrange(self, key, start, end):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda item: -item[1])
+        return [member.encode() for member, _ in ranked[start:end + 1]]
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.calls.append((name, args))
+        return command
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestTrending:
+    @pytest.fixture(autouse=True)
+    def fake_redis(self, monkeypatch):
+        self.redis = FakeRedis()
+        monkeypatch.setattr(trending, '_get_redis', lambda: self.redis)
+
+    def setup_method(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.category = Category.objects.create(name='电子产品', slug='electronics')
+        self.phone, self.case, self.tv = [
+            Product.objects.create(category=self.category, name=name, slug=slug, price=100, stock=10)
+            for name, slug in (('手机', 'phone'), ('手机壳', 'case'), ('电视', 'tv'))
+        ]
+        # 电视累计销量最高，但近期没有销售
+        Product.objects.filter(id=self.tv.id).update(sales=1000)
+
+    def _order(self, items):
+        order = Order.objects.create(
+            user=self.user, first_name='张', last_name='三', email='zhangsan@example.com',
+            address='北京市朝阳区', postal_code='100000', city='北京'
+        )
+        for product, quantity in items:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        return order
+
+    def _pay(self, order):
+        payment = Payment.objects.create(
+            order=order, user=self.user, payment_method='stripe', amount=order.get_total_cost()
+        )
+        payment = Payment.objects.get(id=payment.id)
+        payment.payment_status = 'completed'
+        payment.save()
+        return payment
+
+    def test_completed_payment_records_sales(self):
+        """测试支付成功后销量计入热销榜，重复保存不重复计数"""
+        payment = self._pay(self._order([(self.case, 3), (self.phone, 1)]))
+        payment.save()
+        assert trending.get_trending_ids('24h') == [self.case.id, self.phone.id]
+
+    def test_pending_payment_not_recorded(self):
+        """测试未支付成功的订单不计入热销榜"""
+        order = self._order([(self.phone, 2)])
+        Payment.objects.create(order=order, user=self.user, payment_method='stripe', amount=200)
+        assert trending.get_trending_ids('24h') == []
+
+    def test_window_union_cached_per_hour(self):
+        """测试窗口合并结果在当前小时内复用"""
+        self._pay(self._order([(self.phone, 1)]))
+        trending.get_trending_ids('7d')
+        trending.get_trending_ids('7d')
+        assert self.redis.union_calls == 1
+
+    def test_empty_window_union_cached(self):
+        """测试窗口内没有销量时也缓存合并结果，不会每次查询都重新合并"""
+        assert trending.get_trending_ids('7d') == []
+        assert trending.get_trending_ids('7d') == []
+        assert self.redis.union_calls == 1
+
+    def test_trending_sort(self):
+        """测试商品列表按近期热销排序"""
+        self._pay(self._order([(self.case, 5), (self.phone, 2)]))
+        response = self.client.get(reverse('shop:product_list'), {'sort_by': 'trending'})
+        # 榜单外的商品按累计销量排在后面，不会从列表中消失
+        assert [p.id for p in response.context['products']] == [self.case.id, self.phone.id, self.tv.id]
+        assert [p.id for p in response.context['hot_products']] == [self.case.id, self.phone.id]
+
+    def test_trending_sort_keeps_category_filter(self):
+        """测试分类页按热销排序时保留分类下的全部商品"""
+        books = Category.objects.create(name='图书', slug='books')
+        novel, comic = [
+            Product.objects.create(category=books, name=name, slug=slug, price=20, stock=10)
+            for name, slug in (('小说', 'novel'), ('漫画', 'comic'))
+        ]
+        self._pay(self._order([(self.phone, 5), (comic, 1)]))
+        response = self.client.get(reverse('shop:product_list_by_category', args=['books']), {'sort_by': 'trending'})
+        assert [p.id for p in response.context['products']] == [comic.id, novel.id]
+
+    def test_trending_sort_falls_back_to_sales(self):
+        """测试没有热销数据时回退到累计销量排序"""
+        response = self.client.get(reverse('shop:product_list'), {'sort_by': 'trending'})
+        assert response.context['products'][0].id == self.tv.id
+        assert response.context['hot_products'] == []
@@ -108,6 +108,100 @@ class TestProductReviews:
         # 检查评论数量仍然是1
         assert Review.objects.filter(product=self.product).count() == 1
 
+@pytest.mark.django_db
+class TestProductReviewPagination:
+    def setup_method(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = Client()
+        self.category = Category.objects.create(name='测试分类', slug='test-category')
+        self.product = Product.objects.create(
+            category=self.category, name='测试产品', slug='test-product', price=99.99, stock=10
+        )
+        for i in range(12):
+            user = User.objects.create_user(username=f'reviewer{i}', email=f'r{i}@example.com', password='testpass123')
+            Review.objects.create(product=self.product, user=user, rating=5, comment=f'评论{i}')
+
+    def test_first_page_is_limited(self):
+        """测试详情页只渲染第一页评论"""
+        response = self.client.get(reverse('shop:product_detail', args=[self.product.id, self.product.slug]))
+        assert len(response.context['reviews']) == 10
+        assert response.context['next_cursor']
+        assert response.context['reviews'][0]['comment'] == '评论11'
+
+    def test_load_more_reviews(self):
+        """测试按游标加载剩余评论"""
+        response = self.client.get(reverse('shop:product_detail', args=[self.product.id, self.product.slug]))
+        cursor = response.context['next_cursor']
+        response = self.client.get(reverse('shop:product_reviews', args=[self.product.id]), {'cursor': cursor})
+        data = response.json()
+        assert data['next_cursor'] is None
+        assert '评论1' in data['html'] and '评论0' in data['html']
+        assert '评论2' not in data['html']
+
+    def test_invalid_cursor(self):
+        """测试非法游标返回400"""
+        response = self.client.get(reverse('shop:product_reviews', args=[self.product.id]), {'cursor': 'abc'})
+        assert response.status_code == 400
+        # 超出时间范围的游标同样返回400
+        response = self.client.get(
+            reverse('shop:product_reviews', args=[self.product.id]), {'cursor': f'{10 ** 20}-1'}
+        )
+        assert response.status_code == 400
+
+    def test_first_page_cache_invalidated_on_review(self):
+        """测试新增评论后第一页缓存失效"""
+        url = reverse('shop:product_detail', args=[self.product.id, self.product.slug])
+        self.client.get(url)
+        user = User.objects.create_user(username='latest', email='latest@example.com', password='testpass123')
+        Review.objects.create(product=self.product, user=user, rating=4, comment='最新评论')
+        response = self.client.get(url)
+        assert response.context['reviews'][0]['comment'] == '最新评论'
+
+
+@pytest.mark.django_db
+class TestProductDetailPageCache:
+    def setup_method(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.category = Category.objects.create(name='测试分类', slug='test-category')
+        self.product = Product.objects.create(
+            category=self.category, name='测试产品', slug='test-product', price=99.99, stock=10
+        )
+        self.url = reverse('shop:product_detail', args=[self.product.id, self.product.slug])
+
+    def test_body_is_cached_and_holes_filled_per_user(self):
+        """测试主体缓存后，匿名用户与登录用户看到各自的片段"""
+        anonymous = self.client.get(self.url).content.decode()
+        assert '登录后购买' in anonymous
+        assert '<!--hole:' not in anonymous
+
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        content = response.content.decode()
+        assert '加入购物车' in content
+        assert '提交评论' in content
+        # 主体命中缓存，没有重新渲染
+        assert 'shop/product/_detail_body.html' not in [t.name for t in response.templates]
+
+    def test_already_reviewed_fragment(self):
+        """测试已评论用户看到“已评价”提示而不是评论表单"""
+        Review.objects.create(product=self.product, user=self.user, rating=5, comment='不错')
+        self.client.force_login(self.user)
+        content = self.client.get(self.url).content.decode()
+        assert '您已经评价过该商品' in content
+        assert '提交评论' not in content
+
+    def test_body_refreshed_when_product_changes(self):
+        """测试商品信息修改后主体缓存自动失效"""
+        self.client.get(self.url)
+        self.product.description = '全新描述'
+        self.product.save()
+        assert '全新描述' in self.client.get(self.url).content.decode()
+
+
 @pytest.mark.django_db
 class TestShopViews:
     def setup_method(self):
@@ -0,0 +1,124 @@
+# shop/trending.py
+"""
+热销商品榜（滑动窗口）
+
+每笔支付完成后，把订单中各商品的销量累加到当前小时的 Redis 有序集合 shop:hot:<YYYYMMDDHH> 中；
+查询最近 24 小时 / 7 天的热销榜时，用 ZUNIONSTORE 合并对应的小时桶，
+合并结果按小时缓存，之后每次读取只需一次 ZREVRANGE 加一次 in_bulk，不对商品表做 ORDER BY。
+商品列表的热销排序用 order_by_trending 把榜单排名写成 CASE 表达式，榜单外的商品排在后面，筛选和分页不受榜单长度限制。
+
+缓存后端不是 Redis（如本地开发使用 LocMemCache）时，记录操作静默跳过，查询返回空列表，
+调用方应回退到按累计销量排序。
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+HOURLY_KEY = 'shop:hot:{hour}'
+WINDOW_KEY = 'shop:hot:window:{window}:{hour}'
+# 窗口内没有销量时 ZUNIONSTORE 不会创建结果键，另存一个空标记，避免每次查询都重新合并
+EMPTY_WINDOW_KEY = WINDOW_KEY + ':empty'
+# 小时桶保留时间需覆盖最大窗口
+HOURLY_KEY_TTL = 60 * 60 * 24 * 8
+# 合并结果只在当前小时内有效
+WINDOW_KEY_TTL = 60 * 60
+
+WINDOWS = {
+    '24h': 24,
+    '7d': 24 * 7,
+}
+
+
+def _get_redis():
+    """获取原生 Redis 连接，缓存后端不是 django-redis 时返回 None"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def _hour(moment):
+    return timezone.localtime(moment).strftime('%Y%m%d%H')
+
+
+def record_sales(items, when=None):
+    """
+    记录一笔订单的销量
+    items 为 (product_id, quantity) 的可迭代对象
+    """
+    redis = _get_redis()
+    if redis is None:
+        return
+    key = HOURLY_KEY.format(hour=_hour(when or timezone.now()))
+    try:
+        pipe = redis.pipeline()
+        for product_id, quantity in items:
+            pipe.zincrby(key, quantity, product_id)
+        pipe.expire(key, HOURLY_KEY_TTL)
+        pipe.execute()
+    except Exception as e:
+        # 热销榜只是展示用途，Redis 故障不能影响支付流程
+        logger.warning(f"记录热销数据失败: {e}")
+
+
+def get_trending_ids(window='24h', limit=12, offset=0):
+    """获取窗口内销量最高的商品ID列表（按销量降序）"""
+    redis = _get_redis()
+    if redis is None:
+        return []
+
+    now = timezone.now()
+    dest = WINDOW_KEY.format(window=window, hour=_hour(now))
+    empty = EMPTY_WINDOW_KEY.format(window=window, hour=_hour(now))
+    try:
+        ids = redis.zrevrange(dest, offset, offset + limit - 1)
+        if not ids and not redis.exists(dest, empty):
+            # 本小时第一次查询该窗口：合并小时桶并缓存合并结果
+            hours = WINDOWS[window]
+            keys = [HOURLY_KEY.format(hour=_hour(now - timedelta(hours=i))) for i in range(hours)]
+            pipe = redis.pipeline()
+            pipe.zunionstore(dest, keys)
+            pipe.expire(dest, WINDOW_KEY_TTL)
+            pipe.zrevrange(dest, offset, offset + limit - 1)
+            count, _, ids = pipe.execute()
+            if not count:
+                redis.set(empty, 1, ex=WINDOW_KEY_TTL)
+    except Exception as e:
+        logger.warning(f"读取热销数据失败: {e}")
+        return []
+    return [int(product_id) for product_id in ids]
+
+
+def order_by_trending(products, window='7d', limit=120):
+    """
+    把商品查询集按窗口内的热销排名排序：榜单中的商品（最多 limit 个）按排名在前，其余商品按累计销量排在后面，
+    筛选条件（如分类）保持不变，可以直接分页；没有热销数据时等同于按累计销量排序
+    """
+    ids = get_trending_ids(window, limit)
+    if not ids:
+        return products.order_by('-sales', '-id')
+    rank = Case(
+        *[When(id=product_id, then=Value(position)) for position, product_id in enumerate(ids)],
+        default=Value(len(ids)),
+        output_field=IntegerField(),
+    )
+    return products.annotate(trending_rank=rank).order_by('trending_rank', '-sales', '-id')
+
+
+def get_trending_products(window='24h', limit=12, category=None):
+    """获取热销商品列表（保持热度顺序，过滤下架商品）"""
+    ids = get_trending_ids(window, limit)
+    if not ids:
+        return []
+    products = Product.objects.filter(available=True)
+    if category is not None:
+        products = products.filter(category=category)
+    products = products.in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
@@ -7,6 +7,8 @@ urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('search/', views.product_search, name='product_search'),
     path('clearsearch/', views.clear_search_history, name='clear_search_history'),
+    path('export/products/', views.product_export, name='product_export'),
+    path('reviews/<int:product_id>/', views.product_reviews, name='product_reviews'),
     path('category/<slug:category_slug>/', views.category_products, name='category_products'),
     path('<slug:category_slug>/', views.product_list, name='product_list_by_category'),
     path('<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
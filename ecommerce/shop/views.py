@@ -1,6 +1,6 @@
 from django.core.paginator import EmptyPage, PageNotAnInteger
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Avg, Count,Case, When, IntegerField
+from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from .models import Product, Category, SearchQuery
 from .forms import ProductSearchForm, ProductFilterForm
@@ -10,6 +10,15 @@ from .tasks import  update_search_count
 from django_ratelimit.decorators import ratelimit
 from .forms import ReviewForm
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from .exports import export_response, export_products
+from .reviews import get_first_review_page, get_review_page, user_has_reviewed
+from .page_cache import get_product_body, fill_holes
+from .reservations import get_available_stock
+from .recommendations import get_recommendations
+from .trending import get_trending_products, order_by_trending
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 
 # 限制单IP每分钟最多20次搜索请求
 @ratelimit(key='ip', rate='20/m', method='GET', block=True)
@@ -437,6 +446,11 @@ def clear_search_history(request):
         del request.session['search_history']
     return redirect('shop:product_search')
 
+# 热销排序中按排名靠前展示的商品数、首页热销榜展示的商品数
+TRENDING_LIST_LIMIT = 120
+HOT_PRODUCTS_LIMIT = 6
+
+
 def product_list(request, category_slug=None):
     category = None
     # categories = Category.objects.all()
@@ -462,14 +476,15 @@ def product_list(request, category_slug=None):
             pass
 
     # 排序
-    if sort_by in ['price', '-price', 'name', '-created', '-sales', 'rating']:
+    if sort_by == 'trending':
+        # 近7天热销：榜单中的商品按 Redis 有序集合中的排名在前，其余商品按累计销量排在后面；
+        # 筛选后的商品全部保留，没有热销数据时等同于按累计销量排序
+        products = order_by_trending(products, '7d', TRENDING_LIST_LIMIT)
+    elif sort_by in ['price', '-price', 'name', '-created', '-sales', 'rating']:
         products = products.order_by(sort_by)
     else:
         products = products.order_by('-created')
 
-    # 优化查询：使用select_related但不使用only/defer
-    products = products.select_related('category')
-
     # 分页
     paginator = Paginator(products, 12)  # 每页12个商品
     page = request.GET.get('page')
@@ -481,42 +496,25 @@ def product_list(request, category_slug=None):
     except EmptyPage:
         products = paginator.page(paginator.num_pages)
 
+    # 首页展示24小时热销榜
+    hot_products = []
+    if category is None and products.number == 1:
+        hot_products = get_trending_products('24h', HOT_PRODUCTS_LIMIT)
+
     return render(request, 'shop/product/list.html', {
         'category': category,
         'categories': categories,
-        'products': products
+        'products': products,
+        'hot_products': hot_products,
     })
 
 def product_detail(request, id, slug):
-    product = get_object_or_404(Product, id=id, slug=slug, available=True)
-    # 优化：用prefetch_related加载关联的评论（避免N+1）
-    # 获取产品评论，按时间倒序排列
-    # reviews = product.reviews.all().order_by('-created')
-    # 关键优化：使用 select_related('user') 预加载评论关联的用户数据
-    reviews = product.reviews.select_related('user').order_by('-created')  # 新增 select_related
-    # 关键优化：一次聚合查询获取所有星级的数量
-    rating_aggregates = product.reviews.aggregate(
-        total=Count('id'),  # 总评论数
-        # 分别计算5-1星的数量
-        star5=Count(Case(When(rating=5, then=1), output_field=IntegerField())),
-        star4=Count(Case(When(rating=4, then=1), output_field=IntegerField())),
-        star3=Count(Case(When(rating=3, then=1), output_field=IntegerField())),
-        star2=Count(Case(When(rating=2, then=1), output_field=IntegerField())),
-        star1=Count(Case(When(rating=1, then=1), output_field=IntegerField())),
-    )
-
-    # 构造评分统计字典
-    rating_stats = {
-        'average': product.rating,
-        'count': rating_aggregates['total'],  # 总评论数
-        'distribution': {
-            '5': rating_aggregates['star5'],
-            '4': rating_aggregates['star4'],
-            '3': rating_aggregates['star3'],
-            '2': rating_aggregates['star2'],
-            '1': rating_aggregates['star1'],
-        }
-    }
+    product = get_object_or_404(Product.objects.select_related('category'), id=id, slug=slug, available=True)
+    # 评论只加载第一页（游标分页，带缓存），更多评论通过 product_reviews 接口按需加载
+    reviews, next_cursor, review_version = get_first_review_page(product.id)
+    # 评分统计直接读取商品上的反范式字段（由评论信号原子维护），无需聚合查询
+    rating_stats = product.get_rating_stats()
+    has_reviewed = request.user.is_authenticated and user_has_reviewed(product.id, request.user.id)
 
     # 处理评论提交
     review_form = ReviewForm()
@@ -524,26 +522,48 @@ def product_detail(request, id, slug):
         review_form = ReviewForm(data=request.POST)
         if review_form.is_valid():
             # 检查用户是否已评论过该产品
-            if reviews.filter(user=request.user).exists():
+            if has_reviewed:
                 messages.warning(request, '您已经评论过该商品')
             else:
                 new_review = review_form.save(commit=False)
                 new_review.product = product
                 new_review.user = request.user
+                # 保存时由信号以 F 表达式增量更新评论数、星级分布与平均分
                 new_review.save()
 
-                # 更新产品评分
-                avg_rating = product.reviews.aggregate(Avg('rating'))['rating__avg']
-                product.rating = round(avg_rating, 1)
-                product.save()
-
                 messages.success(request, '您的评论已提交成功！')
                 return redirect('shop:product_detail', id=product.id, slug=product.slug)
 
     context = {
         'product': product,
         'reviews': reviews,
+        'next_cursor': next_cursor,
         'review_form': review_form,
         'rating_stats': rating_stats,
+        'has_reviewed': has_reviewed,
+        # 可售库存（stock - reserved）从短期缓存读取，供 stock、buy_form 片段使用
+        'available_stock': get_available_stock([product.id]).get(product.id, 0),
     }
-    return render(request, 'shop/product/detail.html', context)
\ No newline at end of file
+    # 页面主体从缓存读取，只有购买表单、评论表单等用户相关片段按请求渲染
+    body = get_product_body(product, context, review_version)
+    context['product_body'] = fill_holes(body, request, context)
+    # 离线计算好的共现推荐：缓存取ID + 一次 in_bulk
+    context['recommendations'] = get_recommendations(product.id)
+    return render(request, 'shop/product/detail.html', context)
+
+
+def product_reviews(request, product_id):
+    """加载更多评论（AJAX），返回评论列表HTML片段和下一页游标"""
+    try:
+        reviews, next_cursor = get_review_page(product_id, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': '无效的分页参数'}, status=400)
+
+    html = render_to_string('shop/product/_review_list.html', {'reviews': reviews}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+
+@staff_member_required
+def product_export(request):
+    """导出商品数据（仅限管理员，流式输出）"""
+    return export_response(request, 'products', export_products)